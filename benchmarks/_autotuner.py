@@ -0,0 +1,70 @@
+"""Construction of realistic Autotuner object graphs for the benchmarks."""
+
+import numpy as np
+import pandas as pd
+
+from qtune.autotuner import Autotuner
+from qtune.evaluator import SensingDot2D, LeadTransition
+from qtune.experiment import Experiment
+from qtune.gradient import KalmanGradientEstimator
+from qtune.kalman_gradient import KalmanGradient
+from qtune.parameter_tuner import ParameterTuner
+from qtune.solver import NewtonSolver, make_target
+
+
+class BenchmarkExperiment(Experiment):
+    def __init__(self, gates):
+        self._gate_voltages = pd.Series(0., index=gates)
+
+    def read_gate_voltages(self):
+        return self._gate_voltages.copy()
+
+    def set_gate_voltages(self, new_gate_voltages):
+        self._gate_voltages[new_gate_voltages.index] = new_gate_voltages
+        return new_gate_voltages
+
+
+def make_evaluators(experiment, tuner_idx, rng):
+    """SensingDot2D and LeadTransition evaluators with raw data of typical size"""
+    x = np.linspace(-10e-3, 10e-3, 104)
+    sensing_dot = SensingDot2D(experiment,
+                               parameters=('position_a%d' % tuner_idx, 'position_b%d' % tuner_idx),
+                               raw_x_data=[x, x.copy()],
+                               raw_y_data=rng.normal(size=(104, 104)),
+                               name='SensingDot2D_%d' % tuner_idx)
+
+    line = np.linspace(-4e-3, 4e-3, 320)
+    lead_transition = LeadTransition(experiment,
+                                     parameters=('lead_a%d' % tuner_idx, 'lead_b%d' % tuner_idx),
+                                     raw_x_data=[line, line.copy()],
+                                     raw_y_data=[rng.normal(size=320), rng.normal(size=320)],
+                                     name='LeadTransition_%d' % tuner_idx)
+    return sensing_dot, lead_transition
+
+
+def make_autotuner(n_tuners=3, n_gates=8, seed=0, **autotuner_kwargs) -> Autotuner:
+    rng = np.random.RandomState(seed)
+    gates = ['gate_%d' % idx for idx in range(n_gates)]
+    experiment = BenchmarkExperiment(gates)
+    voltages = experiment.read_gate_voltages()
+
+    tuning_hierarchy = []
+    for tuner_idx in range(n_tuners):
+        evaluators = make_evaluators(experiment, tuner_idx, rng)
+
+        parameters = [parameter for evaluator in evaluators for parameter in evaluator.parameters]
+        target = make_target(desired=pd.Series(rng.normal(size=len(parameters)), index=parameters),
+                             tolerance=pd.Series(.1, index=parameters))
+        gradient_estimators = [
+            KalmanGradientEstimator(kalman_gradient=KalmanGradient(n_gates, 1, initial_gradient=rng.normal(size=n_gates)),
+                                    current_position=voltages.copy(), maximum_covariance=1., epsilon=.1)
+            for _ in parameters]
+        solver = NewtonSolver(target=target, gradient_estimators=gradient_estimators, current_position=voltages.copy())
+
+        tuning_hierarchy.append(ParameterTuner(evaluators=evaluators, solver=solver,
+                                               last_voltage=voltages.copy(),
+                                               last_parameter_values=pd.Series(rng.normal(size=len(parameters)),
+                                                                               index=parameters),
+                                               last_parameters_variances=pd.Series(.01, index=parameters)))
+
+    return Autotuner(experiment, tuning_hierarchy=tuning_hierarchy, **autotuner_kwargs)
@@ -0,0 +1,77 @@
+"""
+Benchmark of the refresh latency of the parameter and gradient windows of the GUI.
+
+Fills a History with Autotuner states, appends one state before every refresh like the GUI does during tuning and
+measures refresh plus rendering into an offscreen pixmap for the pyqtgraph widgets and the Matplotlib widgets they
+replaced. Runs without a display through the offscreen Qt platform. Needs PyQt5 and pyqtgraph.
+
+    python -m benchmarks.gui_refresh --entries 100 1000 10000 --refreshes 20
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import pyqtgraph as pg
+
+from qtune.history import History, AutotunerRecord, parameter_information
+from qtune.gui import ParameterWidget, GradientWidget, MatplotlibParameterWidget, MatplotlibGradientWidget
+
+from benchmarks._autotuner import make_autotuner
+from benchmarks.history_append import make_records
+
+
+def refresh_latency(app, widget, history: History, records, n_refreshes: int) -> float:
+    widget.resize(800, 1200)
+    widget.show()
+    app.processEvents()
+
+    durations = []
+    for idx in range(n_refreshes):
+        history.append_record(next(records), 'refresh_%d' % idx)
+        start = time.perf_counter()
+        widget.refresh()
+        # pyqtgraph paints in the event loop, so the widget is rendered explicitly for both
+        widget.grab()
+        durations.append(time.perf_counter() - start)
+
+    widget.close()
+    app.processEvents()
+    return sorted(durations)[len(durations) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--refreshes', type=int, default=20)
+    parser.add_argument('--parameters', type=int, default=4, help='Number of plotted parameters')
+    args = parser.parse_args()
+
+    app = pg.mkQApp()
+    record = AutotunerRecord.from_autotuner(make_autotuner(), fields=AutotunerRecord.columns)
+    parameter_names = record.parameter_names()[:args.parameters]
+    for parameter_name in parameter_names:
+        # the Matplotlib plots label the axes with the registered information
+        parameter_information.setdefault(parameter_name, {'name': parameter_name, 'entity_unit': 'a.u.',
+                                                          'gradient_unit': 'a.u./V'})
+
+    widgets = (('pyqtgraph parameters', ParameterWidget), ('Matplotlib parameters', MatplotlibParameterWidget),
+               ('pyqtgraph gradients', GradientWidget), ('Matplotlib gradients', MatplotlibGradientWidget))
+
+    print('%-24s %10s %20s' % ('widget', 'entries', 'median refresh [ms]'))
+    for n_entries in args.entries:
+        for name, widget_type in widgets:
+            records = make_records(record, n_entries + args.refreshes)
+            history = History(None)
+            for idx in range(n_entries):
+                history.append_record(next(records), str(idx))
+
+            widget = widget_type(history, parameter_names=parameter_names)
+            latency = refresh_latency(app, widget, history, records, args.refreshes)
+            print('%-24s %10d %20.1f' % (name, n_entries, latency * 1e3))
+
+
+if __name__ == '__main__':
+    main()
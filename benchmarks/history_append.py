@@ -0,0 +1,80 @@
+"""
+Benchmark of appending Autotuner states to the History.
+
+Appends projections of an Autotuner with changing voltages, so every state starts a new row, and compares the column
+buffers of the History with growing a DataFrame by DataFrame.append like earlier versions did.
+
+    python -m benchmarks.history_append --entries 100000 --baseline-entries 2000
+"""
+
+import argparse
+import copy
+import time
+import warnings
+
+import pandas as pd
+
+from qtune.history import History, AutotunerRecord
+
+from benchmarks._autotuner import make_autotuner
+
+
+def make_records(record: AutotunerRecord, n_entries: int):
+    gate_name = record.voltages.dtype.names[0]
+    for idx in range(n_entries):
+        voltages = record.voltages.copy()
+        voltages[gate_name] = idx
+        entry = copy.copy(record)
+        entry.voltages = voltages
+        yield entry
+
+
+def run_history(record: AutotunerRecord, n_entries: int):
+    history = History(None)
+    start = time.perf_counter()
+    for idx, entry in enumerate(make_records(record, n_entries)):
+        history.append_record(entry, str(idx))
+    duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for gate_name in history.gate_names:
+        history.get_gate_values(gate_name)
+    getter_duration = time.perf_counter() - start
+    return duration, getter_duration, history
+
+
+def run_data_frame_append(record: AutotunerRecord, n_entries: int, history: History):
+    data_frame = pd.DataFrame()
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        for entry in make_records(record, n_entries):
+            row = pd.DataFrame(history._record_columns(entry, end=entry.evaluated_tuner_index), index=[0],
+                               dtype=float)
+            data_frame = data_frame.append(row, ignore_index=True, sort=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--baseline-entries', type=int, default=2000,
+                        help='Entries of the DataFrame.append baseline. It is quadratic in the number of entries.')
+    args = parser.parse_args()
+
+    record = AutotunerRecord.from_autotuner(make_autotuner(), fields=AutotunerRecord.columns)
+    duration, getter_duration, history = run_history(record, args.entries)
+    print('%-24s %10s %12s %16s' % ('method', 'entries', 'total [s]', 'per append [us]'))
+    print('%-24s %10d %12.3f %16.1f' % ('column buffers', args.entries, duration, duration / args.entries * 1e6))
+
+    if args.baseline_entries:
+        baseline = run_data_frame_append(record, args.baseline_entries, history)
+        print('%-24s %10d %12.3f %16.1f' % ('DataFrame.append', args.baseline_entries, baseline,
+                                            baseline / args.baseline_entries * 1e6))
+
+    print('%d columns, gate getters: %.1f us per column' % (len(history._columns.names),
+                                                            getter_duration / len(history.gate_names) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark of loading many runs into one table.
+
+Writes several run directories of Autotuner snapshots and compares constructing a History per directory one after
+another with load_runs in a thread and a process pool.
+
+    python -m benchmarks.multi_run_loader --runs 8 --entries 50 --workers 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from qtune.storage import snapshot, to_hdf5
+from qtune.history import History, load_runs
+
+from benchmarks._autotuner import make_autotuner
+
+
+def write_runs(n_runs: int, n_entries: int, directory: str):
+    autotuner = make_autotuner()
+    reserved = {'experiment': autotuner._experiment}
+    data, placeholders = snapshot(autotuner, reserved)
+
+    directories = []
+    for run in range(n_runs):
+        run_directory = os.path.join(directory, 'run_%03d' % run)
+        os.mkdir(run_directory)
+        for idx in range(n_entries):
+            to_hdf5(os.path.join(run_directory, 'entry_%04d.hdf5' % idx), 'autotuner', data, reserved=placeholders)
+        directories.append(run_directory)
+    return directories, autotuner._experiment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=8)
+    parser.add_argument('--entries', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--directory', default=None, help='Directory on the file system to benchmark')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        directories, experiment = write_runs(args.runs, args.entries, directory)
+
+        print('%-28s %12s' % ('method', 'total [s]'))
+        start = time.perf_counter()
+        tables = []
+        for run_directory in directories:
+            history = History(run_directory, experiment=experiment)
+            tables.append(history._data_frame.assign(run=run_directory))
+        pd.concat(tables, ignore_index=True, sort=False)
+        print('%-28s %12.3f' % ('History per run', time.perf_counter() - start))
+
+        for multiprocess in (False, True):
+            start = time.perf_counter()
+            load_runs(directories, multiprocess=multiprocess, max_workers=args.workers, experiment=experiment)
+            print('%-28s %12.3f' % ('load_runs (%s pool)' % ('process' if multiprocess else 'thread'),
+                                    time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the projection reads of the ParallelHDF5Reader.
+
+Writes a library of Autotuner snapshots and loads it with a thread and a process pool, once transferring the whole
+object graph and once only the History projection computed in the workers.
+
+    python -m benchmarks.parallel_reader --entries 200 --workers 4
+"""
+
+import argparse
+import functools
+import os
+import tempfile
+import time
+
+from qtune.storage import snapshot, to_hdf5, ParallelHDF5Reader
+from qtune.history import project_autotuner, AutotunerRecord
+
+from benchmarks._autotuner import make_autotuner
+
+
+def run(n_entries: int, max_workers: int, directory: str):
+    autotuner = make_autotuner()
+    reserved = {'experiment': autotuner._experiment}
+    data, placeholders = snapshot(autotuner, reserved)
+
+    file_names = [os.path.join(directory, 'entry_%04d.hdf5' % idx) for idx in range(n_entries)]
+    for file_name in file_names:
+        to_hdf5(file_name, 'autotuner', data, reserved=placeholders)
+
+    projections = [('object graph', None),
+                   ('projection', project_autotuner),
+                   ('projection w/o raw data', functools.partial(project_autotuner,
+                                                                 fields=AutotunerRecord.columns))]
+
+    print('%-8s %-24s %12s' % ('pool', 'transfer', 'total [s]'))
+    for multiprocess in (False, True):
+        for projection_name, projection in projections:
+            with ParallelHDF5Reader(reserved, multiprocess=multiprocess, max_workers=max_workers) as reader:
+                start = time.perf_counter()
+                for loaded_data in reader.read_iter(file_names, projection=projection):
+                    if projection is None:
+                        AutotunerRecord.from_autotuner(loaded_data['autotuner'])
+                duration = time.perf_counter() - start
+            print('%-8s %-24s %12.3f' % ('process' if multiprocess else 'thread', projection_name, duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--directory', default=None, help='Directory on the file system to benchmark')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        run(args.entries, args.workers, directory)
+
+
+if __name__ == '__main__':
+    main()
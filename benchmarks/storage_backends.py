@@ -0,0 +1,66 @@
+"""
+Comparative benchmark of the storage backends.
+
+Writes snapshots of a typical Autotuner with every backend, reads them back and reports the time per snapshot and the
+size on disk. Run it on the file system the data is stored on to pick the fastest format.
+
+    python -m benchmarks.storage_backends --snapshots 50 --directory /path/on/the/target/file/system
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from qtune.storage import snapshot, storage_backends, from_file
+
+from benchmarks._autotuner import make_autotuner
+
+
+def disk_usage(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, file))
+               for root, _, files in os.walk(path)
+               for file in files)
+
+
+def run(n_snapshots: int, directory: str):
+    autotuner = make_autotuner()
+    reserved = {'experiment': autotuner._experiment}
+    data, placeholders = snapshot(autotuner, reserved)
+
+    print('%-8s %14s %14s %12s' % ('backend', 'write [ms]', 'read [ms]', 'disk [KiB]'))
+    for backend_name, backend_type in storage_backends.items():
+        backend = backend_type()
+        file_names = [os.path.join(directory, '%s_%d%s' % (backend_name, idx, backend.extension))
+                      for idx in range(n_snapshots)]
+
+        start = time.perf_counter()
+        for file_name in file_names:
+            backend.write(file_name, 'autotuner', data, reserved=placeholders)
+        write_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for file_name in file_names:
+            from_file(file_name, reserved)
+        read_duration = time.perf_counter() - start
+
+        print('%-8s %14.2f %14.2f %12.1f' % (backend_name,
+                                             write_duration / n_snapshots * 1e3,
+                                             read_duration / n_snapshots * 1e3,
+                                             disk_usage(file_names[0]) / 2 ** 10))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshots', type=int, default=50)
+    parser.add_argument('--directory', default=None, help='Directory on the file system to benchmark')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        run(args.snapshots, directory)
+
+
+if __name__ == '__main__':
+    main()
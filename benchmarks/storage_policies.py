@@ -0,0 +1,92 @@
+"""
+Benchmark of the storage policies of the HDF5 serializer.
+
+Writes typical SensingDot2D and LeadTransition evaluators with raw data to HDF5 files using different storage
+policies and reports the write throughput and the size on disk.
+
+    python -m benchmarks.storage_policies --snapshots 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from qtune.evaluator import SensingDot2D, LeadTransition
+from qtune.storage import to_hdf5, StoragePolicy
+
+
+policies = {
+    'none': (),
+    'lzf': (StoragePolicy(compression='lzf', min_nbytes=1024),),
+    'lzf+shuffle': (StoragePolicy(compression='lzf', shuffle=True, min_nbytes=1024),),
+    'gzip4+shuffle': (StoragePolicy(compression='gzip', compression_opts=4, shuffle=True, min_nbytes=1024),),
+    'gzip4+shuffle rows': (StoragePolicy(compression='gzip', compression_opts=4, shuffle=True, chunks=(1, 4096),
+                                         min_nbytes=1024),),
+}
+
+
+def _digitize(data, bits=14):
+    """Emulates the resolution of a digitizer card"""
+    return np.round(data * 2 ** bits) / 2 ** bits
+
+
+def make_evaluators(rng):
+    x = np.linspace(-10e-3, 10e-3, 104)
+    xx, yy = np.meshgrid(x, x)
+    sensing_dot_scan = 1 / (1 + np.exp((xx + yy) / 2e-3)) + rng.normal(scale=.02, size=xx.shape)
+    sensing_dot = SensingDot2D(experiment=None,
+                               raw_x_data=[x, x.copy()],
+                               raw_y_data=_digitize(sensing_dot_scan))
+
+    line = np.linspace(-4e-3, 4e-3, 320)
+    lead_scans = [np.tanh((line - shift) / .2e-3) + rng.normal(scale=.05, size=line.shape) for shift in (0., 1e-3)]
+    lead_transition = LeadTransition(experiment=None,
+                                     raw_x_data=[line, line.copy()],
+                                     raw_y_data=[_digitize(scan) for scan in lead_scans])
+    return dict(sensing_dot=sensing_dot, lead_transition=lead_transition)
+
+
+def raw_nbytes(evaluators):
+    return sum(arr.nbytes
+               for evaluator in evaluators.values()
+               for data in evaluator.raw_data
+               for arr in (data if isinstance(data, list) else [data]))
+
+
+def run(n_snapshots: int, directory: str):
+    rng = np.random.RandomState(0)
+    snapshots = [make_evaluators(rng) for _ in range(n_snapshots)]
+    total_raw = sum(raw_nbytes(snapshot) for snapshot in snapshots)
+
+    print('{} snapshots with {:.1f} MiB of raw data'.format(n_snapshots, total_raw / 2**20))
+    print('{:<20} {:>12} {:>14} {:>12} {:>8}'.format('policy', 'time (s)', 'raw MiB/s', 'disk MiB', 'ratio'))
+    for policy_name, policy in policies.items():
+        policy_dir = os.path.join(directory, policy_name.replace(' ', '_'))
+        os.makedirs(policy_dir)
+
+        start = time.perf_counter()
+        for idx, snapshot in enumerate(snapshots):
+            to_hdf5(os.path.join(policy_dir, '%d.hdf5' % idx), 'evaluators', snapshot, policies=policy)
+        duration = time.perf_counter() - start
+
+        disk_size = sum(os.path.getsize(os.path.join(policy_dir, file_name)) for file_name in os.listdir(policy_dir))
+        print('{:<20} {:>12.3f} {:>14.1f} {:>12.2f} {:>8.2f}'.format(policy_name, duration,
+                                                                     total_raw / 2**20 / duration,
+                                                                     disk_size / 2**20,
+                                                                     total_raw / disk_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshots', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        run(args.snapshots, directory)
+
+
+if __name__ == '__main__':
+    main()
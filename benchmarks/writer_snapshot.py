@@ -0,0 +1,63 @@
+"""
+Benchmark of the foreground cost of AsynchronousHDF5Writer.write.
+
+Compares the deepcopy that was used before with the snapshot serializer for a typical Autotuner object graph. The
+foreground cost is the time the tuning loop is blocked per save.
+
+    python -m benchmarks.writer_snapshot --saves 100
+"""
+
+import argparse
+import copy
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from qtune.storage import snapshot, AsynchronousHDF5Writer
+
+from benchmarks._autotuner import make_autotuner
+
+
+def run(n_saves: int, n_tuners: int, n_gates: int, directory: str):
+    autotuner = make_autotuner(n_tuners=n_tuners, n_gates=n_gates)
+    reserved = {'experiment': autotuner._experiment}
+
+    deepcopy_durations = []
+    snapshot_durations = []
+    for _ in range(n_saves):
+        start = time.perf_counter()
+        copy.deepcopy((autotuner, reserved))
+        deepcopy_durations.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        snapshot(autotuner, reserved)
+        snapshot_durations.append(time.perf_counter() - start)
+
+    writer = AsynchronousHDF5Writer(reserved, multiprocess=False)
+    for idx in range(n_saves):
+        writer.write(autotuner, os.path.join(directory, '%d.hdf5' % idx), name='autotuner')
+    writer.join()
+
+    print('%-22s %12s %12s' % ('foreground step', 'median [ms]', 'max [ms]'))
+    for label, durations in (('deepcopy', deepcopy_durations),
+                             ('snapshot', snapshot_durations),
+                             ('writer.write', writer.foreground_durations)):
+        durations = np.asarray(durations) * 1e3
+        print('%-22s %12.2f %12.2f' % (label, np.median(durations), durations.max()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--saves', type=int, default=100)
+    parser.add_argument('--tuners', type=int, default=3)
+    parser.add_argument('--gates', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        run(args.saves, args.tuners, args.gates, directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,19 +14,51 @@
 
 # @email: julian.teske@rwth-aachen.de
 
-import h5py
 import os
 import os.path
 import pandas as pd
 from qtune.util import time_string
 from qtune.experiment import Experiment
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Sequence, Callable, Tuple
 from qtune.parameter_tuner import ParameterTuner, SubsetTuner
 from qtune.solver import NewtonSolver
-from qtune.storage import HDF5Serializable, from_hdf5, AsynchronousHDF5Writer
+from qtune.storage import HDF5Serializable, from_file, storage_backends, AsynchronousHDF5Writer, StoragePolicy, \
+    WriterStatistics, JOURNAL_FILE_NAME, BLOB_FILE_NAME, DurabilityPolicy
 import logging
 
 
+class AutotunerEvent:
+    """
+    Change of the Autotuner which is published to its subscribers after the change was saved.
+    voltages_set: The voltages were set on the experiment. No tuner changed.
+    tuner_evaluated: The parameters of a tuner were evaluated. Its parameters, variances, gradients and evaluator raw
+    data changed.
+    voltages_calculated: A tuner calculated the next voltages. Its solver and gradients may have changed.
+    restarted: All tuners were restarted at the current voltages.
+    targets_changed: The targets of the tuners changed.
+    """
+    kinds = ('voltages_set', 'tuner_evaluated', 'voltages_calculated', 'restarted', 'targets_changed')
+    #: Kinds published by Autotuner.iterate
+    iteration_kinds = ('voltages_set', 'tuner_evaluated', 'voltages_calculated')
+
+    __slots__ = ('autotuner', 'kind', 'changed_tuners')
+
+    def __init__(self, autotuner: 'Autotuner', kind: str, changed_tuners: Tuple[int, ...]):
+        """
+        :param autotuner: The Autotuner which changed.
+        :param kind: One of AutotunerEvent.kinds.
+        :param changed_tuners: Positions of the tuners in the hierarchy whose state may have changed.
+        """
+        if kind not in self.kinds:
+            raise ValueError('Unknown event kind', kind)
+        self.autotuner = autotuner
+        self.kind = kind
+        self.changed_tuners = changed_tuners
+
+    def __repr__(self):
+        return '{}(kind={!r}, changed_tuners={!r})'.format(type(self).__name__, self.kind, self.changed_tuners)
+
+
 class Autotuner(metaclass=HDF5Serializable):
     """
     The Autotuner class manages the communication between the ParameterTuner classes and communicates with the
@@ -37,7 +69,10 @@ class Autotuner(metaclass=HDF5Serializable):
     def __init__(self, experiment: Experiment, tuning_hierarchy: List[ParameterTuner] = None,
                  current_tuner_index: int = 0, current_tuner_status: bool = False,
                  voltage_to_set: Optional[pd.Series] = None, hdf5_storage_path: Optional[str] = None,
-                 append_time_to_path: bool = True, last_save_file=None):
+                 append_time_to_path: bool = True, last_save_file=None, delta_checkpoints: bool = False,
+                 journal: bool = False, storage_policies: Sequence[StoragePolicy] = (), write_queue_size: int = 0,
+                 write_queue_policy: str = 'block', storage_backend: str = 'hdf5', content_store: bool = False,
+                 summary_index: bool = False, durability: Optional[DurabilityPolicy] = None):
         """
         Initialize the AutoTuner.
 
@@ -62,7 +97,37 @@ class Autotuner(metaclass=HDF5Serializable):
         :param hdf5_storage_path: Path to the HDF5 library where the autotuner is saved.
 
         :param append_time_to_path: True if the current time is to be appended to the saving path.
+
+        :param delta_checkpoints: True if only the objects which changed since the last save are written. Unchanged
+        objects are linked to the file of the previous iteration, so the files of the storage path depend on each other.
+
+        :param journal: True if all iterations are appended to a single journal file in the storage path instead of
+        writing one file per iteration.
+
+        :param storage_policies: Chunking and compression options for the array data like raw measurement data.
+
+        :param write_queue_size: Maximal number of saved states waiting to be written to disk. 0 means unbounded.
+
+        :param write_queue_policy: Behaviour if the write queue is full. 'block' waits for the disk, 'drop_superseded'
+        drops pending states which did not change the voltages and are followed by a newer such state and 'coalesce'
+        additionally merges consecutive states which did not change the voltages. See AsynchronousHDF5Writer.
+
+        :param storage_backend: Name of the storage format in qtune.storage.storage_backends. Journals, delta
+        checkpoints and storage policies require 'hdf5'.
+
+        :param content_store: True if array data like raw measurement data is written once per run into a content
+        addressed blob store in the storage path and linked by the saved states. See qtune.storage.BlobStore.
+
+        :param summary_index: True if the voltages, parameters, variances, gradients and covariances of each saved state
+        are additionally appended to a summary table in the storage path. The History loads the run from it without
+        reading the saved states.
+
+        :param durability: How many saved states are written to disk together and whether new files are renamed
+        atomically after writing. The default writes each state on its own. See qtune.storage.DurabilityPolicy.
         """
+        if storage_backend != 'hdf5' and journal:
+            raise ValueError('Journals are only supported by the HDF5 backend')
+
         self._experiment = experiment
         self._tuning_hierarchy = tuning_hierarchy
         for par_tuner in tuning_hierarchy:
@@ -72,6 +137,15 @@ class Autotuner(metaclass=HDF5Serializable):
         self._current_tuner_status = current_tuner_status
         self._voltages_to_set = voltage_to_set
         self.last_save_file = last_save_file
+        self._delta_checkpoints = delta_checkpoints
+        self._journal = journal
+        self._storage_policies = list(storage_policies)
+        self._write_queue_size = write_queue_size
+        self._write_queue_policy = write_queue_policy
+        self._storage_backend = storage_backend
+        self._content_store = content_store
+        self._summary_index = summary_index
+        self._durability = durability
 
         if hdf5_storage_path:
             if append_time_to_path:
@@ -82,6 +156,7 @@ class Autotuner(metaclass=HDF5Serializable):
             self._hdf5_storage_path = None
         self._asynchrone_writer = None
         self._logger = 'qtune'
+        self._subscribers = []
 
     @property
     def asynchrone_writer(self):
@@ -91,9 +166,34 @@ class Autotuner(metaclass=HDF5Serializable):
         """
         if self._asynchrone_writer is None:
             self._asynchrone_writer = AsynchronousHDF5Writer(reserved={"experiment": self._experiment},
-                                                             multiprocess=False)
+                                                             multiprocess=False,
+                                                             delta=self._delta_checkpoints,
+                                                             storage_policies=self._storage_policies,
+                                                             max_queue_size=self._write_queue_size,
+                                                             queue_policy=self._write_queue_policy,
+                                                             backend=self._storage_backend,
+                                                             blob_file=self._blob_file,
+                                                             durability=self._durability)
         return self._asynchrone_writer
 
+    @property
+    def _blob_file(self) -> Optional[str]:
+        if self._content_store and self._hdf5_storage_path:
+            return os.path.join(self._hdf5_storage_path, BLOB_FILE_NAME)
+        return None
+
+    @property
+    def hdf5_storage_path(self) -> Optional[str]:
+        """Directory of the saved states of this run. None if nothing is saved."""
+        return self._hdf5_storage_path
+
+    @property
+    def writer_statistics(self) -> Optional[WriterStatistics]:
+        """Queue depth, pending bytes and write latency of the storage. None if nothing was saved yet."""
+        if self._asynchrone_writer is None:
+            return None
+        return self._asynchrone_writer.statistics()
+
     @property
     def logger(self):
         """
@@ -217,23 +317,56 @@ class Autotuner(metaclass=HDF5Serializable):
             self.tuning_hierarchy[i].target = target_change
         self._current_tuner_index = 0
         self._voltages_to_set = None
+        self._publish('targets_changed', tuple(range(len(target_changes))))
 
     def __getstate__(self):
-        """Do not pickle the async writer object"""
+        """Do not pickle the async writer object and the subscribers"""
         state = self.__dict__.copy()
         state['_asynchrone_writer'] = None
+        state['_subscribers'] = []
         return state
 
-    def save_current_status(self):
+    def subscribe(self, callback: Callable[[AutotunerEvent], None]):
+        """
+        Registers a callback which is called with an AutotunerEvent after every change of the Autotuner. The callback
+        is called in the thread which changed the Autotuner. Exceptions are logged and do not interrupt the tuning.
+        :param callback:
+        :return: None
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[AutotunerEvent], None]):
+        self._subscribers.remove(callback)
+
+    def _publish(self, kind: str, changed_tuners: Tuple[int, ...]):
+        if not self._subscribers:
+            return
+        event = AutotunerEvent(self, kind, changed_tuners)
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception:
+                self.logger.exception('Error in subscriber %r of %r', callback, event)
+
+    def save_current_status(self, voltages_changed: bool = False):
         """
         Writes the current state to the HDF5 library.
+        :param voltages_changed: True if the voltages were set in the current iteration.
         :return: None
         """
         if self._hdf5_storage_path:
             if not os.path.isdir(self._hdf5_storage_path):
                 os.makedirs(self._hdf5_storage_path)
-            self.last_save_file = os.path.join(self._hdf5_storage_path, time_string() + ".hdf5")
-            self.asynchrone_writer.write(self, file_name=self.last_save_file, name='autotuner')
+            if self._journal:
+                self.last_save_file = self.asynchrone_writer.next_journal_entry(
+                    os.path.join(self._hdf5_storage_path, JOURNAL_FILE_NAME))
+            else:
+                self.last_save_file = os.path.join(self._hdf5_storage_path,
+                                                   time_string() + storage_backends[self._storage_backend].extension)
+            # the summary columns are computed from the snapshot by the writer (see qtune.history.AutotunerRecord)
+            self.asynchrone_writer.write(self, file_name=self.last_save_file, name='autotuner',
+                                         tuner_index=self._current_tuner_index, voltages_changed=voltages_changed,
+                                         summary=True if self._summary_index else None)
             # hdf5_file = h5py.File(storage_path, 'w-')
             # to_hdf5(hdf5_file, name="autotuner", obj=self, reserved={"experiment": self._experiment})
 
@@ -253,7 +386,8 @@ class Autotuner(metaclass=HDF5Serializable):
         if self.is_tuning_complete():
             raise RuntimeError('The tuning is already complete!')
 
-        if self._voltages_to_set is not None:
+        voltages_changed = self._voltages_to_set is not None
+        if voltages_changed:
             if self.voltages_to_set.isna().any():
                 raise RuntimeError('A voltage is required to be set to NAN')
 
@@ -268,7 +402,9 @@ class Autotuner(metaclass=HDF5Serializable):
             self._experiment.set_gate_voltages(self._voltages_to_set)
             self._current_tuner_index = 0
             self._voltages_to_set = None
+            event = ('voltages_set', ())
         elif not self._current_tuner_status:
+            event = ('tuner_evaluated', (self._current_tuner_index, ))
             self.logger.info("The parameters of ParameterTuner number " + str(self._current_tuner_index) +
                              " are being evaluated.")
             if self.get_current_tuner().is_tuned(self._experiment.read_gate_voltages()):
@@ -284,11 +420,13 @@ class Autotuner(metaclass=HDF5Serializable):
                                      self.get_current_tuner().last_parameters_and_variances[0]
                                      [self.get_current_tuner().target.index])
         else:
+            event = ('voltages_calculated', (self._current_tuner_index, ))
             self._voltages_to_set = self.get_current_tuner().get_next_voltages(tuned_parameters=self.tuned_parameters)
             self._current_tuner_status = False
             self.logger.info("Next voltages are being calculated.")
 
-        self.save_current_status()
+        self.save_current_status(voltages_changed=voltages_changed)
+        self._publish(*event)
 
     def restart(self):
         """ Reads new voltages and communicates them to the member classes. This function can be called when the
@@ -298,6 +436,7 @@ class Autotuner(metaclass=HDF5Serializable):
         current_voltages = self._experiment.read_gate_voltages()
         for par_tuner in self.tuning_hierarchy:
             par_tuner.restart(current_voltages)
+        self._publish('restarted', tuple(range(len(self.tuning_hierarchy))))
 
     def to_hdf5(self):
         return dict(
@@ -307,7 +446,16 @@ class Autotuner(metaclass=HDF5Serializable):
             current_tuner_status=self._current_tuner_status,
             voltage_to_set=self._voltages_to_set,
             hdf5_storage_path=self._hdf5_storage_path,
-            last_save_file=self.last_save_file
+            last_save_file=self.last_save_file,
+            delta_checkpoints=self._delta_checkpoints,
+            journal=self._journal,
+            storage_policies=self._storage_policies,
+            write_queue_size=self._write_queue_size,
+            write_queue_policy=self._write_queue_policy,
+            storage_backend=self._storage_backend,
+            content_store=self._content_store,
+            summary_index=self._summary_index,
+            durability=self._durability
         )
 
     def __repr__(self):
@@ -317,11 +465,10 @@ class Autotuner(metaclass=HDF5Serializable):
 def load_auto_tuner(file, reserved) -> Autotuner:
     """
     Loads an Autotuner class out of the HDF5 library.
-    :param file: File containing the HDF5 library.
+    :param file: File of the library, journal entry path or directory of the npy storage backend.
     :param reserved: Reserved objects.
     :return: The reloaded Autotuner.
     """
     assert "experiment" in reserved
-    hdf5_handle = h5py.File(file, mode="r")
-    loaded_data = from_hdf5(hdf5_handle, reserved=reserved)
+    loaded_data = from_file(file, reserved=reserved)
     return loaded_data["autotuner"]
@@ -0,0 +1,197 @@
+# qtune: Automated fine tuning and optimization
+#
+#   Copyright (C) 2019  Julian D. Teske and Simon S. Humpohl
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation version 3 of the License.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+################################################################################
+
+"""Visual downsampling of long histories. NaN values are ignored unless a whole bucket is NaN."""
+
+from typing import Tuple, List
+
+import numpy as np
+
+
+__all__ = ['MinMaxPyramid', 'min_max_indices', 'lttb_indices']
+
+
+def _extrema(candidates: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param candidates: (bucket x candidate) positions in values.
+    :param values:
+    :return: Positions of the minimum and the maximum of every bucket.
+    """
+    candidate_values = values[candidates]
+    nan = np.isnan(candidate_values)
+    arg_min = np.where(nan, np.inf, candidate_values).argmin(axis=1)
+    arg_max = np.where(nan, -np.inf, candidate_values).argmax(axis=1)
+    rows = np.arange(len(candidates))
+    return candidates[rows, arg_min], candidates[rows, arg_max]
+
+
+def _segment_extrema(values: np.ndarray, start: int, stop: int, bucket_size: int) -> List[np.ndarray]:
+    """Positions of the extrema of the buckets of [start, stop). The last bucket may be incomplete."""
+    if stop <= start:
+        return []
+    n_complete = (stop - start) // bucket_size
+    positions = []
+    if n_complete:
+        candidates = np.arange(start, start + n_complete * bucket_size).reshape(n_complete, bucket_size)
+        positions.extend(_extrema(candidates, values))
+    if start + n_complete * bucket_size < stop:
+        positions.extend(_extrema(np.arange(start + n_complete * bucket_size, stop)[np.newaxis, :], values))
+    return positions
+
+
+def min_max_indices(values: np.ndarray, start: int, stop: int, n_buckets: int) -> np.ndarray:
+    """
+    Downsampling that keeps the minimum and maximum of n_buckets equally sized buckets of [start, stop) and both ends.
+    :return: Sorted positions in values.
+    """
+    if stop - start <= 2 * n_buckets + 2:
+        return np.arange(start, stop)
+    bucket_size = -(-(stop - start) // n_buckets)
+    return np.unique(np.concatenate(_segment_extrema(values, start, stop, bucket_size) + [[start, stop - 1]]))
+
+
+class MinMaxPyramid:
+    """
+    Positions of the minima and maxima of a growing array in buckets of factor ** (level + 1) elements, aligned at
+    the start of the array. Only complete buckets of rows which do not change anymore are kept, so the pyramid is
+    extended incrementally and a downsampled range is assembled from the cached buckets instead of the raw values.
+    """
+    def __init__(self, factor: int = 8):
+        if factor < 2:
+            raise ValueError('The factor must be at least 2', factor)
+        self.factor = factor
+        # minima and maxima of the complete buckets per level
+        self._levels = []
+        self._length = 0
+
+    def __len__(self):
+        """Number of rows covered."""
+        return self._length
+
+    def bucket_size(self, level: int) -> int:
+        return self.factor ** (level + 1)
+
+    def update(self, values: np.ndarray, final_length: int):
+        """
+        Adds the complete buckets of the rows [0, final_length) which were not added before.
+        :param values: The array. The rows which were added before must not have changed.
+        :param final_length: Number of rows which do not change anymore.
+        """
+        if final_length < self._length:
+            raise ValueError('The pyramid covers more rows than are final', self._length, final_length)
+        self._length = final_length
+
+        level = 0
+        candidate_count = final_length
+        while candidate_count >= self.factor:
+            if level == len(self._levels):
+                self._levels.append((np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)))
+            minima, maxima = self._levels[level]
+            old_count, new_count = len(minima), candidate_count // self.factor
+
+            if new_count > old_count:
+                new_slice = slice(old_count * self.factor, new_count * self.factor)
+                if level == 0:
+                    candidates = np.arange(new_slice.start, new_slice.stop).reshape(-1, self.factor)
+                    new_minima, new_maxima = _extrema(candidates, values)
+                else:
+                    finer_minima, finer_maxima = self._levels[level - 1]
+                    new_minima, _ = _extrema(finer_minima[new_slice].reshape(-1, self.factor), values)
+                    _, new_maxima = _extrema(finer_maxima[new_slice].reshape(-1, self.factor), values)
+                self._levels[level] = (np.concatenate((minima, new_minima)), np.concatenate((maxima, new_maxima)))
+
+            candidate_count = new_count
+            level += 1
+
+    def min_max_indices(self, values: np.ndarray, start: int, stop: int, n_buckets: int) -> np.ndarray:
+        """
+        Same as the function min_max_indices, except that the buckets are aligned at multiples of their size, so
+        there may be one more bucket. The cost is O(n_buckets * factor) for any range.
+        :param values: The array the pyramid was updated with. It may have grown since.
+        :param start:
+        :param stop:
+        :param n_buckets: Number of buckets in the range.
+        :return: Sorted positions in values.
+        """
+        if stop - start <= 2 * n_buckets + 2:
+            return np.arange(start, stop)
+        ideal_size = -(-(stop - start) // n_buckets)
+
+        level = None
+        for candidate_level, (minima, _) in enumerate(self._levels):
+            if self.bucket_size(candidate_level) <= ideal_size and len(minima):
+                level = candidate_level
+        if level is None:
+            return min_max_indices(values, start, stop, n_buckets)
+
+        group = -(-ideal_size // self.bucket_size(level))
+        bucket_size = group * self.bucket_size(level)
+        minima, maxima = self._levels[level]
+        first = -(-start // bucket_size)
+        last = max(first, min(stop // bucket_size, len(minima) // group))
+
+        positions = _segment_extrema(values, start, min(first * bucket_size, stop), bucket_size)
+        if last > first:
+            level_slice = slice(first * group, last * group)
+            positions.append(_extrema(minima[level_slice].reshape(-1, group), values)[0])
+            positions.append(_extrema(maxima[level_slice].reshape(-1, group), values)[1])
+        positions.extend(_segment_extrema(values, max(last * bucket_size, start), stop, bucket_size))
+        return np.unique(np.concatenate(positions + [[start, stop - 1]]))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-triangle-three-buckets downsampling. The first and last point are kept and of each bucket in between the
+    point which spans the largest triangle with the point selected in the previous bucket and the mean of the next one.
+    :param x: Increasing x values.
+    :param y:
+    :param n_out: Number of points to select.
+    :return: Sorted positions of the selected points.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.intp)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+
+    # means of the buckets ignoring NaN with the last point as final bucket
+    nan = np.isnan(y[:-1])
+    counts = np.add.reduceat(~nan, edges[:-1]).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.add.reduceat(np.where(nan, 0., x[:-1]), edges[:-1]) / counts
+        mean_y = np.add.reduceat(np.where(nan, 0., y[:-1]), edges[:-1]) / counts
+    mean_x = np.append(mean_x, x[-1]).tolist()
+    mean_y = np.append(mean_y, y[-1]).tolist()
+    with_nan = np.logical_or.reduceat(nan, edges[:-1]).tolist()
+    edges = edges.tolist()
+
+    # the selection depends on the previous one, so only the buckets are vectorised
+    selected = [0]
+    previous_x, previous_y = x[0], y[0]
+    for bucket in range(n_out - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        area = np.abs((previous_x - next_x) * (y[low:high] - previous_y)
+                      - (previous_x - x[low:high]) * (next_y - previous_y))
+        if with_nan[bucket]:
+            area[np.isnan(area)] = -1.
+        position = low + int(area.argmax())
+        selected.append(position)
+        previous_x, previous_y = x[position], y[position]
+    selected.append(n - 1)
+    return np.array(selected, dtype=np.intp)
@@ -18,9 +18,7 @@ from qtune.experiment import Experiment, Measurement
 from typing import Sequence, Optional, Tuple
 import pandas as pd
 import numpy as np
-from scipy import optimize
 import qtune.util
-import scipy.ndimage
 import logging
 from qtune.storage import HDF5Serializable
 
@@ -163,6 +161,8 @@ class LeadTunnelTimePrefitVersion(FittingEvaluator):
             [error_t_rise, error_t_fall], ['parameter_time_rise', 'parameter_time_fall'])
 
     def process_raw_data(self, raw_data=None):
+        from scipy import optimize
+
         if raw_data is None:
             raw_data = self.raw_data[0]
         y_data = raw_data[1, :] - raw_data[0, :]
@@ -266,6 +266,8 @@ class LeadTunnelTimeByLeadScan(FittingEvaluator):
             [error_t_rise, error_t_fall], ['parameter_time_rise', 'parameter_time_fall'])
 
     def process_raw_data(self, raw_data=None):
+        from scipy import optimize
+
         if raw_data is None:
             raw_data = self.raw_data
         y_data = raw_data[1, :] - raw_data[0, :]
@@ -304,7 +306,8 @@ class LeadTunnelTimeByLeadScan(FittingEvaluator):
                                      'length_lin_rise'])
         residuals = y_data - func_lead_times_v2(x_data, **dict(fitresult))
         scaled_residual = np.nanmean(residuals) / fitresult['height']
-        qtune.util.plot_raw_data_fit(y_data=y_data, x_data=x_data)
+        import qtune.plotting
+        qtune.plotting.plot_raw_data_fit(y_data=y_data, x_data=x_data)
         # TODO: properly scale and use residual
         return fitresult, scaled_residual
 
@@ -399,6 +402,8 @@ class InterDotTCByLineScan(FittingEvaluator):
             pd.Series([residual], ["parameter_tunnel_coupling"])
 
     def process_raw_data(self, raw_data):
+        from scipy import optimize
+
         x_data = raw_data[0]
         y_data = raw_data[1]
         if len(y_data.shape) == 2:
@@ -479,6 +484,8 @@ class NewLoadTime(FittingEvaluator):
             pd.Series([residual], ["parameter_time_load"])
 
     def process_raw_data(self, raw_data):
+        from scipy import optimize
+
         x_data = raw_data[1, :]
         y_data = raw_data[0, :]
         initial_curvature = self.initial_curvature
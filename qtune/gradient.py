@@ -18,7 +18,6 @@ from typing import Optional, Union, Sequence
 
 import numpy as np
 import pandas as pd
-import sympy as sp
 
 from qtune.kalman_gradient import KalmanGradient
 from qtune.storage import HDF5Serializable
@@ -308,6 +307,8 @@ class KalmanGradientEstimator(GradientEstimator):
                 return self._current_position.add(self._epsilon[gates] * eigenvectors[:, np.argmax(lengths)],
                                                   fill_value=0.)
         else:
+            import sympy as sp
+
             tuned_matrix = sp.Matrix(tuned_jacobian)
             nullvecotors = [vec / vec.norm() for vec in tuned_matrix.nullspace()]
             filled_nullvectors = []
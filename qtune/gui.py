@@ -15,12 +15,14 @@
 # @email: julian.teske@rwth-aachen.de
 
 from threading import Thread
+import os
 import time
 import logging
 import functools
 import IPython
 import itertools
 import collections
+from typing import Optional, Sequence
 
 import pyqtgraph as pg
 import pyqtgraph.parametertree
@@ -29,11 +31,14 @@ from pyqtgraph.Qt import QtCore, QtWidgets, QtGui
 import numpy as np
 import pandas as pd
 
-from qtune.history import History, plot_parameters, plot_gradients
+from qtune.history import History, IncrementalQuery, plot_parameters, plot_gradients, parameter_information
 import qtune.autotuner
+from qtune.storage import EVALUATOR_DATA_FILE_NAME
 
-IPython.get_ipython().magic('gui qt')
-IPython.get_ipython().magic('matplotlib qt')
+# in IPython its Qt event loop runs the GUI. Otherwise, e.g. in benchmarks, the caller runs a QApplication.
+if IPython.get_ipython() is not None:
+    IPython.get_ipython().magic('gui qt')
+    IPython.get_ipython().magic('matplotlib qt')
 
 
 def log_exceptions(channel='qtune', catch_exceptions=True):
@@ -138,88 +143,121 @@ class EvaluatorWidget(pg.LayoutWidget):
         self._tune_run_number = i
 
 
+def _query_parameter(history: History, param: str, **query_kwargs) -> pd.DataFrame:
+    """Values of a parameter and error bar heights. See History.query."""
+    values, std = history.query_parameters([param], with_std=True, **query_kwargs)
+    # QT graph is plotting only half the height to each side. Our errors are 2 sided
+    return pd.DataFrame({'value': values[param], 'height': std[param] * 2})
+
+
+def _query_gradient(history: History, param: str, **query_kwargs) -> pd.DataFrame:
+    """Gradient of a parameter by gate name and error bar heights by gate name + '#height'. See History.query."""
+    data, data_var = history.query_gradients(param, with_variances=True, **query_kwargs)
+    return pd.concat([data, (np.sqrt(data_var) * 2).add_suffix('#height')], axis=1)
+
+
 class PlotOrganizer(pg.LayoutWidget):
     @QtCore.pyqtSlot()
     @log_exceptions('plotting')
     def refresh(self):
         (_, gates), (_, params), (_, grads) = self.parameter.getValues().values()
         pens = (pg.intColor(idx, max(1, len(gates) + len(params))) for idx in itertools.count(0))
-        plot_item = self.plot.getPlotItem()
+        query_kwargs = self._query_kwargs()
+        if query_kwargs != self._last_query:
+            # the visible range changed, so everything is queried again
+            self._queries.clear()
+            self._last_query = query_kwargs
+        n_rows = self.history.number_of_stored_iterations
+        updated = set()
 
         for pen, (gate, (plot_gate, _)) in zip(pens, gates.items()):
             if plot_gate:
-                data = self.history.get_gate_values(gate)
-
-                if gate in self._plots:
-                    self._plots[gate].setData(data)
-                else:
-                    self._plots[gate] = plot_item.plot(data, name=gate, pen=pen)
+                query = self._updated_query(gate, functools.partial(self.history.query, [gate]), n_rows, updated)
+                self._set_curve(gate, query.index, query[gate], pen)
 
             else:
                 self._remove_plot(gate)
 
         for pen, (param, (plot_param, _)) in zip(pens, params.items()):
+            if plot_param:
+                query = self._updated_query(param, functools.partial(_query_parameter, self.history, param), n_rows,
+                                            updated)
             if plot_param.startswith('plot'):
-                data = self.history.get_parameter_values(param)
-                if param in self._plots:
-                    self._plots[param].setData(data)
-                else:
-                    self._plots[param] = plot_item.plot(data, name=param, pen=pen)
+                self._set_curve(param, query.index, query['value'], pen)
 
             else:
                 self._remove_plot(param)
 
             error_plot_name = param + "#err_bar"
             if plot_param.endswith('error'):
-                data_std = self.history.get_parameter_std(param)
-                error_plot_args = dict(x=data.index.values, y=data,
-                                       height=data_std * 2)
-                # QT graph is plotting only half the height to each side. Our errors are 2 sided
-
-                if error_plot_name in self._plots:
-                    self._plots[error_plot_name].setData(**error_plot_args)
-                else:
-                    self._plots[error_plot_name] = pg.ErrorBarItem(**error_plot_args)
-                    plot_item.addItem(self._plots[error_plot_name])
+                self._set_error_bars(error_plot_name, query.index, query['value'], query['height'])
 
             else:
                 self._remove_plot(error_plot_name)
 
         for param, (_, gates) in grads.items():
-            data = self.history.get_gradients(param)
-            data_var = self.history.get_gradient_variances(param)
+            query = None
 
             for pen, (gate, (plot_grad, _)) in zip(pens, gates.items()):
                 grad_name = param + '#' + gate
                 grad_err_name = grad_name + '#err_bar'
+                if plot_grad and query is None:
+                    fetch = functools.partial(_query_gradient, self.history, param)
+                    query = self._updated_query(('gradients', param), fetch, n_rows, updated)
 
                 if plot_grad.startswith('plot'):
-                    gate_data = data[gate]
-
-                    if grad_name in self._plots:
-                        self._plots[grad_name].setData(gate_data)
-
-                    else:
-                        self._plots[grad_name] = plot_item.plot(gate_data, name=grad_name, pen=pen)
+                    self._set_curve(grad_name, query.index, query[gate], pen)
 
                 else:
                     self._remove_plot(grad_name)
 
-                if plot_grad.endswith('error') and gate in data_var:
-                    gate_data_var = data_var[gate]
-                    error_plot_args = dict(x=gate_data.index.values, y=gate_data,
-                                           height=gate_data_var.apply(np.sqrt) * 2)
-                    # QT graph is plotting only half the height to each side. Our errors are 2 sided
-
-                    if grad_err_name in self._plots:
-                        self._plots[grad_err_name].setData(**error_plot_args)
-                    else:
-                        self._plots[grad_err_name] = pg.ErrorBarItem(**error_plot_args)
-                        plot_item.addItem(self._plots[grad_err_name])
+                if plot_grad.endswith('error') and gate + '#height' in query.columns:
+                    self._set_error_bars(grad_err_name, query.index, query[gate], query[gate + '#height'])
 
                 else:
                     self._remove_plot(grad_err_name)
 
+        # deselected curves are queried from scratch when they are selected again
+        for name in set(self._queries) - updated:
+            del self._queries[name]
+
+    def _updated_query(self, name, fetch, n_rows: int, updated: set) -> IncrementalQuery:
+        query = self._queries.get(name)
+        if query is None:
+            query = self._queries[name] = IncrementalQuery(fetch, **self._last_query)
+        if name not in updated:
+            query.update(n_rows)
+            updated.add(name)
+        return query
+
+    def _set_curve(self, name: str, x: np.ndarray, y: np.ndarray, pen):
+        if name in self._plots:
+            self._plots[name].setData(x=x, y=y)
+        else:
+            self._plots[name] = self.plot.getPlotItem().plot(x=x, y=y, name=name, pen=pen)
+
+    def _set_error_bars(self, name: str, x: np.ndarray, y: np.ndarray, height: np.ndarray):
+        if name in self._plots:
+            self._plots[name].setData(x=x, y=y, height=height)
+        else:
+            self._plots[name] = pg.ErrorBarItem(x=x, y=y, height=height)
+            self.plot.getPlotItem().addItem(self._plots[name])
+
+    def _query_kwargs(self) -> dict:
+        """Downsampling and, if the user zoomed in, the visible range of iterations for History.query."""
+        query_kwargs = dict(max_points=self.max_points)
+        view_box = self.plot.getPlotItem().getViewBox()
+        if not view_box.autoRangeEnabled()[0]:
+            (x_min, x_max), _ = view_box.viewRange()
+            query_kwargs.update(start=max(0, int(np.floor(x_min))), stop=max(0, int(np.ceil(x_max)) + 1))
+        return query_kwargs
+
+    @log_exceptions('plotting')
+    def _x_range_changed(self, *_):
+        # the pyramid of the History makes requerying a zoomed range cheap
+        if self._query_kwargs() != self._last_query:
+            self.refresh()
+
     def _remove_plot(self, name):
         if name in self._plots:
             plot_item = self.plot.getPlotItem()
@@ -233,7 +271,12 @@ class PlotOrganizer(pg.LayoutWidget):
                 child.setValue(plot_activated)
         self.refresh()
 
-    def __init__(self, history: History, **kwargs):
+    def __init__(self, history: History, max_points: Optional[int] = 2000, **kwargs):
+        """
+        :param history:
+        :param max_points: Curves are downsampled to at most this many points. See History.query.
+        :param kwargs:
+        """
         super().__init__(**kwargs)
 
         gates = {'name': 'Gate Voltages', 'type': 'group', 'children': [
@@ -271,6 +314,10 @@ class PlotOrganizer(pg.LayoutWidget):
 
         self.plot = pg.PlotWidget()
         self._plots = dict()
+        # the data of the curves by curve name or ('gradients', parameter name)
+        self._queries = dict()
+        self.max_points = max_points
+        self._last_query = None
 
         self.addWidget(self.plot, 1, 1)
 
@@ -279,6 +326,7 @@ class PlotOrganizer(pg.LayoutWidget):
         self.history = history
 
         self.plot.getPlotItem().addLegend()
+        self.plot.getPlotItem().sigXRangeChanged.connect(self._x_range_changed)
 
 
 class QTuneMatplotWidget(MatplotlibWidget):
@@ -316,7 +364,125 @@ class QTuneMatplotWidget(MatplotlibWidget):
         return self.history.parameter_names if self._parameter_names is None else self._parameter_names
 
 
-class ParameterWidget(QTuneMatplotWidget):
+class QTunePlotWidget(pg.GraphicsLayoutWidget):
+    """
+    pyqtgraph plots of the History with one row per parameter and a shared x axis. The data of each row is an
+    IncrementalQuery, so a refresh only fetches the iterations since the previous one and reuses the plot items.
+    """
+    def __init__(self, history: History, parameter_names=None, max_points: Optional[int] = 2000,
+                 parent=None, **kwargs):
+        """
+        :param history:
+        :param parameter_names: Parameters to plot. All parameters of the History if None.
+        :param max_points: Curves are downsampled to at most this many points. See History.query.
+        :param parent:
+        :param kwargs:
+        """
+        super().__init__(parent=parent, **kwargs)
+
+        self.history = history
+        self._parameter_names = parameter_names
+        self.max_points = max_points
+
+        self._rows = []
+        self._queries = dict()
+        self._items = dict()
+
+        self.refresh()
+
+    @property
+    def parameter_names(self):
+        return self.history.parameter_names if self._parameter_names is None else self._parameter_names
+
+    @QtCore.pyqtSlot()
+    @log_exceptions('plotting')
+    def refresh(self):
+        parameter_names = sorted(self.parameter_names)
+        if [parameter_name for parameter_name, _ in self._rows] != parameter_names:
+            self._create_rows(parameter_names)
+
+        n_rows = self.history.number_of_stored_iterations
+        for parameter_name, plot_item in self._rows:
+            query = self._queries[parameter_name]
+            if query.update(n_rows):
+                self.update_row(parameter_name, plot_item, query)
+
+    def _create_rows(self, parameter_names: Sequence[str]):
+        self.clear()
+        self._rows = []
+        self._queries = dict()
+        self._items = dict()
+
+        for row, parameter_name in enumerate(parameter_names):
+            plot_item = self.addPlot(row=row, col=0)
+            if self._rows:
+                plot_item.setXLink(self._rows[0][1])
+            self.setup_row(parameter_name, plot_item)
+            self._rows.append((parameter_name, plot_item))
+            self._queries[parameter_name] = IncrementalQuery(functools.partial(self.query, parameter_name),
+                                                             max_points=self.max_points)
+        if self._rows:
+            self._rows[-1][1].setLabel('bottom', 'Measurement Number')
+
+    def query(self, parameter_name: str, **query_kwargs) -> pd.DataFrame:
+        raise NotImplementedError()
+
+    def setup_row(self, parameter_name: str, plot_item: pg.PlotItem):
+        raise NotImplementedError()
+
+    def update_row(self, parameter_name: str, plot_item: pg.PlotItem, query: IncrementalQuery):
+        raise NotImplementedError()
+
+
+class ParameterWidget(QTunePlotWidget):
+    def query(self, parameter_name, **query_kwargs):
+        return _query_parameter(self.history, parameter_name, **query_kwargs)
+
+    def setup_row(self, parameter_name, plot_item):
+        information = parameter_information.get(parameter_name, {})
+        plot_item.setTitle(information.get('name', parameter_name))
+        plot_item.setLabel('left', information.get('entity_unit', parameter_name))
+
+        error_bars = pg.ErrorBarItem()
+        plot_item.addItem(error_bars)
+        self._items[parameter_name] = plot_item.plot(), error_bars
+
+    def update_row(self, parameter_name, plot_item, query):
+        curve, error_bars = self._items[parameter_name]
+        curve.setData(x=query.index, y=query['value'])
+        error_bars.setData(x=query.index, y=query['value'], height=query['height'])
+
+
+class GradientWidget(QTunePlotWidget):
+    def query(self, parameter_name, **query_kwargs):
+        return _query_gradient(self.history, parameter_name, **query_kwargs)
+
+    def setup_row(self, parameter_name, plot_item):
+        if not self._rows:
+            plot_item.setTitle('Response Matrix')
+        plot_item.setLabel('left', parameter_information.get(parameter_name, {}).get('gradient_unit', parameter_name))
+        plot_item.addLegend()
+        self._items[parameter_name] = dict()
+
+    def update_row(self, parameter_name, plot_item, query):
+        items = self._items[parameter_name]
+        gate_names = [column for column in query.columns if not column.endswith('#height')]
+        for idx, gate_name in enumerate(gate_names):
+            if gate_name not in items:
+                # gates can appear during the run
+                curve = plot_item.plot(name=gate_name, pen=pg.intColor(idx, len(gate_names)))
+                error_bars = pg.ErrorBarItem(pen=pg.intColor(idx, len(gate_names)))
+                plot_item.addItem(error_bars)
+                items[gate_name] = curve, error_bars
+
+            curve, error_bars = items[gate_name]
+            curve.setData(x=query.index, y=query[gate_name])
+            if gate_name + '#height' in query.columns:
+                error_bars.setData(x=query.index, y=query[gate_name], height=query[gate_name + '#height'])
+
+
+class MatplotlibParameterWidget(QTuneMatplotWidget):
+    """The Matplotlib figure of History.plot_parameters which is redrawn completely on every refresh."""
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -337,7 +503,8 @@ class ParameterWidget(QTuneMatplotWidget):
         self.draw()
 
 
-class GradientWidget(QTuneMatplotWidget):
+class MatplotlibGradientWidget(QTuneMatplotWidget):
+    """The Matplotlib figure of History.plot_gradients which is redrawn completely on every refresh."""
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -367,16 +534,13 @@ class MeasurementDataWidget(QTuneMatplotWidget):
     @QtCore.pyqtSlot()
     @log_exceptions('plotting')
     def refresh(self):
-        if self.history.evaluator_data.iloc[self.tune_run_number - 1][self.evaluator_name] != \
-                self.history.evaluator_data.iloc[self.tune_run_number - 1][self.evaluator_name]:
+        evaluator_data = self.history.load_evaluator_data(self.tune_run_number - 1, self.evaluator_name)
+        if evaluator_data is None:
             return
         if self.evaluator_name.startswith('Averaging'):
-            num_measurements = len(
-                self.history.evaluator_data.iloc[self.tune_run_number - 1][self.evaluator_name][
-                    'evaluator'].measurements)
+            num_measurements = len(evaluator_data['evaluator'].measurements)
         else:
-            num_measurements = len(
-                self.history.evaluator_data.iloc[self.tune_run_number - 1][self.evaluator_name]['measurements'])
+            num_measurements = len(evaluator_data['measurements'])
 
         axes = self.get_clear_axes(number_rows=num_measurements)
         self.history.plot_single_evaluator_data(ax=axes, evaluator_name=self.evaluator_name,
@@ -468,11 +632,138 @@ class ReloadWidget(pg.LayoutWidget):
             self.logger.warning("No Autotuner connected to the History. Previous state could not be reloaded!")
 
 
+class RefreshStatistics:
+    """Counters of a RefreshScheduler. Durations are in seconds and None if nothing was measured yet."""
+    __slots__ = ('requested', 'frames', 'merged', 'skipped', 'late', 'last_frame_duration', 'mean_frame_duration')
+
+    def __init__(self, requested: int, frames: int, merged: int, skipped: int, late: int,
+                 last_frame_duration: Optional[float], mean_frame_duration: Optional[float]):
+        self.requested = requested
+        self.frames = frames
+        self.merged = merged
+        self.skipped = skipped
+        self.late = late
+        self.last_frame_duration = last_frame_duration
+        self.mean_frame_duration = mean_frame_duration
+
+    def __str__(self):
+        def milliseconds(duration):
+            return '-' if duration is None else '%.1f ms' % (duration * 1e3)
+        return ('frames: {}, merged: {}, hidden skipped: {}, late: {}, '
+                'frame time: {} (mean {})').format(self.frames, self.merged, self.skipped, self.late,
+                                                   milliseconds(self.last_frame_duration),
+                                                   milliseconds(self.mean_frame_duration))
+
+
+class RefreshScheduler(QtCore.QObject):
+    """
+    Coalesces refresh requests of the registered plot windows to at most frame_rate frames per second. All requests
+    that arrive before the next frame are merged into it, so the tuning thread never waits for redraws. Windows which
+    are hidden or minimized are skipped and refreshed when they are shown again. Frames which take longer than the frame
+    interval are counted as late.
+    """
+    statistics_changed = QtCore.pyqtSignal(str)
+
+    def __init__(self, frame_rate: float = 10., parent=None):
+        super().__init__(parent)
+        self._widgets = []
+        # widgets which skipped a frame while hidden
+        self._stale = set()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._frame)
+        self._last_frame = None
+        self._frame_rate = None
+        self.frame_rate = frame_rate
+
+        self._requested = 0
+        self._frames = 0
+        self._merged = 0
+        self._skipped = 0
+        self._late = 0
+        self._last_frame_duration = None
+        self._total_frame_duration = 0.
+
+    @property
+    def frame_rate(self) -> float:
+        return self._frame_rate
+
+    @frame_rate.setter
+    def frame_rate(self, frame_rate: float):
+        if not frame_rate > 0:
+            raise ValueError('The frame rate must be positive', frame_rate)
+        self._frame_rate = frame_rate
+
+    @property
+    def statistics(self) -> RefreshStatistics:
+        mean_frame_duration = self._total_frame_duration / self._frames if self._frames else None
+        return RefreshStatistics(requested=self._requested, frames=self._frames, merged=self._merged,
+                                 skipped=self._skipped, late=self._late,
+                                 last_frame_duration=self._last_frame_duration,
+                                 mean_frame_duration=mean_frame_duration)
+
+    def register(self, widget: QtWidgets.QWidget):
+        """Refresh the widget in every frame from now on. The widget needs a refresh method."""
+        self._widgets.append(widget)
+        widget.installEventFilter(self)
+
+    def unregister(self, widget: QtWidgets.QWidget):
+        if widget in self._widgets:
+            self._widgets.remove(widget)
+            widget.removeEventFilter(self)
+        self._stale.discard(widget)
+
+    @QtCore.pyqtSlot()
+    def request(self):
+        """Schedules a frame unless one is already pending. Connected to GUI._update_plots."""
+        self._requested += 1
+        if self._timer.isActive():
+            self._merged += 1
+            return
+
+        delay = 0.
+        if self._last_frame is not None:
+            delay = max(0., self._last_frame + 1. / self._frame_rate - time.perf_counter())
+        self._timer.start(int(np.ceil(delay * 1e3)))
+
+    @log_exceptions('plotting')
+    def _frame(self):
+        self._last_frame = start = time.perf_counter()
+        for widget in list(self._widgets):
+            if widget.isVisible() and not widget.isMinimized():
+                self._stale.discard(widget)
+                widget.refresh()
+            else:
+                self._stale.add(widget)
+                self._skipped += 1
+        duration = time.perf_counter() - start
+
+        self._frames += 1
+        self._last_frame_duration = duration
+        self._total_frame_duration += duration
+        if duration > 1. / self._frame_rate:
+            self._late += 1
+        self.statistics_changed.emit('Plots: %s' % self.statistics)
+
+    def eventFilter(self, watched: QtCore.QObject, event: QtCore.QEvent) -> bool:
+        if event.type() in (QtCore.QEvent.Show, QtCore.QEvent.WindowStateChange) and watched in self._stale:
+            self.request()
+        return super().eventFilter(watched, event)
+
+
 class GUI(QtWidgets.QMainWindow):
     _log_signal = QtCore.pyqtSignal(str)
     _update_plots = QtCore.pyqtSignal()
-
-    def __init__(self, auto_tuner, history, logger='qtune'):
+    _writer_status_signal = QtCore.pyqtSignal(str)
+
+    def __init__(self, auto_tuner, history, logger='qtune', frame_rate: float = 10.):
+        """
+        :param auto_tuner:
+        :param history:
+        :param logger:
+        :param frame_rate: Maximal number of plot refreshes per second. See RefreshScheduler.
+        """
         super().__init__()
         self._auto_tuner = auto_tuner
         self._history = history
@@ -545,20 +836,38 @@ class GUI(QtWidgets.QMainWindow):
         top.addWidget(gradient_window_btn, 2, 2)
         top.addWidget(evaluator_btn, 3, 2)
 
+        writer_status = QtWidgets.QLabel('Storage: nothing saved yet')
+        writer_status.setToolTip('Snapshots waiting to be written to disk and the write latency')
+
+        refresh_status = QtWidgets.QLabel('Plots: nothing drawn yet')
+        refresh_status.setToolTip('Plot refreshes, requests merged into them, refreshes skipped for hidden windows, '
+                                  'frames slower than the frame rate and the frame time')
+
         left = pg.LayoutWidget()
         left.addWidget(top, 0, 0)
-        left.addWidget(log, 1, 0)
+        left.addWidget(writer_status, 1, 0)
+        left.addWidget(refresh_status, 2, 0)
+        left.addWidget(log, 3, 0)
 
         self.setCentralWidget(left)
 
         self._log = log
         self._log_signal.connect(self._log.append)
+        self._writer_status_signal.connect(writer_status.setText)
+
+        # the iterations request plot refreshes which are coalesced to the frame rate
+        self._refresh_scheduler = RefreshScheduler(frame_rate, parent=self)
+        self._refresh_scheduler.statistics_changed.connect(refresh_status.setText)
+        self._update_plots.connect(self._refresh_scheduler.request)
         self.log_level = log_level
 
         self._start_btn = start_btn
         self._stop_btn = stop_btn
         self._step_btn = step_btn
 
+        # subscription of the history to the events of the auto tuner
+        self._history_feed = None
+
         self._thread = Thread(target=self._work)
         self._continuous = False
         self._stepped = False
@@ -581,10 +890,7 @@ class GUI(QtWidgets.QMainWindow):
                 break
             except ValueError:
                 pass
-        try:
-            self._update_plots.disconnect(lambda x: None)
-        except TypeError:
-            pass
+        self._refresh_scheduler.unregister(window)
         window.deleteLater()
         event.accept()
 
@@ -596,7 +902,7 @@ class GUI(QtWidgets.QMainWindow):
         plot_organizer.closeEvent = functools.partial(self._close_child, plot_organizer)
 
         self._plot_organizer.append(plot_organizer)
-        self._update_plots.connect(plot_organizer.refresh)
+        self._refresh_scheduler.register(plot_organizer)
 
         plot_organizer.setWindowTitle("QTune: Real Time Plot")
 
@@ -617,7 +923,7 @@ class GUI(QtWidgets.QMainWindow):
 
         reload_widget.gui_get_auto_tuner.connect(self.load_auto_tuner_from_reload_widget)
 
-        self._update_plots.connect(reload_widget.refresh)
+        self._refresh_scheduler.register(reload_widget)
         self._reload_windows.append(reload_widget)
 
         reload_widget.setWindowTitle("QTune: Reload")
@@ -632,7 +938,7 @@ class GUI(QtWidgets.QMainWindow):
         parameter_widget.setWindowFlags(QtCore.Qt.Window)
         parameter_widget.closeEvent = functools.partial(self._close_child, parameter_widget)
 
-        self._update_plots.connect(parameter_widget.refresh)
+        self._refresh_scheduler.register(parameter_widget)
         self._parameter_windows.append(parameter_widget)
 
         parameter_widget.setWindowTitle("QTune: Parameter Plot")
@@ -647,7 +953,7 @@ class GUI(QtWidgets.QMainWindow):
         parameter_widget.setWindowFlags(QtCore.Qt.Window)
         parameter_widget.closeEvent = functools.partial(self._close_child, parameter_widget)
 
-        self._update_plots.connect(parameter_widget.refresh)
+        self._refresh_scheduler.register(parameter_widget)
         self._parameter_windows.append(parameter_widget)
 
         parameter_widget.setWindowTitle("QTune: Gradient Plot")
@@ -674,6 +980,10 @@ class GUI(QtWidgets.QMainWindow):
     def auto_tuner(self):
         return self._auto_tuner
 
+    @property
+    def refresh_scheduler(self) -> RefreshScheduler:
+        return self._refresh_scheduler
+
     @property
     def history(self):
         return self._history
@@ -710,13 +1020,18 @@ class GUI(QtWidgets.QMainWindow):
                             self._logger.info('Tuning completed')
                             self.pause()
                         else:
-                            self.auto_tuner.iterate()
-
                             if self.history:
-                                self.history.append_autotuner(self._auto_tuner)
+                                self._follow_auto_tuner()
+
+                            # the history is appended by the feed when the iteration is finished
+                            self.auto_tuner.iterate()
 
                             self._update_plots.emit()
 
+                            writer_statistics = self.auto_tuner.writer_statistics
+                            if writer_statistics is not None:
+                                self._writer_status_signal.emit('Storage: %s' % writer_statistics)
+
                     except Exception:
                         self._logger.exception('Error during auto tuner iteration: Pausing...')
                         self.pause()
@@ -726,6 +1041,13 @@ class GUI(QtWidgets.QMainWindow):
 
                 self._stepped = False
 
+    def _follow_auto_tuner(self):
+        """Subscribes the history to the current auto tuner which can be replaced by the reload window."""
+        if self._history_feed is None or self._history_feed.autotuner is not self.auto_tuner:
+            if self._history_feed is not None:
+                self._history_feed.close()
+            self._history_feed = self.history.follow_autotuner(self.auto_tuner)
+
     def log(self, msg: str):
         self._log_signal.emit(msg)
 
@@ -792,12 +1114,21 @@ class GUI(QtWidgets.QMainWindow):
         logger.addHandler(handler)
 
 
-def setup_default_gui(auto_tuner, history=None):
+def setup_default_gui(auto_tuner, history=None, evaluator_cache_size=None, frame_rate: float = 10.):
+    """
+    :param auto_tuner:
+    :param history: A new History is created if None.
+    :param evaluator_cache_size: Bytes of raw evaluator data the new History keeps in memory. The rest is kept in the
+    storage directory of the Autotuner. Everything is kept in memory if None.
+    :param frame_rate: Maximal number of plot refreshes per second.
+    """
     if history is None:
-        history = History(None)
+        history = History(None, evaluator_cache_size=evaluator_cache_size,
+                          evaluator_data_file=None if auto_tuner.hdf5_storage_path is None else os.path.join(
+                              auto_tuner.hdf5_storage_path, EVALUATOR_DATA_FILE_NAME))
         history.append_autotuner(auto_tuner)
 
-    gui = GUI(auto_tuner, history)
+    gui = GUI(auto_tuner, history, frame_rate=frame_rate)
     gui.configure_logging('plotting')
     gui.configure_logging('qtune')
     gui.log_level.setCurrentIndex(3)
@@ -15,15 +15,26 @@
 # @email: julian.teske@rwth-aachen.de
 
 import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
 import operator
-import re
-from typing import Optional, Set, Dict, Sequence, Tuple, List
+import functools
+import collections
+import itertools
+import json
+import tempfile
+import weakref
+import importlib.util
+import typing
+from typing import Optional, Set, Dict, Sequence, Tuple, List, Callable, Union
 
 import h5py
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.axes
 import logging
 
 import qtune.storage
@@ -33,6 +44,10 @@ import qtune.gradient
 import qtune.parameter_tuner
 import qtune.util
 import qtune.evaluator
+import qtune.downsampling
+
+if typing.TYPE_CHECKING:
+    import matplotlib.axes
 
 
 parameter_information = {
@@ -119,37 +134,454 @@ def read_files(file_or_files, reserved=None):
     return data.sort(key=operator.itemgetter(0))
 
 
+class _ColumnBuffer:
+    """
+    Growable table with one contiguous numpy buffer per column. Rows and columns are appended in amortized constant
+    time by doubling the capacity. Columns keep the position of their first appearance and missing values are filled
+    with fill_value.
+    """
+    def __init__(self, dtype=np.float64, fill_value=np.nan):
+        self._dtype = np.dtype(dtype)
+        self._fill_value = fill_value
+        # columns x rows, so that every column is a contiguous row of the buffer
+        self._values = np.full((0, 0), fill_value, dtype=self._dtype)
+        self._positions = dict()
+        self._length = 0
+        self._frame = None
+        #: Incremented on every change
+        self.version = 0
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._positions)
+
+    def _grow(self, n_columns: int, n_rows: int):
+        capacity = self._values.shape
+        if n_columns <= capacity[0] and n_rows <= capacity[1]:
+            return
+        shape = (max(n_columns, 2 * capacity[0]) if n_columns > capacity[0] else capacity[0],
+                 max(n_rows, 2 * capacity[1]) if n_rows > capacity[1] else capacity[1])
+        values = np.full(shape, self._fill_value, dtype=self._dtype)
+        values[:capacity[0], :capacity[1]] = self._values
+        self._values = values
+
+    def _column_positions(self, names: Sequence[str]) -> List[int]:
+        new_names = [name for name in names if name not in self._positions]
+        if new_names:
+            self._grow(len(self._positions) + len(new_names), self._length)
+            self._positions.update((name, position)
+                                   for position, name in enumerate(new_names, len(self._positions)))
+        return [self._positions[name] for name in names]
+
+    def _set_row(self, row: int, values: dict):
+        positions = self._column_positions(list(values))
+        if self._dtype == object:
+            # numpy would try to broadcast sequence values
+            for position, value in zip(positions, values.values()):
+                self._values[position, row] = value
+        else:
+            self._values[positions, row] = list(values.values())
+        self._frame = None
+        self.version += 1
+
+    def append_row(self, values: dict):
+        self._grow(len(self._positions), self._length + 1)
+        self._length += 1
+        self._set_row(self._length - 1, values)
+
+    def update_last_row(self, values: dict):
+        if not self._length:
+            raise IndexError('The buffer is empty')
+        self._set_row(self._length - 1, values)
+
+    def extend(self, other: '_ColumnBuffer'):
+        """Appends all rows of the other buffer."""
+        positions = self._column_positions(other.names)
+        self._grow(len(self._positions), self._length + len(other))
+        self._values[positions, self._length:self._length + len(other)] = \
+            other._values[:len(other.names), :len(other)]
+        self._length += len(other)
+        self._frame = None
+        self.version += 1
+
+    def last_row(self, names: Sequence[str]) -> np.ndarray:
+        """Values of the last row. Unknown columns are filled."""
+        return np.array([self._values[self._positions[name], self._length - 1] if name in self._positions
+                         else self._fill_value for name in names], dtype=self._dtype)
+
+    def column(self, name: str) -> np.ndarray:
+        """Read only view of a column. It reflects later updates of the last row but not appended rows."""
+        view = self._values[self._positions[name], :self._length]
+        view.flags.writeable = False
+        return view
+
+    def series(self, name: str) -> pd.Series:
+        return pd.Series(self.column(name), index=pd.RangeIndex(self._length), name=name, copy=False)
+
+    def frame(self, names: Sequence[str], labels=None) -> pd.DataFrame:
+        positions = [self._positions[name] for name in names]
+        return pd.DataFrame(self._values[positions, :self._length].T, index=pd.RangeIndex(self._length),
+                            columns=list(names) if labels is None else labels)
+
+    def to_frame(self) -> pd.DataFrame:
+        """All columns sorted by name. The frame is cached until the buffer changes."""
+        if self._frame is None:
+            self._frame = self.frame(sorted(self._positions))
+        return self._frame
+
+
+class LabelledTensor:
+    """
+    Read only view of the gradient (iteration x parameter x gate) or covariance (iteration x parameter x gate x gate)
+    history. Entries which were never estimated are NaN.
+    """
+    __slots__ = ('values', 'parameter_names', 'gate_names', '_parameter_positions', '_gate_positions')
+
+    def __init__(self, values: np.ndarray, parameter_positions: Dict[str, int], gate_positions: Dict[str, int]):
+        self.values = values
+        self.parameter_names = tuple(parameter_positions)
+        self.gate_names = tuple(gate_positions)
+        self._parameter_positions = parameter_positions
+        self._gate_positions = gate_positions
+
+    def index(self, parameter_name: str, *gate_names: str) -> tuple:
+        """Index of the entry in values without the iteration axis."""
+        return (self._parameter_positions[parameter_name],) + tuple(self._gate_positions[gate_name]
+                                                                     for gate_name in gate_names)
+
+    def sel(self, parameter_name: str, *gate_names: str) -> np.ndarray:
+        """
+        History of a single parameter or entry.
+        :param parameter_name:
+        :param gate_names: Up to one gate name per gate axis.
+        :return: View with the iteration as first axis.
+        """
+        return self.values[(slice(None),) + self.index(parameter_name, *gate_names)]
+
+
+class _TensorBuffer:
+    """
+    Growable array with an iteration axis, a parameter axis and n_gate_axes gate axes. The parameter and gate axes are
+    labelled and every axis grows by doubling. The entries which were ever set are remembered per parameter, so the
+    flat History columns can be derived.
+    """
+    def __init__(self, n_gate_axes: int):
+        self._values = np.full((0, 0) + (0,) * n_gate_axes, np.nan)
+        self._parameter_positions = dict()
+        self._gate_positions = dict()
+        self._entries = dict()
+        self._length = 0
+        #: Incremented on every change
+        self.version = 0
+
+    def __len__(self):
+        return self._length
+
+    def _grow(self, shape: Tuple[int, ...]):
+        capacity = self._values.shape
+        if all(size <= current for size, current in zip(shape, capacity)):
+            return
+        new_capacity = tuple(max(size, 2 * current) if size > current else current
+                             for size, current in zip(shape, capacity))
+        values = np.full(new_capacity, np.nan)
+        values[tuple(slice(0, current) for current in capacity)] = self._values
+        self._values = values
+
+    @staticmethod
+    def _position(positions: Dict[str, int], name: str) -> int:
+        if name not in positions:
+            positions[name] = len(positions)
+        return positions[name]
+
+    def _shape(self, length: int) -> Tuple[int, ...]:
+        return (length, len(self._parameter_positions)) + (len(self._gate_positions),) * (self._values.ndim - 2)
+
+    def append_row(self):
+        self._grow(self._shape(self._length + 1))
+        self._length += 1
+        self.version += 1
+
+    def update_last_row(self, values: Dict[Tuple[str, ...], float]):
+        """
+        :param values: Values by (parameter name, gate name, ...).
+        """
+        if not values:
+            return
+        if not self._length:
+            raise IndexError('The buffer is empty')
+
+        index = np.empty((len(values), self._values.ndim - 1), dtype=np.intp)
+        for row, (parameter_name, *gate_names) in enumerate(values):
+            index[row, 0] = self._position(self._parameter_positions, parameter_name)
+            index[row, 1:] = [self._position(self._gate_positions, gate_name) for gate_name in gate_names]
+            self._entries.setdefault(parameter_name, dict())[tuple(gate_names)] = None
+        self._grow(self._shape(self._length))
+
+        self._values[(self._length - 1,) + tuple(index.T)] = list(values.values())
+        self.version += 1
+
+    def tensor(self) -> LabelledTensor:
+        view = self._values[(slice(0, self._length),) + tuple(slice(0, size) for size in self._shape(0)[1:])]
+        view.flags.writeable = False
+        return LabelledTensor(view, self._parameter_positions.copy(), self._gate_positions.copy())
+
+    def entries(self, parameter_name: str) -> List[Tuple[str, ...]]:
+        """Gate names of the entries of a parameter which were ever set, sorted."""
+        return sorted(self._entries.get(parameter_name, ()))
+
+    def columns(self, parameter_name: str, entries: Sequence[Tuple[str, ...]]) -> np.ndarray:
+        """Values of the entries as (iteration x entry) array."""
+        gate_positions = np.array([[self._gate_positions[gate_name] for gate_name in gate_names]
+                                   for gate_names in entries], dtype=np.intp).reshape(len(entries), -1)
+        index = (slice(0, self._length), self._parameter_positions[parameter_name]) + tuple(gate_positions.T)
+        return self._values[index]
+
+    def flat_frame(self, column_name) -> pd.DataFrame:
+        """
+        :param column_name: Column name of an entry given as (parameter name, gate name, ...).
+        :return: One column per entry that was ever set.
+        """
+        data = dict()
+        for parameter_name in self._entries:
+            entries = self.entries(parameter_name)
+            for gate_names, column in zip(entries, self.columns(parameter_name, entries).T):
+                data[column_name(parameter_name, *gate_names)] = column
+        return pd.DataFrame(data, index=pd.RangeIndex(self._length))
+
+
+@functools.lru_cache(maxsize=None)
+def _split_column_name(name: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Kind of a History column: ('gradient', (parameter, gate)), ('covariance', (parameter, gate_1, gate_2)) or
+    ('flat', ()).
+    """
+    parts = name.split('#')
+    if len(parts) == 3 and parts[2] == 'grad':
+        return 'gradient', tuple(parts[:2])
+    if len(parts) == 4 and parts[3] == 'cov':
+        return 'covariance', tuple(parts[:3])
+    return 'flat', ()
+
+
+def _payload_nbytes(obj) -> int:
+    """Estimated memory of the arrays in an evaluator's to_hdf5 dict."""
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (pd.Series, pd.DataFrame)):
+        return obj.values.nbytes
+    if isinstance(obj, dict):
+        return sum(_payload_nbytes(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_payload_nbytes(value) for value in obj)
+    return 0
+
+
+class _EvaluatorDataCache:
+    """Least recently used evaluator data by reference. The array bytes of the cached entries are bounded."""
+    def __init__(self, max_nbytes: int):
+        self.max_nbytes = max_nbytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, reference):
+        return reference in self._entries
+
+    def put(self, reference, payload: dict):
+        nbytes = _payload_nbytes(payload)
+        if nbytes > self.max_nbytes:
+            return
+        if reference in self._entries:
+            self.nbytes -= self._entries.pop(reference)[1]
+        self._entries[reference] = (payload, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_nbytes:
+            _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= evicted_nbytes
+
+    def get(self, reference, load: Callable[[], dict]) -> dict:
+        """
+        :param reference:
+        :param load: Called on a cache miss.
+        :return: Cached or loaded evaluator data.
+        """
+        if reference in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(reference)
+            return self._entries[reference][0]
+        self.misses += 1
+        payload = load()
+        self.put(reference, payload)
+        return payload
+
+
+class EvaluatorDataReference:
+    """Location of the raw data of an evaluator on disk. See History.load_evaluator_data."""
+    __slots__ = ()
+
+    def load(self, reserved: dict, lazy_threshold: Optional[int] = None, mmap_threshold: Optional[int] = None) -> dict:
+        """
+        :param reserved: Objects which replace the reserved entries, i.e. the experiment.
+        :param lazy_threshold: See qtune.storage.from_hdf5.
+        :param mmap_threshold: See qtune.storage.from_hdf5.
+        :return: The to_hdf5 dict of the evaluator.
+        """
+        raise NotImplementedError()
+
+
+class _StoredEvaluatorData(EvaluatorDataReference):
+    """Entry of an EvaluatorDataStore."""
+    __slots__ = ('file_name', 'key')
+
+    def __init__(self, file_name: str, key: str):
+        self.file_name = file_name
+        self.key = key
+
+    def load(self, reserved, lazy_threshold=None, mmap_threshold=None):
+        with h5py.File(self.file_name, 'r') as root:
+            loaded = qtune.storage.from_hdf5(root[self.key], reserved, lazy_threshold, mmap_threshold)
+        return loaded['evaluator_data']
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(type(self).__name__, self.file_name, self.key)
+
+
+class _SavedStateEvaluatorData(EvaluatorDataReference):
+    """Evaluator of a saved Autotuner state. The evaluators of the tuners in [start, end) are searched."""
+    __slots__ = ('path', 'evaluator_name', 'start', 'end')
+
+    def __init__(self, path: str, evaluator_name: str, start: int = 0, end: Optional[int] = None):
+        self.path = path
+        self.evaluator_name = evaluator_name
+        self.start = start
+        self.end = end
+
+    def load(self, reserved, lazy_threshold=None, mmap_threshold=None):
+        autotuner = qtune.storage.from_file(self.path, reserved, lazy_threshold, mmap_threshold)['autotuner']
+        record = AutotunerRecord.from_autotuner(autotuner, fields=('evaluator_data',))
+        return record.evaluator_columns(self.start, self.end)[self.evaluator_name]
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(type(self).__name__, self.path, self.evaluator_name)
+
+
+class EvaluatorDataStore:
+    """
+    HDF5 file of evaluator data which is kept out of memory by a History. Every entry is written once and referenced
+    by an EvaluatorDataReference. A temporary file is used if no file name is given, which is removed together with the
+    store.
+    """
+    def __init__(self, file_name: Optional[str] = None):
+        if file_name is None:
+            handle, file_name = tempfile.mkstemp(suffix='.hdf5', prefix='qtune_evaluator_data_')
+            os.close(handle)
+            os.remove(file_name)
+            self._finalizer = weakref.finalize(self, _remove_file, file_name)
+        else:
+            directory = os.path.dirname(file_name)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._finalizer = None
+        self.file_name = file_name
+
+        if os.path.isfile(file_name):
+            with h5py.File(file_name, 'r') as root:
+                self._next_key = max((int(key) for key in root if key.isdigit()), default=-1) + 1
+        else:
+            self._next_key = 0
+
+    def put(self, evaluator_data: dict) -> EvaluatorDataReference:
+        """
+        Writes the to_hdf5 dict of an evaluator. The experiment is not written but reserved.
+        :param evaluator_data:
+        :return: Reference to the written entry.
+        """
+        key = str(self._next_key)
+        experiment = evaluator_data.get('experiment')
+        reserved = None if experiment is None else {'experiment': experiment}
+        with h5py.File(self.file_name, 'a') as root:
+            qtune.storage.to_hdf5(root.create_group(key), 'evaluator_data', evaluator_data, reserved=reserved)
+        self._next_key += 1
+        return _StoredEvaluatorData(self.file_name, key)
+
+
+def _remove_file(file_name: str):
+    if os.path.isfile(file_name):
+        os.remove(file_name)
+
+
 class History:
     """
-    Saves all relevant information of the Autotuner.
+    Saves all relevant information of the Autotuner. The information is kept in growable column buffers, so appending
+    is amortized constant time and the getters of single columns return views. Gradients and their covariances are
+    kept as (iteration x parameter x gate) and (iteration x parameter x gate x gate) arrays, see get_gradient_tensor
+    and get_covariance_tensor.
     """
     _parameter_variance_name = '{parameter_name}#var'
     _gradient_name = '{parameter_name}#{gate_name}#grad'
     _gradient_covariance_name = '{parameter_name}#{gate_name_1}#{gate_name_2}#cov'
 
-    def __init__(self, directory_or_file: Optional[str], experiment: Optional=None):
+    def __init__(self, directory_or_file: Optional[str], experiment: Optional=None,
+                 lazy_threshold: Optional[int] = None, mmap_threshold: Optional[int] = None,
+                 evaluator_cache_size: Optional[int] = None, evaluator_data_file: Optional[str] = None):
         """
         Initialize the history by loading an HDF5 library or a single entry from a library or starting a new history.
         :param directory_or_file: Directory of the HDF5 library if the whole library shall be reloaded. Single
         file of the library if only one entry in the library shall be loaded. None if a new history shall be
         initialized.
         :param experiment: Experiment corresponding to the Autotuner. Can be None.
+        :param lazy_threshold: Arrays of at least this many bytes, like the raw data of the evaluators, are only read
+        from the library when they are accessed. Everything is read on loading if None.
+        :param mmap_threshold: Arrays of at least this many bytes which are stored contiguous and unfiltered are mapped
+        read only from the library files instead of being copied into memory. See qtune.storage.from_hdf5.
+        :param evaluator_cache_size: Keep the raw evaluator data on disk and at most this many bytes of it in a least
+        recently used cache. The data of saved states is referenced where it is stored and the data of appended
+        Autotuners is written to evaluator_data_file. See load_evaluator_data. Everything is kept in memory if None.
+        :param evaluator_data_file: File for the evaluator data of appended Autotuners if evaluator_cache_size is given.
+        If None, follow_autotuner uses the storage directory of the Autotuner and a temporary file is used otherwise.
         """
-        self._data_frame = pd.DataFrame()
+        self._columns = _ColumnBuffer()
+        self._gradients = _TensorBuffer(n_gate_axes=1)
+        self._covariances = _TensorBuffer(n_gate_axes=2)
+        self._frame_cache = (None, None)
+        self._pyramids = dict()
         self._gate_names = set()
         self._parameter_names = set()
         self._gradient_controlled_parameters = dict()
-        self._evaluator_data = pd.DataFrame()
+        self._evaluator_columns = _ColumnBuffer(dtype=object)
+        self._evaluator_data_paths = None
         self._evaluator_names = []
+        self._evaluator_cache = None if evaluator_cache_size is None else _EvaluatorDataCache(evaluator_cache_size)
+        self._evaluator_data_file = evaluator_data_file
+        self._evaluator_store = None
+        # evaluator data of the last appended record which was written to the store, by id
+        self._stored_evaluator_data = dict()
         self.experiment = experiment
         self._logger = 'qtune'
         self._paths_for_reload = []
+        self._lazy_threshold = lazy_threshold
+        self._mmap_threshold = mmap_threshold
         if directory_or_file is None:
             pass
+        elif qtune.storage.NpyDirectoryBackend.handles(directory_or_file):
+            self.load_file(directory_or_file)
         elif os.path.isdir(directory_or_file):
             self.load_directory(directory_or_file)
         elif os.path.isfile(directory_or_file):
-            self.load_file(directory_or_file)
+            if qtune.storage.is_journal(directory_or_file):
+                self.load_journal(directory_or_file)
+            else:
+                self.load_file(directory_or_file)
         else:
             raise RuntimeWarning("The directory of file used to instantiate the qtune.history.History object could not"
                                  "be identified as such. An empty History object is instantiated.")
@@ -170,6 +602,42 @@ class History:
     def gradient_controlled_parameter_names(self) -> Dict[str, Set[str]]:
         return self._gradient_controlled_parameters
 
+    @property
+    def _data_frame(self) -> pd.DataFrame:
+        """All information in the flat column layout of read_autotuner_to_data_frame. Cached until the next change."""
+        versions, frame = self._frame_cache
+        current_versions = (self._columns.version, self._gradients.version, self._covariances.version)
+        if versions != current_versions:
+            frame = pd.concat([self._columns.frame(self._columns.names),
+                               self._gradients.flat_frame(self.create_gradient_name),
+                               self._covariances.flat_frame(self.create_gradient_covariance_name)], axis=1)
+            frame = frame[sorted(frame.columns)]
+            self._frame_cache = (current_versions, frame)
+        return frame
+
+    def _append_row(self, columns: Dict[str, float]):
+        self._columns.append_row(dict())
+        self._gradients.append_row()
+        self._covariances.append_row()
+        self._update_last_row(columns)
+
+    def _update_last_row(self, columns: Dict[str, float]):
+        flat, gradients, covariances = dict(), dict(), dict()
+        parts = {'flat': flat, 'gradient': gradients, 'covariance': covariances}
+        for name, value in columns.items():
+            kind, key = _split_column_name(name)
+            parts[kind][key or name] = value
+        self._columns.update_last_row(flat)
+        self._gradients.update_last_row(gradients)
+        self._covariances.update_last_row(covariances)
+
+    @property
+    def _evaluator_data(self) -> pd.DataFrame:
+        """Evaluator data or EvaluatorDataReference by iteration and evaluator name."""
+        if self._evaluator_data_paths is not None:
+            self._load_evaluator_data()
+        return self._evaluator_columns.to_frame()
+
     @property
     def evaluator_names(self):
         return self._evaluator_data.columns
@@ -180,28 +648,113 @@ class History:
 
     @property
     def evaluator_data(self):
-        return self._evaluator_data[list(self.evaluator_names)]
+        """All evaluator data. Data which is kept out of memory is read completely, see load_evaluator_data."""
+        return self.get_evaluator_data()
 
     @property
     def number_of_stored_iterations(self):
-        return self._data_frame.index.size
+        return len(self._columns)
 
     def get_reload_path(self, i):
         return self._paths_for_reload[i]
 
     def get_evaluator_data(self, evaluator_names=None):
         if evaluator_names is None:
-            evaluator_names = self.evaluator_names
-        return self._evaluator_data[evaluator_names]
+            evaluator_names = list(self.evaluator_names)
+        evaluator_data = self._evaluator_data[evaluator_names]
+        if self._evaluator_cache is None:
+            return evaluator_data
+        if isinstance(evaluator_data, pd.Series):
+            return evaluator_data.map(self._resolve_evaluator_data)
+        return evaluator_data.applymap(self._resolve_evaluator_data)
+
+    def load_evaluator_data(self, iteration: int, evaluator_name: str) -> Optional[dict]:
+        """
+        Raw data of a single evaluator. Data which is kept out of memory is read on demand and cached.
+        :param iteration: Position in the History.
+        :param evaluator_name:
+        :return: The to_hdf5 dict of the evaluator or None if there is no data of the evaluator in this iteration.
+        """
+        if self._evaluator_data_paths is not None:
+            self._load_evaluator_data()
+        if evaluator_name not in self._evaluator_columns:
+            return None
+        evaluator_data = self._resolve_evaluator_data(self._evaluator_columns.column(evaluator_name)[iteration])
+        return evaluator_data if isinstance(evaluator_data, dict) else None
+
+    def _resolve_evaluator_data(self, evaluator_data):
+        if isinstance(evaluator_data, EvaluatorDataReference):
+            return self._evaluator_cache.get(evaluator_data,
+                                             functools.partial(evaluator_data.load, {'experiment': self.experiment},
+                                                               self._lazy_threshold, self._mmap_threshold))
+        return evaluator_data
+
+    def _evaluator_data_store(self) -> EvaluatorDataStore:
+        if self._evaluator_store is None:
+            self._evaluator_store = EvaluatorDataStore(self._evaluator_data_file)
+        return self._evaluator_store
+
+    def _evaluator_cells(self, record: 'AutotunerRecord', path, start: int = 0,
+                         end: Optional[int] = None) -> Dict[str, object]:
+        """
+        Values of the evaluator buffer for a range of tuners. If the data is kept out of memory, these are references to
+        the saved state if only the evaluator names were projected and to the evaluator data store otherwise.
+        """
+        columns = record.evaluator_columns(start, end)
+        if self._evaluator_cache is None or not columns:
+            return columns
+
+        # the data of tuners which did not change since the last record is not written again
+        current_ids = {id(evaluator_data) for tuner_evaluator_data in record.evaluator_data
+                       for _, evaluator_data in tuner_evaluator_data}
+        self._stored_evaluator_data = {data_id: stored for data_id, stored in self._stored_evaluator_data.items()
+                                       if data_id in current_ids}
+        cells = dict()
+        for evaluator_name, evaluator_data in columns.items():
+            if evaluator_data is None:
+                cells[evaluator_name] = _SavedStateEvaluatorData(path, evaluator_name, int(start), end)
+            elif id(evaluator_data) in self._stored_evaluator_data:
+                cells[evaluator_name] = self._stored_evaluator_data[id(evaluator_data)][1]
+            else:
+                reference = self._evaluator_data_store().put(evaluator_data)
+                self._evaluator_cache.put(reference, evaluator_data)
+                self._stored_evaluator_data[id(evaluator_data)] = (evaluator_data, reference)
+                cells[evaluator_name] = reference
+        return cells
 
     def get_parameter_values(self, parameter_name) -> pd.Series:
-        return self._data_frame[parameter_name]
+        return self._columns.series(parameter_name)
 
     def get_parameter_std(self, parameter_name) -> pd.Series:
-        return self._data_frame[self._parameter_variance_name.format(parameter_name=parameter_name)].apply(np.sqrt)
+        return np.sqrt(self._columns.series(self._parameter_variance_name.format(parameter_name=parameter_name)))
 
     def get_gate_values(self, gate_name) -> pd.Series:
-        return self._data_frame[gate_name]
+        """
+        :param gate_name: Name of a gate or list of gate names.
+        :return: Series of the gate or DataFrame of the gates.
+        """
+        if pd.api.types.is_list_like(gate_name):
+            return self._columns.frame(list(gate_name))
+        return self._columns.series(gate_name)
+
+    def get_gradient_tensor(self) -> LabelledTensor:
+        """
+        :return: History of all gradients as (iteration x parameter x gate) array.
+        """
+        return self._gradients.tensor()
+
+    def get_covariance_tensor(self) -> LabelledTensor:
+        """
+        :return: History of all gradient covariances as (iteration x parameter x gate x gate) array.
+        """
+        return self._covariances.tensor()
+
+    def _tensor_frame(self, tensor: _TensorBuffer, parameter_name: str, entries: Sequence[Tuple[str, ...]],
+                      labels) -> pd.DataFrame:
+        if not entries:
+            return pd.DataFrame(index=pd.RangeIndex(len(self._columns)))
+        return pd.DataFrame(tensor.columns(parameter_name, entries), index=pd.RangeIndex(len(self._columns)),
+                            columns=labels)
 
     def get_gradients(self, parameter_name: str) -> pd.DataFrame:
         """
@@ -209,23 +762,17 @@ class History:
         :param parameter_name: Parameter of the gradient of interest.
         :return: Gradient history.
         """
-        regex = re.compile(self._gradient_name.format(parameter_name=parameter_name,
-                                                      gate_name=r'([\w\s\d]+)'))
-        return self._data_frame.filter(regex=regex).rename(lambda name: regex.findall(name)[0], axis='columns')
+        entries = self._gradients.entries(parameter_name)
+        return self._tensor_frame(self._gradients, parameter_name, entries, [gate_name for gate_name, in entries])
 
     def get_gradient_covariances(self, parameter_name) -> pd.DataFrame:
         """
         History of a gradients covariance.
         :param parameter_name: Parameter of the gradient's covariance of interest.
-        :return: Gradient covariance history.
+        :return: Gradient covariance history with the gate pairs as columns.
         """
-        regex = re.compile(self._gradient_covariance_name.format(parameter_name=parameter_name,
-                                                                 gate_name_1=r'([\w\s\d]+)',
-                                                                 gate_name_2=r'([\w\s\d]+)'))
-        df = self._data_frame.filter(regex=regex)
-        df = df[sorted(df.columns, key=regex.findall)]
-
-        return pd.DataFrame(df, columns=pd.MultiIndex.from_tuples(map(regex.findall, df.columns)))
+        entries = self._covariances.entries(parameter_name)
+        return self._tensor_frame(self._covariances, parameter_name, entries, pd.MultiIndex.from_tuples(entries))
 
     def get_gradient_variances(self, parameter_name) -> pd.DataFrame:
         """
@@ -233,10 +780,63 @@ class History:
         :param parameter_name: Parameter of the gradient's covariance of interest.
         :return: History of the diagonal of the covariance matrix.
         """
-        regex = re.compile(self._gradient_covariance_name.format(parameter_name=parameter_name,
-                                                                 gate_name_1=r'(?P<gatename>[\w\s\d]+)',
-                                                                 gate_name_2=r'(?P=gatename)'))
-        return self._data_frame.filter(regex=regex).rename(columns=lambda name: regex.search(name).group('gatename'))
+        entries = [(gate_1, gate_2) for gate_1, gate_2 in self._covariances.entries(parameter_name)
+                   if gate_1 == gate_2]
+        return self._tensor_frame(self._covariances, parameter_name, entries, [gate_name for gate_name, _ in entries])
+
+    def _column_values(self, column_name: str) -> np.ndarray:
+        kind, key = _split_column_name(column_name)
+        if kind == 'flat':
+            return self._columns.column(column_name)
+        tensor = self._gradients if kind == 'gradient' else self._covariances
+        return tensor.columns(key[0], [key[1:]])[:, 0]
+
+    def query(self, columns: Sequence[str], start: int = 0, stop: Optional[int] = None,
+              max_points: Optional[int] = None, method: str = 'minmax') -> pd.DataFrame:
+        """
+        Range of iterations of some columns for plotting. With max_points the iterations are downsampled so that the
+        plot looks the same: 'minmax' keeps the minimum and maximum of every column in each bucket of iterations and
+        'lttb' selects points with the largest-triangle-three-buckets algorithm from such a min/max preselection. The
+        extrema of complete buckets are cached per column in a qtune.downsampling.MinMaxPyramid, so the cost depends on
+        max_points and not on the length of the range.
+        :param columns: Column names of the flat layout, i.e. gate names, parameter names and names created by
+        create_name_parameter_variance, create_gradient_name or create_gradient_covariance_name.
+        :param start: First iteration. Negative values count from the end.
+        :param stop: Iteration after the last one. The end of the History if None.
+        :param max_points: Upper bound of the points per column. All iterations are returned if None.
+        :param method: 'minmax' or 'lttb'.
+        :return: The selected iterations of all columns indexed by iteration.
+        """
+        if method not in ('minmax', 'lttb'):
+            raise ValueError('Unknown downsampling method', method)
+        start, stop, _ = slice(start, stop).indices(len(self._columns))
+        stop = max(start, stop)
+        values = {column_name: self._column_values(column_name) for column_name in columns}
+
+        if max_points is None or stop - start <= max_points:
+            positions = np.arange(start, stop)
+        else:
+            selected = [self._downsample(column_name, column_values, start, stop, max_points, method)
+                        for column_name, column_values in values.items()]
+            positions = functools.reduce(np.union1d, selected, np.arange(0))
+
+        return pd.DataFrame({column_name: column_values[positions] for column_name, column_values in values.items()},
+                            index=pd.Index(positions), columns=list(columns))
+
+    def _downsample(self, column_name: str, values: np.ndarray, start: int, stop: int, max_points: int,
+                    method: str) -> np.ndarray:
+        pyramid = self._pyramids.get(column_name)
+        if pyramid is None:
+            pyramid = self._pyramids[column_name] = qtune.downsampling.MinMaxPyramid()
+        # all rows but the last one are final
+        pyramid.update(values, max(len(values) - 1, len(pyramid)))
+
+        # two points per bucket, one bucket for the alignment and both ends
+        n_buckets = max(1, (max_points if method == 'minmax' else 4 * max_points) // 2 - 2)
+        positions = pyramid.min_max_indices(values, start, stop, n_buckets)
+        if method == 'lttb':
+            positions = positions[qtune.downsampling.lttb_indices(positions, values[positions], max_points)]
+        return positions
 
     def read_autotuner_to_data_frame(self, autotuner: qtune.autotuner.Autotuner, start: int = 0,
                                      end: Optional[int] = None) -> pd.DataFrame:
@@ -247,42 +847,28 @@ class History:
         :param end:  End of the index in the History.
         :return: Dataframe of the voltages, parameters, variances, gradients, gradient's covariances and the tuner index
         """
-        if end is None:
-            end = len(autotuner.tuning_hierarchy)
-        elif end == 0:
-            voltages = extract_voltages_from_hierarchy(autotuner.tuning_hierarchy)
-            return pd.DataFrame(dict(voltages), index=[0, ])
-
-        if self._data_frame.empty:
-            voltages = extract_voltages_from_hierarchy(autotuner.tuning_hierarchy)
-            self._gate_names = set(voltages.index)
-            parameters, variances = extract_parameters_from_hierarchy(autotuner.tuning_hierarchy)
-            self._parameter_names = set(parameters.index)
-            gradients, grad_covariances = extract_gradients_from_hierarchy(autotuner.tuning_hierarchy)
-            self._gradient_controlled_parameters = {parameter_name: set(gradient.index) or set()
-                                                    for parameter_name, gradient in gradients.items()}
+        record = AutotunerRecord.from_autotuner(autotuner, fields=AutotunerRecord.columns)
+        return pd.DataFrame(self._record_columns(record, start=start, end=end), index=[0, ], dtype=float)
+
+    def _record_columns(self, record: 'AutotunerRecord', start: int = 0, end: Optional[int] = None) -> Dict[str, float]:
+        """History columns of a record. See read_autotuner_to_data_frame."""
+        voltages = dict(zip(record.voltages.dtype.names, record.voltages.tolist()))
+        if end == 0:
+            return voltages
+
+        if not len(self._columns):
+            self._gate_names = set(voltages)
+            self._parameter_names = set(record.parameter_names())
+            self._gradient_controlled_parameters = {parameter_name: set(gate_names)
+                                                    for parameter_name, gate_names in record.gradient_gates().items()}
+            columns = record.tuner_columns()
         else:
-            relevant_hierarchy = autotuner.tuning_hierarchy[int(start):end]
-            voltages = extract_voltages_from_hierarchy(autotuner.tuning_hierarchy)
             # voltages are extracted from the first and therefore most updated partuner
-            parameters, variances = extract_parameters_from_hierarchy(relevant_hierarchy)
-            gradients, grad_covariances = extract_gradients_from_hierarchy(relevant_hierarchy)
-
-        voltages = dict(voltages)
-        parameters = dict(parameters)
-        variances = {self._parameter_variance_name.format(parameter_name=par_name): variance
-                     for par_name, variance in variances.items()}
-        gradients = {self._gradient_name.format(parameter_name=par_name, gate_name=gate_name): grad_entry
-                     for par_name, gradient in gradients.items()
-                     for gate_name, grad_entry in gradient.items()}
-        grad_covariances = {k: v
-                            for parameter_name, gradient_covariance_matrix in grad_covariances.items()
-                            for k, v in self._unravel_gradient_covariance_matrix(parameter_name,
-                                                                                 gradient_covariance_matrix).items()}
-        tuner_index = {"tuner_index": autotuner.current_tuner_index}
-
-        return pd.DataFrame({**voltages, **parameters, **variances, **gradients, **grad_covariances,
-                             **tuner_index}, index=[0, ], dtype=float)
+            columns = record.tuner_columns(start, end)
+
+        tuner_index = {"tuner_index": record.current_tuner_index}
+
+        return {**voltages, **columns, **tuner_index}
 
     def append_autotuner(self, autotuner: qtune.autotuner.Autotuner, path = None):
         """
@@ -292,63 +878,211 @@ class History:
         """
         if path is None:
             path = autotuner.last_save_file
+        self.append_record(AutotunerRecord.from_autotuner(autotuner), path)
 
-        voltages = extract_voltages_from_hierarchy(autotuner.tuning_hierarchy).sort_index()
-        evaluated_tuner_index = autotuner.current_tuner_index
-        if autotuner.voltages_to_set is not None or autotuner.current_tuner_status:
-            evaluated_tuner_index += 1
+    def follow_autotuner(self, autotuner: qtune.autotuner.Autotuner,
+                         fields: Sequence[str] = None) -> 'AutotunerFeed':
+        """
+        Appends every iteration of the Autotuner to the History from its change events. Only the tuners which changed
+        in an iteration are projected again.
+        :param autotuner:
+        :param fields: Information to extract. See AutotunerRecord.fields. Everything is extracted if None.
+        :return: The subscription. Call its close method to stop following.
+        """
+        if self._evaluator_cache is not None and self._evaluator_store is None and self._evaluator_data_file is None \
+                and autotuner.hdf5_storage_path:
+            self._evaluator_data_file = os.path.join(autotuner.hdf5_storage_path,
+                                                     qtune.storage.EVALUATOR_DATA_FILE_NAME)
+        return AutotunerFeed(self, autotuner, AutotunerRecord.fields if fields is None else fields)
 
-        if self._data_frame.empty:
+    def follow_directory(self, path: str, use_inotify: bool = True) -> 'DirectoryFollower':
+        """
+        Follows a storage directory that is written by a running Autotuner. The History should not contain entries of
+        the directory yet because the first poll appends all existing ones.
+        :param path: Storage directory with saved states or a journal.
+        :param use_inotify: Use inotify to notice new entries where it is available instead of checking the
+        modification time on every poll.
+        :return: The follower. Call its poll or wait method to append new entries and its close method when done.
+        """
+        return DirectoryFollower(self, path, use_inotify=use_inotify)
+
+    def append_record(self, record: 'AutotunerRecord', path=None):
+        """
+        Appends the projection of an Autotuner instance to the History.
+        :param record: Projection created by AutotunerRecord.from_autotuner.
+        :param path: Path from which the Autotuner can be reloaded.
+        :return: None
+        """
+        evaluated_tuner_index = record.evaluated_tuner_index
+        # records without evaluator data, e.g. from the summary table, leave the evaluator rows to be loaded later
+        with_evaluator_data = record.evaluator_data is not None
+        if with_evaluator_data and self._evaluator_data_paths is not None:
+            # the evaluator rows of a loaded summary precede the ones of this record
+            self._load_evaluator_data()
+
+        if not len(self._columns):
             self._paths_for_reload.append(path)
-            new_information = self.read_autotuner_to_data_frame(autotuner)
-            self._data_frame = self._data_frame.append(new_information, ignore_index=True, sort=True)
-            new_evaluator_data = read_evaluator_data_from_autotuner(autotuner)
-            for evaluator_name in new_evaluator_data.columns:
-                if new_evaluator_data.loc[new_evaluator_data.index[0], evaluator_name]['raw_y_data'] is None:
-                    new_evaluator_data.loc[new_evaluator_data.index[0], evaluator_name] = np.nan
-            self._evaluator_data = self._evaluator_data.append(new_evaluator_data, ignore_index=True, sort=True)
-        if voltages.equals(self._data_frame[sorted(self.gate_names)].iloc[-1]):
+            self._append_row(self._record_columns(record))
+            if with_evaluator_data:
+                self._evaluator_columns.append_row({
+                    evaluator_name: np.nan if isinstance(eval_data, dict) and eval_data['raw_y_data'] is None
+                    else eval_data
+                    for evaluator_name, eval_data in self._evaluator_cells(record, path).items()})
+
+        gate_names = sorted(self.gate_names)
+        if record.voltages.dtype.names == tuple(gate_names) and \
+                np.array_equal(np.array(record.voltages.tolist(), dtype=float), self._columns.last_row(gate_names),
+                               equal_nan=True):
             # stay in the row
             self._paths_for_reload[-1] = path
-            start = self._data_frame['tuner_index'].iloc[-1]
-            new_information = self.read_autotuner_to_data_frame(autotuner, start=start, end=evaluated_tuner_index)
-            self._data_frame.loc[self._data_frame.index[-1], new_information.columns] = new_information.iloc[0]
-            new_evaluator_data = read_evaluator_data_from_autotuner(autotuner, start=start, end=evaluated_tuner_index)
-            if not new_evaluator_data.empty:
-                self._evaluator_data.loc[self._evaluator_data.index[-1], new_evaluator_data.columns] = \
-                    new_evaluator_data.iloc[0]
+            start = self._columns.last_row(['tuner_index'])[0]
+            self._update_last_row(self._record_columns(record, start=start, end=evaluated_tuner_index))
+            new_evaluator_data = self._evaluator_cells(record, path, start=start, end=evaluated_tuner_index) \
+                if with_evaluator_data else None
+            if new_evaluator_data:
+                self._evaluator_columns.update_last_row(new_evaluator_data)
         else:
             self._paths_for_reload.append(path)
-            new_information = self.read_autotuner_to_data_frame(autotuner, end=evaluated_tuner_index)
-            self._data_frame = self._data_frame.append(new_information, ignore_index=True, sort=True)
-            new_evaluator_data = read_evaluator_data_from_autotuner(autotuner, end=evaluated_tuner_index)
-            self._evaluator_data = self._evaluator_data.append(new_evaluator_data, ignore_index=True, sort=True)
+            self._append_row(self._record_columns(record, end=evaluated_tuner_index))
+            if with_evaluator_data:
+                self._evaluator_columns.append_row(self._evaluator_cells(record, path, end=evaluated_tuner_index))
 
-    def load_directory(self, path):
+    def load_directory(self, path, multiprocess: bool = False, max_workers: Optional[int] = None,
+                       fields: Sequence[str] = None, use_summary: bool = True):
         """
-        Loads an HDF5 library.
+        Loads an HDF5 library. The Autotuners are projected on the stored information in the reader workers.
         :param path: Path of the library.
+        :param use_summary: Load the summary table of the library if it covers all saved states.
+        :param multiprocess: Read the files in a process pool. The experiment needs to be picklable in this case.
+        :param max_workers: Number of reader workers.
+        :param fields: Information to load. See AutotunerRecord.fields. Everything is loaded if None.
         :return: None
         """
-        with qtune.storage.ParallelHDF5Reader(reserved={'experiment': self.experiment}, multiprocess=False) as reader:
-            directory_content = [os.path.join(path, file)
-                                 for file in sorted(os.listdir(path))]
-            for file, loaded_data in zip(directory_content, reader.read_iter(directory_content)):
-                autotuner = loaded_data['autotuner']
-                self.append_autotuner(autotuner, file)
+        journal_file = os.path.join(path, qtune.storage.JOURNAL_FILE_NAME)
+        if os.path.isfile(journal_file):
+            entries = [qtune.storage.journal_entry_path(journal_file, iteration)
+                       for iteration in qtune.storage.read_journal_index(journal_file)['iteration']]
+        else:
+            entries = [os.path.join(path, file)
+                       for file in sorted(os.listdir(path))
+                       if _is_saved_state_name(file)]
+
+        summary_file = os.path.join(path, qtune.storage.SUMMARY_FILE_NAME)
+        if use_summary and os.path.isfile(summary_file):
+            summary = qtune.storage.read_summary(summary_file)
+            if summary.paths == entries:
+                self.load_summary(summary)
+                return
+            self.logger.info('The summary of %s does not cover all saved states and is not used.', path)
+
+        if os.path.isfile(journal_file):
+            self.load_journal(journal_file)
+        else:
+            self._load_files(entries, multiprocess=multiprocess, max_workers=max_workers, fields=fields)
+
+    def _load_files(self, file_names: Sequence[str], multiprocess: bool = False, max_workers: Optional[int] = None,
+                    fields: Sequence[str] = None):
+        if fields is None:
+            fields = AutotunerRecord.fields
+        projection = functools.partial(project_autotuner, fields=tuple(fields),
+                                       evaluator_payloads=self._evaluator_cache is None)
+
+        with qtune.storage.ParallelHDF5Reader(reserved={'experiment': self.experiment}, multiprocess=multiprocess,
+                                              max_workers=max_workers,
+                                              lazy_threshold=self._lazy_threshold,
+                                              mmap_threshold=self._mmap_threshold) as reader:
+            for file, record in zip(file_names, reader.read_iter(file_names, projection=projection)):
+                self.append_record(record, file)
+
+    def load_summary(self, summary: qtune.storage.SummaryTable):
+        """
+        Loads the summary table of a run which is written by the Autotuner with summary_index=True into an empty
+        History. The raw evaluator data is not part of the summary. It is read from the saved states when it is accessed
+        for the first time.
+        :param summary: Summary table read by qtune.storage.read_summary.
+        :return: None
+        """
+        layout = _SummaryLayout(summary.columns)
+        for path, values, present in zip(summary.paths, summary.values, summary.present):
+            self.append_record(AutotunerRecord.from_summary(layout, values, present), path)
+        self._evaluator_data_paths = (self._evaluator_data_paths or []) + list(summary.paths)
+
+    def _load_evaluator_data(self):
+        paths, self._evaluator_data_paths = self._evaluator_data_paths, None
+        history = History(None, experiment=self.experiment, lazy_threshold=self._lazy_threshold,
+                          mmap_threshold=self._mmap_threshold,
+                          evaluator_cache_size=None if self._evaluator_cache is None else 0)
+        history._load_files(paths, fields=('evaluator_data',))
+        self._evaluator_columns.extend(history._evaluator_columns)
+
+    def load_journal(self, path, start: int = 0, stop: Optional[int] = None):
+        """
+        Loads a range of entries of a journal file.
+        :param path: Path of the journal file.
+        :param start: Position of the first entry to load.
+        :param stop: Position after the last entry to load. All remaining entries are loaded if None.
+        :return: None
+        """
+        for entry_path, loaded_data in qtune.storage.read_journal(path, reserved={'experiment': self.experiment},
+                                                                  start=start, stop=stop,
+                                                                  lazy_threshold=self._lazy_threshold,
+                                                                  mmap_threshold=self._mmap_threshold):
+            self._append_saved_state(loaded_data['autotuner'], entry_path)
 
     def load_file(self, path):
         """
         Loads an entry of an HDF5 library.
-        :param path: Path of the library.
+        :param path: Path of the library, journal entry path or directory of the npy storage backend.
         :return: None
         """
-        hdf5_handle = h5py.File(path, mode="r")
-        loaded_data = qtune.storage.from_hdf5(hdf5_handle, reserved={"experiment": self.experiment})
-        autotuner = loaded_data["autotuner"]
-        self.append_autotuner(autotuner=autotuner, path=path)
-
-    def plot_tuning(self, voltage_indices=None, parameter_names=None, gradient_parameter_names=None, mode=""):
+        loaded_data = qtune.storage.from_file(path, reserved={"experiment": self.experiment},
+                                              lazy_threshold=self._lazy_threshold,
+                                              mmap_threshold=self._mmap_threshold)
+        self._append_saved_state(loaded_data["autotuner"], path)
+
+    def _append_saved_state(self, autotuner: qtune.autotuner.Autotuner, path: str):
+        # evaluator data which is kept out of memory is referenced in the saved state
+        self.append_record(AutotunerRecord.from_autotuner(autotuner, evaluator_payloads=self._evaluator_cache is None),
+                           path)
+
+    def query_parameters(self, parameter_names: Sequence[str], with_std: bool = False, **query_kwargs) \
+            -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+        """
+        Parameter values and standard deviations at the same iterations. See query.
+        :param parameter_names:
+        :param with_std: Also query the standard deviations.
+        :param query_kwargs: Range and downsampling passed to query.
+        :return: Values and standard deviations by parameter name. The standard deviations are None if not queried.
+        """
+        parameter_names = list(parameter_names)
+        variance_names = [self.create_name_parameter_variance(parameter_name) for parameter_name in parameter_names]
+        frame = self.query(parameter_names + variance_names if with_std else parameter_names, **query_kwargs)
+        if not with_std:
+            return frame, None
+        return frame[parameter_names], np.sqrt(frame[variance_names].set_axis(parameter_names, axis=1))
+
+    def query_gradients(self, parameter_name: str, with_variances: bool = False, **query_kwargs) \
+            -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+        """
+        Gradient and the diagonal of its covariance at the same iterations. See query.
+        :param parameter_name:
+        :param with_variances: Also query the variances.
+        :param query_kwargs: Range and downsampling passed to query.
+        :return: Gradient and variances by gate name. The variances are None if not queried.
+        """
+        gate_names = [gate_name for gate_name, in self._gradients.entries(parameter_name)]
+        gradient_names = [self.create_gradient_name(parameter_name, gate_name) for gate_name in gate_names]
+        variance_gates = [gate_1 for gate_1, gate_2 in self._covariances.entries(parameter_name) if gate_1 == gate_2]
+        variance_names = [self.create_gradient_covariance_name(parameter_name, gate_name, gate_name)
+                          for gate_name in variance_gates] if with_variances else []
+        frame = self.query(gradient_names + variance_names, **query_kwargs)
+        gradients = frame[gradient_names].set_axis(gate_names, axis=1)
+        if not with_variances:
+            return gradients, None
+        return gradients, frame[variance_names].set_axis(variance_gates, axis=1)
+
+    def plot_tuning(self, voltage_indices=None, parameter_names=None, gradient_parameter_names=None, mode="",
+                    max_points: Optional[int] = None):
         """
         Plots the History
         :param voltage_indices: Indices of the voltages to be plotted.
@@ -360,6 +1094,7 @@ class History:
         all_gradients: plot all gradients
         with_grad_covariances: plot the diagonal elements of the covariance matrix as error bars on the gradients.
         with_par_variences: plot the errors on the parameters.
+        :param max_points: Downsample long runs to at most this many points per curve. See query.
         :return: List of figures, List of Axes
         """
         if "all_voltages" in mode:
@@ -381,31 +1116,26 @@ class History:
             voltage_fig = None
             voltage_ax = None
         else:
-            voltage_fig, voltage_ax = plot_voltages(self._data_frame[voltage_indices])
+            voltage_fig, voltage_ax = plot_voltages(self.query(voltage_indices, max_points=max_points))
 
         if parameter_names is None:
             parameter_fig = None
             parameter_ax = None
         else:
-            if with_par_variances:
-                parameter_std = pd.DataFrame({par_name: self.get_parameter_std(parameter_name=par_name)
-                                              for par_name in parameter_names})
-            else:
-                parameter_std = None
-            parameter_fig, parameter_ax = plot_parameters(self._data_frame[parameter_names], parameter_std)
+            parameters, parameter_std = self.query_parameters(parameter_names, with_std=with_par_variances,
+                                                              max_points=max_points)
+            parameter_fig, parameter_ax = plot_parameters(parameters, parameter_std)
 
         if gradient_parameter_names is None:
             gradient_fig = None
             gradient_ax = None
         else:
-            gradients = {par_name: self.get_gradients(parameter_name=par_name)
-                         for par_name in gradient_parameter_names}
-            if with_grad_covariances:
-                gradient_variances = {par_name: self.get_gradient_variances(parameter_name=par_name)
-                                      for par_name in gradient_parameter_names}
-            else:
-                gradient_variances = None
-            gradient_fig, gradient_ax = plot_gradients(gradients, gradient_variances)
+            gradients, gradient_variances = dict(), dict()
+            for par_name in gradient_parameter_names:
+                gradients[par_name], gradient_variances[par_name] = self.query_gradients(
+                    par_name, with_variances=with_grad_covariances, max_points=max_points)
+            gradient_fig, gradient_ax = plot_gradients(gradients,
+                                                       gradient_variances if with_grad_covariances else None)
 
         return [voltage_fig, parameter_fig, gradient_fig], [voltage_ax, parameter_ax, gradient_ax]
 
@@ -417,8 +1147,10 @@ class History:
         :param evaluator_names: Names of the evaluator to be plotted.
         :return: Figure, Axes
         """
-        for name in evaluator_names:
-            if name not in self._evaluator_data.columns:
+        import matplotlib.pyplot as plt
+
+        for name in list(evaluator_names):
+            if name not in self.evaluator_names:
                 self.logger.warning(name + ' is not in the evaluation data.')
                 evaluator_names.remove(name)
 
@@ -427,18 +1159,11 @@ class History:
         eval_data_figs = []
         eval_data_axs = []
         for i in range(start, end):
-            if i not in self._evaluator_data.index:
+            if not 0 <= i < len(self._evaluator_columns):
                 raise RuntimeError('These indices are not in the aquired data!')
-            number_measurements = [
-                len(self._evaluator_data.loc[self._evaluator_data.index[i], evaluator]['measurements'])
-                for evaluator in evaluator_names
-                if not self._evaluator_data.loc[self._evaluator_data.index[i], evaluator] != self._evaluator_data.loc[
-                    self._evaluator_data.index[i], evaluator]]
-            relevant_evaluators = [
-                evaluator
-                for evaluator in evaluator_names
-                if not self._evaluator_data.loc[self._evaluator_data.index[i], evaluator] != self._evaluator_data.loc[
-                    self._evaluator_data.index[i], evaluator]]
+            evaluator_data = {evaluator: self.load_evaluator_data(i, evaluator) for evaluator in evaluator_names}
+            relevant_evaluators = [evaluator for evaluator in evaluator_names if evaluator_data[evaluator] is not None]
+            number_measurements = [len(evaluator_data[evaluator]['measurements']) for evaluator in relevant_evaluators]
             eval_data_fig, eval_data_ax = plt.subplots(nrows=2,
                                                        ncols=sum(number_measurements) // 2 + sum(
                                                            number_measurements) % 2)
@@ -447,11 +1172,10 @@ class History:
             ax_list = [eval_data_ax.ravel()[sum(number_measurements[0:j]):sum(number_measurements[0:j + 1])] for j in
                        range(len(number_measurements))]
             for evaluator, axs in zip(relevant_evaluators, ax_list):
-                plot_data = self._evaluator_data.loc[self._evaluator_data.index[i], evaluator]
-                if not plot_data != plot_data:
-                    plot_function_matching[evaluator](ax=axs, evaluator_hdf5=plot_data, evaluator=evaluator)
-                    for ax in axs:
-                        ax.set_title(evaluator)
+                plot_function_matching[evaluator](ax=axs, evaluator_hdf5=evaluator_data[evaluator],
+                                                  evaluator=evaluator)
+                for ax in axs:
+                    ax.set_title(evaluator)
             eval_data_fig.tight_layout()
         return eval_data_figs, eval_data_axs
 
@@ -459,18 +1183,14 @@ class History:
         if evaluator_name not in self.evaluator_names:
             self.logger.warning(evaluator_name + ' is not in the evaluation data.')
             return
-        plot_data = self._evaluator_data.loc[self._evaluator_data.index[tune_run_number], evaluator_name]
+        plot_data = self.load_evaluator_data(tune_run_number, evaluator_name)
         plot_function_matching[evaluator_name](ax=ax, evaluator_hdf5=plot_data, evaluator=evaluator_name)
 
     @classmethod
     def _unravel_gradient_covariance_matrix(cls, parameter_name, covariance_matrix: pd.DataFrame):
-        return {
-            cls._gradient_covariance_name.format(parameter_name=parameter_name,
-                                                 gate_name_1=gate_1,
-                                                 gate_name_2=gate_2): cov_entry
-            for gate_1, cov_column in covariance_matrix.items()
-            for gate_2, cov_entry in cov_column.items()
-        }
+        names = _covariance_column_names(cls._gradient_covariance_name, parameter_name,
+                                         tuple(covariance_matrix.columns), tuple(covariance_matrix.index))
+        return dict(zip(names, covariance_matrix.values.T.ravel().tolist()))
 
     @classmethod
     def create_name_parameter_variance(cls, parameter_name: str) -> str:
@@ -480,8 +1200,116 @@ class History:
     def create_gradient_name(cls, parameter_name: str, gate_name: str) -> str:
         return cls._gradient_name.format(parameter_name=parameter_name, gate_name=gate_name)
 
+    @classmethod
+    def create_gradient_covariance_name(cls, parameter_name: str, gate_name_1: str, gate_name_2: str) -> str:
+        return cls._gradient_covariance_name.format(parameter_name=parameter_name, gate_name_1=gate_name_1,
+                                                    gate_name_2=gate_name_2)
+
+
+class IncrementalQuery:
+    """
+    Result of History.query (or of a function with the same keyword arguments) for a History that grows. Each update
+    appends the rows which were added since the previous one and the result is downsampled again once it holds more than
+    twice max_points rows, so an update costs O(new rows) amortized instead of O(run length). The index and the columns
+    are views of append buffers which are valid until the next update.
+    """
+    def __init__(self, fetch: Callable[..., pd.DataFrame], start: Optional[int] = None, stop: Optional[int] = None,
+                 max_points: Optional[int] = None):
+        """
+        :param fetch: Called with start, stop and max_points. Returns the rows indexed by iteration like History.query.
+        :param start: First iteration. The result follows the end of the History if start and stop are None.
+        :param stop: Iteration after the last one.
+        :param max_points: See History.query.
+        """
+        self._fetch = fetch
+        self.start = start
+        self.stop = stop
+        self.max_points = max_points
+
+        self._index = np.empty(0, dtype=np.intp)
+        self._values = np.empty((0, 0))
+        self._columns = []
+        self._length = 0
+        # rows of the History covered by the last update
+        self._rows = 0
+
+    @property
+    def follows_end(self) -> bool:
+        return self.start is None and self.stop is None
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def columns(self) -> List[str]:
+        return self._columns
+
+    @property
+    def index(self) -> np.ndarray:
+        return self._index[:self._length]
+
+    def __getitem__(self, column_name: str) -> np.ndarray:
+        return self._values[:self._length, self._columns.index(column_name)]
+
+    def update(self, n_rows: int) -> bool:
+        """
+        :param n_rows: Current length of the History. Later rows are ignored because the History may be appended to
+        concurrently.
+        :return: True if the result may have changed.
+        """
+        if not self.follows_end:
+            # a fixed range is queried again until it is complete
+            if self._rows and self.stop is not None and self._rows > self.stop:
+                return False
+            self._replace(self._fetch(start=self.start or 0, stop=self.stop, max_points=self.max_points))
+        elif not self._rows or n_rows < self._rows:
+            self._replace(self._fetch(start=0, stop=n_rows, max_points=self.max_points))
+        else:
+            # the last row may have changed since the previous update
+            new_rows = self._fetch(start=max(0, self._rows - 1), stop=n_rows, max_points=None)
+            if list(new_rows.columns) != self._columns:
+                self._replace(self._fetch(start=0, stop=n_rows, max_points=self.max_points))
+            else:
+                self._append(new_rows)
+                if self.max_points is not None and self._length > 2 * self.max_points:
+                    self._replace(self._fetch(start=0, stop=n_rows, max_points=self.max_points))
+        self._rows = n_rows
+        return True
+
+    def _replace(self, frame: pd.DataFrame):
+        self._columns = list(frame.columns)
+        self._values = np.empty((0, len(self._columns)))
+        self._index = np.empty(0, dtype=np.intp)
+        self._length = 0
+        self._append(frame)
+
+    def _append(self, frame: pd.DataFrame):
+        # rows which were fetched before are replaced
+        self._length = int(np.searchsorted(self.index, frame.index[0])) if len(frame) else self._length
+        length = self._length + len(frame)
+        if length > len(self._index):
+            capacity = max(64, 2 * length)
+            index = np.empty(capacity, dtype=np.intp)
+            values = np.empty((capacity, len(self._columns)))
+            index[:self._length] = self.index
+            values[:self._length] = self._values[:self._length]
+            self._index, self._values = index, values
+        self._index[self._length:length] = frame.index.values
+        self._values[self._length:length] = frame.values
+        self._length = length
+
+
+@functools.lru_cache(maxsize=1024)
+def _covariance_column_names(name_template: str, parameter_name: str, gate_names_1: Tuple[str, ...],
+                             gate_names_2: Tuple[str, ...]) -> Tuple[str, ...]:
+    return tuple(name_template.format(parameter_name=parameter_name, gate_name_1=gate_1, gate_name_2=gate_2)
+                 for gate_1 in gate_names_1
+                 for gate_2 in gate_names_2)
+
 
 def plot_voltages(voltage_data_frame: pd.DataFrame):
+    import matplotlib.pyplot as plt
+
     voltage_fig, voltage_ax = plt.subplots()
     voltage_ax.plot(voltage_data_frame)
     voltage_ax.legend(voltage_data_frame.columns)
@@ -493,7 +1321,9 @@ def plot_voltages(voltage_data_frame: pd.DataFrame):
 
 def plot_parameters(parameter_data_frame: pd.DataFrame,
                     parameter_std: Optional[pd.DataFrame],
-                    axes: Optional[Sequence[matplotlib.axes.Axes]]=None):
+                    axes: Optional[Sequence['matplotlib.axes.Axes']]=None):
+    import matplotlib.pyplot as plt
+
     if parameter_std is None:
         parameter_std = pd.DataFrame()
     if axes is None:
@@ -511,7 +1341,9 @@ def plot_parameters(parameter_data_frame: pd.DataFrame,
 
 def plot_gradients(gradients: Dict[str, pd.DataFrame],
                    gradient_std: Optional[Dict[str, pd.DataFrame]],
-                   axes: Optional[Sequence[matplotlib.axes.Axes]]=None):
+                   axes: Optional[Sequence['matplotlib.axes.Axes']]=None):
+    import matplotlib.pyplot as plt
+
     if gradient_std is None:
         gradient_std = dict()
 
@@ -578,86 +1410,704 @@ def extract_diagonal_from_data_frame(df: pd.DataFrame) -> pd.Series:
 
 def read_evaluator_data_from_autotuner(autotuner: qtune.autotuner.Autotuner, start: int=0, end: Optional[int] = None) \
         -> pd.DataFrame:
-    if end is None:
-        end = len(autotuner.tuning_hierarchy)
-    relevant_tuner = autotuner.tuning_hierarchy[int(start):end]
-    evaluator_data = pd.DataFrame()
-    for par_tuner in relevant_tuner:
-        if isinstance(par_tuner, qtune.parameter_tuner.SensingDotTuner):
-            relevant_evaluators = par_tuner.cheap_evaluators
-            if not par_tuner.cheap_evaluation_only:
-                relevant_evaluators += par_tuner.expensive_evaluators
-            for evaluator in relevant_evaluators:
-                if evaluator.raw_data is not None:
-                    eval_data = evaluator.to_hdf5()
-                    evaluator_data[evaluator.name] = [eval_data, ]
+    return AutotunerRecord.from_autotuner(autotuner, fields=('evaluator_data',)).evaluator_frame(start=start, end=end)
+
+
+def _relevant_evaluators(par_tuner):
+    if isinstance(par_tuner, qtune.parameter_tuner.SensingDotTuner):
+        relevant_evaluators = list(par_tuner.cheap_evaluators)
+        if not par_tuner.cheap_evaluation_only:
+            relevant_evaluators += par_tuner.expensive_evaluators
+        return relevant_evaluators
+    else:
+        return par_tuner.evaluators
+
+
+class TunerRecord:
+    """
+    Information of a single parameter tuner. The values are stored in a structured numpy record whose fields are the
+    column names of the History.
+    """
+    __slots__ = ('columns', 'parameter_names', 'gradient_gates')
+
+    def __init__(self, columns: np.ndarray, parameter_names: Tuple[str, ...], gradient_gates: Dict[str, Tuple[str, ...]]):
+        self.columns = columns
+        self.parameter_names = parameter_names
+        self.gradient_gates = gradient_gates
+
+    @classmethod
+    def from_tuner(cls, par_tuner, fields: Sequence[str]) -> 'TunerRecord':
+        columns = dict()
+        parameter_names = ()
+        gradient_gates = dict()
+
+        if 'parameters' in fields or 'variances' in fields:
+            parameter, variance = par_tuner.last_parameters_and_variances
+            if isinstance(par_tuner, qtune.parameter_tuner.SubsetTuner):
+                relevant_parameters = par_tuner.solver.target.desired.index[
+                    ~par_tuner.solver.target.desired.apply(np.isnan)]
+                parameter = parameter[relevant_parameters]
+                variance = variance[relevant_parameters]
+            parameter_names = tuple(parameter.index)
+            if 'parameters' in fields:
+                columns.update(parameter.items())
+            if 'variances' in fields:
+                columns.update((History.create_name_parameter_variance(parameter_name), value)
+                               for parameter_name, value in variance.items())
+
+        if ('gradients' in fields or 'covariances' in fields) and \
+                isinstance(par_tuner.solver, qtune.solver.NewtonSolver):
+            for parameter_name, grad_est in zip(par_tuner.solver.target.index, par_tuner.solver.gradient_estimators):
+                gradient = grad_est.estimate()
+                if gradient is not None:
+                    gradient_gates[parameter_name] = tuple(gradient.index)
+                    if 'gradients' in fields:
+                        columns.update((History.create_gradient_name(parameter_name, gate_name), value)
+                                       for gate_name, value in gradient.items())
+                covariance = grad_est.covariance()
+                if covariance is not None and 'covariances' in fields:
+                    columns.update(History._unravel_gradient_covariance_matrix(parameter_name, covariance))
+
+        record = np.array(tuple(columns.values()), dtype=[(name, np.float64) for name in columns])
+        return cls(record, parameter_names, gradient_gates)
+
+    def column_kinds(self) -> Dict[str, Tuple[str, str, str]]:
+        """
+        :return: Kind ('parameter', 'variance', 'gradient' or 'covariance'), parameter name and gate name by column.
+        """
+        kinds = dict()
+        for parameter_name in self.parameter_names:
+            kinds[parameter_name] = ('parameter', parameter_name, '')
+            kinds[History.create_name_parameter_variance(parameter_name)] = ('variance', parameter_name, '')
+        for parameter_name, gate_names in self.gradient_gates.items():
+            for gate_name in gate_names:
+                kinds[History.create_gradient_name(parameter_name, gate_name)] = ('gradient', parameter_name, gate_name)
+        return {name: kinds.get(name, ('covariance', '', '')) for name in self.columns.dtype.names}
+
+
+class AutotunerRecord:
+    """
+    Compact projection of an Autotuner on the information stored in the History. Creating the record where the
+    Autotuner is loaded, e.g. in the workers of a qtune.storage.ParallelHDF5Reader, avoids transferring the whole object
+    graph.
+    """
+    fields = ('voltages', 'parameters', 'variances', 'gradients', 'covariances', 'evaluator_data')
+    columns = ('voltages', 'parameters', 'variances', 'gradients', 'covariances')
+
+    __slots__ = ('voltages', 'current_tuner_index', 'evaluated_tuner_index', 'tuners', 'evaluator_data')
+
+    def __init__(self, voltages: np.ndarray, current_tuner_index: int, evaluated_tuner_index: int,
+                 tuners: Sequence[TunerRecord], evaluator_data: Optional[Sequence[Sequence[Tuple[str, dict]]]]):
+        """
+        :param voltages: Structured numpy record with one field per gate, sorted by gate name.
+        :param current_tuner_index: Current tuner index of the Autotuner.
+        :param evaluated_tuner_index: Index of the first tuner which has not been evaluated at the current voltages.
+        :param tuners: One record per tuner in the tuning hierarchy.
+        :param evaluator_data: Name and data of the evaluators with raw data for each tuner. None if not projected.
+        The data is None if only the names were projected.
+        """
+        self.voltages = voltages
+        self.current_tuner_index = current_tuner_index
+        self.evaluated_tuner_index = evaluated_tuner_index
+        self.tuners = tuners
+        self.evaluator_data = evaluator_data
+
+    @classmethod
+    def from_autotuner(cls, autotuner: qtune.autotuner.Autotuner, fields: Sequence[str] = fields,
+                       evaluator_payloads: bool = True) -> 'AutotunerRecord':
+        """
+        Projects the Autotuner.
+        :param autotuner:
+        :param fields: Information to extract. Subset of AutotunerRecord.fields. The voltages are always extracted.
+        :param evaluator_payloads: Extract the data of the evaluators and not only their names.
+        :return: Projection of the Autotuner.
+        """
+        unknown_fields = set(fields) - set(cls.fields)
+        if unknown_fields:
+            raise ValueError('Unknown fields', unknown_fields)
+
+        tuners = [TunerRecord.from_tuner(par_tuner, fields) for par_tuner in autotuner.tuning_hierarchy]
+
+        if 'evaluator_data' in fields:
+            evaluator_data = [cls.tuner_evaluator_data(par_tuner, evaluator_payloads)
+                              for par_tuner in autotuner.tuning_hierarchy]
+        else:
+            evaluator_data = None
+
+        return cls(cls.autotuner_voltages(autotuner), autotuner.current_tuner_index,
+                   cls.evaluated_tuner_index_of(autotuner), tuners, evaluator_data)
+
+    @staticmethod
+    def autotuner_voltages(autotuner: qtune.autotuner.Autotuner) -> np.ndarray:
+        voltages = extract_voltages_from_hierarchy(autotuner.tuning_hierarchy).sort_index()
+        return np.array(tuple(voltages.values), dtype=[(gate_name, np.float64) for gate_name in voltages.index])
+
+    @staticmethod
+    def evaluated_tuner_index_of(autotuner: qtune.autotuner.Autotuner) -> int:
+        evaluated_tuner_index = autotuner.current_tuner_index
+        if autotuner.voltages_to_set is not None or autotuner.current_tuner_status:
+            evaluated_tuner_index += 1
+        return evaluated_tuner_index
+
+    @staticmethod
+    def tuner_evaluator_data(par_tuner, payloads: bool = True) -> List[Tuple[str, Optional[dict]]]:
+        return [(evaluator.name, evaluator.to_hdf5() if payloads else None)
+                for evaluator in _relevant_evaluators(par_tuner)
+                if evaluator.raw_data is not None]
+
+    def summary_columns(self) -> Dict[str, float]:
+        """
+        :return: Values of the record by column name of the summary table. See qtune.storage.append_summary.
+        """
+        columns = {_summary_column_name('voltage', gate_name): value
+                   for gate_name, value in zip(self.voltages.dtype.names, self.voltages.tolist())}
+        columns[_summary_column_name('tuner_index')] = self.current_tuner_index
+        columns[_summary_column_name('evaluated_tuner_index')] = self.evaluated_tuner_index
+        columns[_summary_column_name('tuners')] = len(self.tuners)
+        for tuner_idx, tuner in enumerate(self.tuners):
+            for (name, (kind, parameter_name, gate_name)), value in zip(tuner.column_kinds().items(),
+                                                                        tuner.columns.tolist()):
+                columns[_summary_column_name('tuner', tuner_idx, kind, name, parameter_name, gate_name)] = value
+        return columns
+
+    @classmethod
+    def from_summary(cls, layout: '_SummaryLayout', values: np.ndarray, present: np.ndarray) -> 'AutotunerRecord':
+        """
+        Recreates a record without evaluator data from a row of the summary table.
+        :param layout: Layout of the summary table columns.
+        :param values: Row of the summary table.
+        :param present: Mask of the values in the row.
+        :return:
+        """
+        voltage_present = present[layout.voltage_columns]
+        voltages = np.array(tuple(values[layout.voltage_columns[voltage_present]]),
+                            dtype=[(gate_name, np.float64) for gate_name in layout.gate_names[voltage_present]])
+
+        n_tuners = int(values[layout.index_columns['tuners']])
+        tuners = []
+        for tuner_idx in range(n_tuners):
+            if tuner_idx < len(layout.tuner_columns):
+                tuner_columns = layout.tuner_columns[tuner_idx]
+                tuner_present = present[tuner_columns]
+                dtype, parameter_names, gradient_gates = layout._tuner_layout(tuner_idx, tuner_present)
+                columns = np.array(tuple(values[tuner_columns[tuner_present]]), dtype=dtype)
+            else:
+                columns, parameter_names, gradient_gates = np.array((), dtype=[]), (), dict()
+            tuners.append(TunerRecord(columns, parameter_names, gradient_gates))
+
+        return cls(voltages,
+                   current_tuner_index=int(values[layout.index_columns['tuner_index']]),
+                   evaluated_tuner_index=int(values[layout.index_columns['evaluated_tuner_index']]),
+                   tuners=tuners,
+                   evaluator_data=None)
+
+    def voltage_series(self) -> pd.Series:
+        return pd.Series(self.voltages.tolist(), index=self.voltages.dtype.names, dtype=float)
+
+    def parameter_names(self) -> List[str]:
+        return [parameter_name for tuner in self.tuners for parameter_name in tuner.parameter_names]
+
+    def gradient_gates(self) -> Dict[str, Tuple[str, ...]]:
+        return {parameter_name: gate_names
+                for tuner in self.tuners for parameter_name, gate_names in tuner.gradient_gates.items()}
+
+    def tuner_columns(self, start: int = 0, end: Optional[int] = None) -> Dict[str, float]:
+        """
+        History columns of a range of tuners. Later tuners take precedence.
+        """
+        columns = dict()
+        for tuner in self.tuners[int(start):end]:
+            columns.update(zip(tuner.columns.dtype.names, tuner.columns.tolist()))
+        return columns
+
+    def evaluator_columns(self, start: int = 0, end: Optional[int] = None) -> Dict[str, dict]:
+        """
+        Evaluator data of a range of tuners by evaluator name. Later tuners take precedence.
+        """
+        columns = dict()
+        if self.evaluator_data is not None:
+            for tuner_evaluator_data in self.evaluator_data[int(start):end]:
+                columns.update(tuner_evaluator_data)
+        return columns
+
+    def evaluator_frame(self, start: int = 0, end: Optional[int] = None) -> pd.DataFrame:
+        """
+        Evaluator data of a range of tuners as single row DataFrame with one column per evaluator.
+        """
+        return pd.DataFrame({evaluator_name: [eval_data, ]
+                             for evaluator_name, eval_data in self.evaluator_columns(start, end).items()})
+
+
+class AutotunerFeed:
+    """
+    Subscription of a History to the events of an Autotuner. The records of the tuners are cached and only the tuners
+    named by an event are projected again, so the cost per iteration does not grow with the tuning hierarchy. Created
+    by History.follow_autotuner.
+    """
+    def __init__(self, history: History, autotuner: qtune.autotuner.Autotuner, fields: Sequence[str]):
+        unknown_fields = set(fields) - set(AutotunerRecord.fields)
+        if unknown_fields:
+            raise ValueError('Unknown fields', unknown_fields)
+
+        self.history = history
+        self.autotuner = autotuner
+        self.fields = tuple(fields)
+
+        n_tuners = len(autotuner.tuning_hierarchy)
+        self._tuners = [None] * n_tuners
+        self._evaluator_data = [None] * n_tuners
+        self._voltages = None
+
+        autotuner.subscribe(self)
+
+    def close(self):
+        """Stop following the Autotuner."""
+        self.autotuner.unsubscribe(self)
+
+    def __call__(self, event: qtune.autotuner.AutotunerEvent):
+        for tuner_idx in event.changed_tuners:
+            self._tuners[tuner_idx] = None
+            self._evaluator_data[tuner_idx] = None
+            if tuner_idx == 0:
+                # the voltages are extracted from the first tuner
+                self._voltages = None
+
+        if event.kind in qtune.autotuner.AutotunerEvent.iteration_kinds:
+            self.history.append_record(self.record(), event.autotuner.last_save_file)
+
+    def record(self) -> 'AutotunerRecord':
+        """
+        :return: Projection of the Autotuner that only extracts the tuners which changed since the last call.
+        """
+        autotuner = self.autotuner
+        if self._voltages is None:
+            self._voltages = AutotunerRecord.autotuner_voltages(autotuner)
+
+        with_evaluator_data = 'evaluator_data' in self.fields
+        for tuner_idx, par_tuner in enumerate(autotuner.tuning_hierarchy):
+            if self._tuners[tuner_idx] is None:
+                self._tuners[tuner_idx] = TunerRecord.from_tuner(par_tuner, self.fields)
+            if self._evaluator_data[tuner_idx] is None and with_evaluator_data:
+                self._evaluator_data[tuner_idx] = AutotunerRecord.tuner_evaluator_data(par_tuner)
+
+        return AutotunerRecord(self._voltages, autotuner.current_tuner_index,
+                               AutotunerRecord.evaluated_tuner_index_of(autotuner), list(self._tuners),
+                               list(self._evaluator_data) if with_evaluator_data else None)
+
+
+class _InotifyWatch:
+    """
+    Minimal inotify watch of the entries of a directory through ctypes. Raises OSError if inotify is not available.
+    """
+    # see <sys/inotify.h>
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    _event_header = struct.Struct('iIII')
+
+    def __init__(self, directory: str, mask: int = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('The C library has no inotify support')
+
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(fd, os.fsencode(directory), ctypes.c_uint32(mask)) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, 'inotify_add_watch failed', directory)
+        self._fd = fd
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        """
+        :param timeout: Seconds to wait at most. Waits indefinitely if None.
+        :return: True if there are events to read.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        return bool(readable)
+
+    def read(self) -> List[str]:
+        """
+        :return: Names of the directory entries with pending events. Empty if there are none.
+        """
+        names = []
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(buffer):
+                _, _, _, name_length = self._event_header.unpack_from(buffer, offset)
+                offset += self._event_header.size
+                name = buffer[offset:offset + name_length].rstrip(b'\0')
+                offset += name_length
+                if name:
+                    names.append(os.fsdecode(name))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class DirectoryFollower:
+    """
+    Tail of a storage directory that is written by a running Autotuner. Each call of poll appends the saved states or
+    journal entries which were written since the previous call, so the cost of an update does not grow with the run.
+    New entries are noticed through inotify where it is available and by checking the modification time of the
+    directory or journal otherwise. Created by History.follow_directory.
+    """
+    def __init__(self, history: History, directory: str, use_inotify: bool = True):
+        self.history = history
+        self.directory = directory
+        self._journal_file = os.path.join(directory, qtune.storage.JOURNAL_FILE_NAME)
+
+        # number of ingested journal entries
+        self._journal_position = 0
+        # names of the ingested saved states and of the new ones which could not be read yet
+        self._ingested = set()
+        self._pending = set()
+        # modification time and size of the directory or journal at the last check, None if everything has to be checked
+        self._checked_stamp = None
+
+        self._watch = None
+        if use_inotify:
+            try:
+                self._watch = _InotifyWatch(directory)
+            except OSError as err:
+                self.history.logger.info('Polling %s because inotify is not available: %s', directory, err)
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._watch is not None
+
+    @property
+    def number_of_pending_files(self) -> int:
+        """Number of new saved states or journals which could not be read yet because they are still being written."""
+        return len(self._pending)
+
+    def close(self):
+        """Stop watching the directory. The History keeps the appended entries."""
+        if self._watch is not None:
+            self._watch.close()
+            self._watch = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def poll(self) -> int:
+        """
+        Appends the entries which were written since the last call. The first call appends all existing entries.
+        :return: Number of appended entries.
+        """
+        if self._watch is None:
+            changed_names = None
+        elif self._checked_stamp is None:
+            # events that arrived before the first listing are covered by it
+            self._watch.read()
+            changed_names = None
+        else:
+            changed_names = self._watch.read()
+            if not changed_names and not self._pending:
+                return 0
+
+        if os.path.isfile(self._journal_file):
+            return self._poll_journal()
+        return self._poll_files(changed_names)
+
+    def wait(self, timeout: Optional[float] = None, interval: float = 1.) -> int:
+        """
+        Blocks until new entries were appended or the timeout passed.
+        :param timeout: Seconds to wait at most. Waits indefinitely if None.
+        :param interval: Seconds between two polls without inotify or while saved states are still being written.
+        :return: Number of appended entries.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            appended = self.poll()
+            if appended:
+                return appended
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return 0
+            sleep_time = interval if remaining is None else min(interval, remaining)
+            if self._watch is None:
+                time.sleep(sleep_time)
+            else:
+                self._watch.wait(sleep_time if self._pending else remaining)
+
+    @staticmethod
+    def _change_stamp(path: str) -> Optional[Tuple[int, int]]:
+        # the size is included because the modification time may be coarse
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _poll_journal(self) -> int:
+        stamp = self._change_stamp(self._journal_file)
+        if self._watch is None and stamp == self._checked_stamp:
+            return 0
+
+        history = self.history
+        appended = 0
+        try:
+            for entry_path, loaded_data in qtune.storage.read_journal(self._journal_file,
+                                                                      reserved={'experiment': history.experiment},
+                                                                      start=self._journal_position,
+                                                                      lazy_threshold=history._lazy_threshold,
+                                                                      mmap_threshold=history._mmap_threshold):
+                history._append_saved_state(loaded_data['autotuner'], entry_path)
+                self._journal_position += 1
+                appended += 1
+        except (OSError, KeyError) as err:
+            # the writer holds the file or has not written the index yet
+            history.logger.debug('Could not read the journal %s: %s', self._journal_file, err)
+            self._pending.add(qtune.storage.JOURNAL_FILE_NAME)
         else:
-            for evaluator in par_tuner.evaluators:
-                if evaluator.raw_data is not None:
-                    eval_data = evaluator.to_hdf5()
-                    evaluator_data[evaluator.name] = [eval_data, ]
-    return evaluator_data
+            self._pending.discard(qtune.storage.JOURNAL_FILE_NAME)
+            self._checked_stamp = stamp
+        return appended
+
+    def _poll_files(self, changed_names: Optional[List[str]]) -> int:
+        if changed_names is None:
+            stamp = self._change_stamp(self.directory)
+            if stamp == self._checked_stamp and not self._pending:
+                return 0
+            self._checked_stamp = stamp
+            changed_names = os.listdir(self.directory)
+
+        # names from events may have been renamed or removed since
+        candidates = sorted(name for name in self._pending.union(changed_names)
+                            if name not in self._ingested and _is_saved_state_name(name)
+                            and os.path.exists(os.path.join(self.directory, name)))
+        appended = 0
+        for position, name in enumerate(candidates):
+            try:
+                self.history.load_file(os.path.join(self.directory, name))
+            except (OSError, KeyError) as err:
+                # the file is still being written. The later ones are kept back to preserve the order.
+                self.history.logger.debug('Could not read %s yet: %s', name, err)
+                self._pending = set(candidates[position:])
+                return appended
+            self._ingested.add(name)
+            appended += 1
+        self._pending = set()
+        return appended
+
+
+@functools.lru_cache(maxsize=None)
+def _summary_column_name(*key) -> str:
+    return json.dumps(key)
+
+
+class _SummaryLayout:
+    """Assignment of the summary table columns to the parts of an AutotunerRecord."""
+    def __init__(self, columns: Sequence[str]):
+        keys = [json.loads(column) for column in columns]
+
+        self.gate_names = np.array([key[1] for key in keys if key[0] == 'voltage'], dtype=object)
+        self.voltage_columns = np.array([idx for idx, key in enumerate(keys) if key[0] == 'voltage'], dtype=np.intp)
+        order = np.argsort(self.gate_names)
+        self.gate_names, self.voltage_columns = self.gate_names[order], self.voltage_columns[order]
+
+        self.index_columns = {key[0]: idx for idx, key in enumerate(keys) if len(key) == 1}
+
+        n_tuners = max((key[1] + 1 for key in keys if key[0] == 'tuner'), default=0)
+        self.tuner_columns = [np.array([idx for idx, key in enumerate(keys) if key[0] == 'tuner' and key[1] == tuner],
+                                       dtype=np.intp)
+                              for tuner in range(n_tuners)]
+        self.tuner_keys = [[keys[idx][2:] for idx in tuner_columns] for tuner_columns in self.tuner_columns]
+        self._tuner_layouts = dict()
+
+    def _tuner_layout(self, tuner: int, present: np.ndarray):
+        cache_key = (tuner, present.tobytes())
+        if cache_key not in self._tuner_layouts:
+            keys = [key for key, is_present in zip(self.tuner_keys[tuner], present) if is_present]
+            dtype = np.dtype([(name, np.float64) for _, name, _, _ in keys])
+            parameter_names = tuple(name for kind, name, _, _ in keys if kind == 'parameter')
+            gradient_gates = dict()
+            for kind, _, parameter_name, gate_name in keys:
+                if kind == 'gradient':
+                    gradient_gates[parameter_name] = gradient_gates.get(parameter_name, ()) + (gate_name, )
+            self._tuner_layouts[cache_key] = dtype, parameter_names, gradient_gates
+        return self._tuner_layouts[cache_key]
+
+
+def project_autotuner(loaded_data: dict, fields: Sequence[str] = AutotunerRecord.fields,
+                      evaluator_payloads: bool = True) -> AutotunerRecord:
+    """
+    Projection for qtune.storage.ParallelHDF5Reader.read_iter which extracts the History information of a loaded
+    library entry.
+    """
+    return AutotunerRecord.from_autotuner(loaded_data['autotuner'], fields=fields,
+                                          evaluator_payloads=evaluator_payloads)
+
+
+def summarize_autotuner(autotuner: qtune.autotuner.Autotuner) -> Dict[str, float]:
+    """Summary columns of an Autotuner. Used by the writer for saved states with a summary index."""
+    return AutotunerRecord.from_autotuner(autotuner, fields=AutotunerRecord.columns).summary_columns()
+
+
+qtune.storage.summary_projections['Autotuner'] = summarize_autotuner
+
+
+def _is_saved_state_name(file_name: str) -> bool:
+    """True if the directory entry file_name of a storage directory is a saved state and no auxiliary file."""
+    return file_name not in (qtune.storage.BLOB_FILE_NAME, qtune.storage.SUMMARY_FILE_NAME,
+                             qtune.storage.EVALUATOR_DATA_FILE_NAME, qtune.storage.JOURNAL_FILE_NAME) \
+        and not file_name.endswith(qtune.storage.TEMPORARY_SUFFIX)
+
+
+def _load_run(directory: str, experiment, fields: Tuple[str, ...], use_summary: bool) -> pd.DataFrame:
+    """Worker of load_runs."""
+    # the raw evaluator data is only referenced and never read
+    history = History(None, experiment=experiment, evaluator_cache_size=0)
+    history.load_directory(directory, fields=fields, use_summary=use_summary)
+    return history._data_frame.assign(iteration=np.arange(history.number_of_stored_iterations))
+
+
+def load_runs(directories: Union[Sequence[str], Dict[str, str]], multiprocess: bool = True,
+              max_workers: Optional[int] = None, fields: Sequence[str] = AutotunerRecord.columns,
+              use_summary: bool = True, experiment=None) -> pd.DataFrame:
+    """
+    Loads the storage directories of many runs concurrently into one table for cross-run analysis.
+    :param directories: Storage directories of the runs or run ids mapped to storage directories. The directories
+    are the run ids if a sequence is given.
+    :param multiprocess: Load the runs in a process pool. A thread pool is used otherwise.
+    :param max_workers: Number of workers.
+    :param fields: Information to load. Subset of AutotunerRecord.columns, the raw evaluator data is not loaded.
+    :param use_summary: Load the summary tables of the runs where they cover all saved states.
+    :param experiment: Experiment passed to the Autotuners. Needs to be picklable if multiprocess.
+    :return: One row per run and iteration with the columns 'run' (categorical), 'iteration' and the History columns
+    in the flat layout. Columns which a run does not have are NaN. See write_run_table for exporting it.
+    """
+    if 'evaluator_data' in fields:
+        raise ValueError('The raw evaluator data is not part of the run table')
+    if isinstance(directories, dict):
+        run_ids, directories = list(directories), list(directories.values())
+    else:
+        directories = list(directories)
+        run_ids = directories
+
+    import concurrent.futures
+    if multiprocess:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    with executor:
+        tables = list(executor.map(_load_run, directories, itertools.repeat(experiment),
+                                   itertools.repeat(tuple(fields)), itertools.repeat(use_summary)))
+
+    for run_id, table in zip(run_ids, tables):
+        table['run'] = run_id
+    if tables:
+        table = pd.concat(tables, ignore_index=True, sort=False)
+    else:
+        table = pd.DataFrame(columns=['run', 'iteration'])
+    table['run'] = pd.Categorical(table['run'], categories=pd.unique(pd.Series(run_ids, dtype=object)))
+    table['iteration'] = table['iteration'].astype(np.int64)
+    return table[['run', 'iteration'] + sorted(set(table.columns) - {'run', 'iteration'})]
+
+
+def write_run_table(table: pd.DataFrame, file_name: str):
+    """
+    Writes a table of load_runs as Parquet file or, if the file name ends with .arrow or .feather, as Arrow IPC file.
+    Requires pyarrow.
+    :param table:
+    :param file_name:
+    :return: None
+    """
+    if importlib.util.find_spec('pyarrow') is None:
+        raise ImportError('Writing Parquet or Arrow files requires pyarrow')
+
+    if file_name.endswith(('.arrow', '.feather')):
+        table.reset_index(drop=True).to_feather(file_name)
+    else:
+        table.to_parquet(file_name, index=False)
 
 
 def plot_load_time(ax, evaluator_hdf5, **_):
-    qtune.util.plot_raw_data_fit(y_data=evaluator_hdf5['raw_y_data'], x_data=evaluator_hdf5['raw_x_data'],
-                                 fit_function=qtune.evaluator.func_load_time,
-                                 function_args=evaluator_hdf5['fit_results'],
-                                 initial_arguments=evaluator_hdf5['initial_fit_arguments'], ax=ax[0])
+    import qtune.plotting
+
+    qtune.plotting.plot_raw_data_fit(y_data=evaluator_hdf5['raw_y_data'], x_data=evaluator_hdf5['raw_x_data'],
+                                     fit_function=qtune.evaluator.func_load_time,
+                                     function_args=evaluator_hdf5['fit_results'],
+                                     initial_arguments=evaluator_hdf5['initial_fit_arguments'], ax=ax[0])
     ax[0].legend(['Data', 'Fit', 'Initial_parameters'])
 
 
 def plot_inter_dot_tc(ax, evaluator_hdf5: dict, **_):
+    import qtune.plotting
+
     if isinstance(ax, List) or isinstance(ax, Tuple) or isinstance(ax, np.ndarray):
         axi = ax[0]
     else:
         axi = ax
     if isinstance(axi, List) or isinstance(axi, Tuple) or isinstance(axi, np.ndarray):
         axi = axi[0]
-    qtune.util.plot_raw_data_fit(y_data=evaluator_hdf5['raw_y_data'], x_data=evaluator_hdf5['raw_x_data'],
-                                 fit_function=qtune.evaluator.func_inter_dot_coupling,
-                                 function_args=evaluator_hdf5['fit_results'],
-                                 initial_arguments=evaluator_hdf5['initial_fit_arguments'], ax=axi)
+    qtune.plotting.plot_raw_data_fit(y_data=evaluator_hdf5['raw_y_data'], x_data=evaluator_hdf5['raw_x_data'],
+                                     fit_function=qtune.evaluator.func_inter_dot_coupling,
+                                     function_args=evaluator_hdf5['fit_results'],
+                                     initial_arguments=evaluator_hdf5['initial_fit_arguments'], ax=axi)
     axi.legend(['Data', 'Fit', 'Initial_parameters'])
 
 
 def plot_lead_time(ax, evaluator_hdf5: dict, **_):
+    import qtune.plotting
+
     if isinstance(ax, List) or isinstance(ax, Tuple) or isinstance(ax, np.ndarray):
         axi = ax[0]
     else:
         axi = ax
     if isinstance(axi, List) or isinstance(axi, Tuple) or isinstance(axi, np.ndarray):
         axi = axi[0]
-    qtune.util.plot_raw_data_fit(y_data=evaluator_hdf5['raw_y_data'], x_data=evaluator_hdf5['raw_x_data'],
-                                 fit_function=qtune.evaluator.func_lead_times_v1,
-                                 function_args=evaluator_hdf5['fit_results'],
-                                 initial_arguments=evaluator_hdf5['initial_fit_arguments'], ax=axi)
+    qtune.plotting.plot_raw_data_fit(y_data=evaluator_hdf5['raw_y_data'], x_data=evaluator_hdf5['raw_x_data'],
+                                     fit_function=qtune.evaluator.func_lead_times_v1,
+                                     function_args=evaluator_hdf5['fit_results'],
+                                     initial_arguments=evaluator_hdf5['initial_fit_arguments'], ax=axi)
     axi.legend(['Data', 'Fit', 'Initial_parameters'])
 
 
 def plot_transition(ax, evaluator_hdf5: dict, **_):
+    import qtune.plotting
+
     for i, axi in enumerate(ax):
-        qtune.util.plot_raw_data_vertical_marks(y_data=evaluator_hdf5['raw_y_data'][i],
-                                                x_data=evaluator_hdf5['raw_x_data'][i],
-                                                marking_position=evaluator_hdf5['transition_positions'][i],
-                                                ax=axi)
+        qtune.plotting.plot_raw_data_vertical_marks(y_data=evaluator_hdf5['raw_y_data'][i],
+                                                    x_data=evaluator_hdf5['raw_x_data'][i],
+                                                    marking_position=evaluator_hdf5['transition_positions'][i],
+                                                    ax=axi)
         axi.set_title(evaluator_hdf5['parameters'][i])
 
 
 def plot_1dim_sensing_dot_scan(ax, evaluator_hdf5: dict, **_):
+    import qtune.plotting
+
     if isinstance(ax, Tuple) or isinstance(ax, List):
         ax = ax[0]
-    qtune.util.plot_raw_data_vertical_marks(y_data=evaluator_hdf5['raw_y_data'],
-                                            x_data=evaluator_hdf5['raw_x_data'],
-                                            marking_position=evaluator_hdf5['optimal_position'],
-                                            ax=ax)
+    qtune.plotting.plot_raw_data_vertical_marks(y_data=evaluator_hdf5['raw_y_data'],
+                                                x_data=evaluator_hdf5['raw_x_data'],
+                                                marking_position=evaluator_hdf5['optimal_position'],
+                                                ax=ax)
 
 
 def plot_2dim_sensing_dot_scan(ax, evaluator_hdf5: dict, **_):
-    qtune.util.plot_raw_data_2_dim_marks(y_data=evaluator_hdf5['raw_y_data'],
-                                         x_data=evaluator_hdf5['raw_x_data'],
-                                         ax=ax[0],
-                                         marking_position=evaluator_hdf5['new_voltages'])
+    import qtune.plotting
+
+    qtune.plotting.plot_raw_data_2_dim_marks(y_data=evaluator_hdf5['raw_y_data'],
+                                             x_data=evaluator_hdf5['raw_x_data'],
+                                             ax=ax[0],
+                                             marking_position=evaluator_hdf5['new_voltages'])
 
 
 def plot_average_evaluator(ax, evaluator_hdf5: dict, mode="last measurement", **_):
@@ -15,9 +15,8 @@
 # @email: julian.teske@rwth-aachen.de
 
 import numpy as np
-import scipy
+import scipy.linalg
 
-from filterpy.kalman import KalmanFilter
 
 from qtune.storage import HDF5Serializable
 
@@ -108,7 +107,8 @@ class KalmanGradient(metaclass=HDF5Serializable):
         # to the product of the number of gates and the number of parameters
         dim_x = self.n_pos_dim*self.n_values
         
-        # creating the KalmanFilter object
+        # creating the KalmanFilter object. filterpy is imported here because it imports scipy.stats which is slow
+        from filterpy.kalman import KalmanFilter
         self.filter = KalmanFilter(dim_x, self.n_values)
         
         # if no state transition function is given, 
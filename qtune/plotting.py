@@ -0,0 +1,108 @@
+# qtune: Automated fine tuning and optimization
+#
+#   Copyright (C) 2019  Julian D. Teske and Simon S. Humpohl
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation version 3 of the License.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+################################################################################
+
+# @email: julian.teske@rwth-aachen.de
+
+"""Plotting helpers for raw measurement data. This module imports matplotlib and is only imported when plotting."""
+
+import numbers
+from typing import Optional, Dict
+
+import matplotlib.axes
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+
+__all__ = ['plot_raw_data_fit', 'plot_raw_data_vertical_marks', 'plot_raw_data_2_dim_marks']
+
+
+def plot_raw_data_fit(y_data: np.ndarray, x_data: Optional[np.ndarray], fit_function=None,
+                      function_args: Optional[Dict[str, numbers.Number]]=None,
+                      initial_arguments: Optional[Dict[str, numbers.Number]]=None,
+                      ax: Optional[matplotlib.axes.Axes]=None):
+    """
+    Plots data fits.
+    :param y_data:
+    :param x_data:
+    :param fit_function:
+    :param function_args: Arguments of the fitting function.
+    :param initial_arguments: Initial guess of the arguments.
+    :param ax: Instance of matplotlib.axes.Axes. Essentially the plot.
+    :return: The Axes instance.
+    """
+    if ax is None:
+        ax = plt.gca()
+    if y_data is None:
+        return ax
+    y_data = y_data.squeeze()
+    if len(y_data.shape) == 2:
+        y_data = np.nanmean(y_data, 0)
+    if x_data is None:
+        x_data = np.arange(0, y_data.shape[0])
+    if isinstance(function_args, pd.Series):
+        function_args = dict(function_args)
+    if isinstance(initial_arguments, pd.Series):
+        initial_arguments = dict(initial_arguments)
+
+    for data in [x_data, y_data]:
+        if len(data.shape) > 1:
+            raise RuntimeError('Data has too many dimensions and therefore can not be plotted')
+
+    ax.plot(x_data, y_data, 'b.', label='Raw Data')
+    if fit_function:
+        if function_args:
+            ax.plot(x_data, fit_function(x_data, **function_args), 'r', label='Fit')
+        if initial_arguments:
+            ax.plot(x_data, fit_function(x_data, **initial_arguments), 'k--', label='Initial Guess')
+    return ax
+
+
+def plot_raw_data_vertical_marks(y_data, x_data, marking_position, ax=None):
+    """
+    Draws a vertical line through data to mark e.g. a transition
+    :param y_data:
+    :param x_data:
+    :param marking_position:
+    :param ax: Axes for the plot.
+    :return: Axes instance.
+    """
+    if ax is None:
+        ax = plt.gca()
+    if y_data is None:
+        return ax
+    y_data = y_data.squeeze()
+    if len(y_data) == 2:
+        y_data = np.nanmean(y_data)
+    if x_data is None:
+        x_data = np.arange(0, y_data.shape[0])
+
+    ax.plot(x_data, y_data, 'b.', label='Raw Data')
+    ax.vlines(x=marking_position, ymin=min(y_data), ymax=max(y_data), label='Transition Position')
+    ax.legend()
+    return ax
+
+
+def plot_raw_data_2_dim_marks(y_data, x_data, marking_position, ax=None):
+    if ax is None:
+        ax = plt.gca()
+    if y_data is None:
+        return ax
+    y_data = y_data.squeeze()
+    x, y = np.meshgrid(x_data[1], x_data[0])
+    image = ax.pcolormesh(x, y, y_data)
+    ax.hlines(y=marking_position.iloc[0], xmin=min(x_data[1]), xmax=max(x_data[1]))
+    ax.vlines(x=marking_position.iloc[1], ymin=min(x_data[0]), ymax=max(x_data[0]))
+    plt.colorbar(image, ax=ax)
+    return ax
@@ -507,7 +507,7 @@ def reevaluate_data_with_matlab(experiment, history: History, evaluator_name, in
         indices = [indices, ]
     results = []
     for i in indices:
-        evaluator_data = history._evaluator_data[evaluator_name].iloc[i]
+        evaluator_data = history.load_evaluator_data(i, evaluator_name)
         measurement = evaluator_data.measurements[0]
         measurement.options['loadFile'] = evaluator_data._last_file_names
         results.append(experiment.measure(measurement))
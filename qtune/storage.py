@@ -15,15 +15,27 @@
 # @email: julian.teske@rwth-aachen.de
 
 import warnings
-import copy
 import itertools
 import logging
+import os.path
+import posixpath
+import hashlib
+import json
 
 import threading
 import queue
 import multiprocessing
+import time
+import collections
+import pickle
 
-from typing import Union, Iterable, Generator
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # python < 3.8
+    shared_memory = None
+
+from typing import Union, Iterable, Generator, Optional, Tuple, Sequence, Dict, Callable, List
 
 import h5py
 import numpy as np
@@ -32,11 +44,37 @@ import pandas as pd
 from qtune.util import time_string, get_version
 
 
-__all__ = ["serializables", "HDF5Serializable", 'from_hdf5', 'AsynchronousHDF5Writer']
+__all__ = ["serializables", "HDF5Serializable", 'from_hdf5', 'AsynchronousHDF5Writer', 'DeltaTracker',
+           'append_to_journal', 'read_journal', 'read_journal_index', 'is_journal', 'StoragePolicy', 'LazyArray',
+           'SerializedObject', 'snapshot', 'WriterStatistics', 'StorageBackend', 'HDF5Backend',
+           'NpyDirectoryBackend', 'storage_backends', 'from_file', 'BlobStore', 'blob_reference_counts',
+           'compact_blob_store', 'append_summary', 'read_summary', 'SummaryTable', 'DurabilityPolicy',
+           'summary_projections', 'restore_snapshot']
 
 
 serializables = dict()
 
+#: Functions which compute the summary columns (see append_summary) of a snapshot restored by restore_snapshot. They
+#: are registered by the name of the serializable type they apply to, e.g. by qtune.history for the Autotuner.
+summary_projections = dict()
+
+JOURNAL_FILE_NAME = 'journal.hdf5'
+BLOB_FILE_NAME = 'blobs.hdf5'
+SUMMARY_FILE_NAME = 'summary.hdf5'
+#: Raw evaluator data spilled by a History which keeps it out of memory
+EVALUATOR_DATA_FILE_NAME = 'evaluator_data.hdf5'
+JOURNAL_ENTRY_SEPARATOR = '::'
+#: Appended to file names while they are written with atomic_files
+TEMPORARY_SUFFIX = '.tmp'
+
+journal_index_dtype = np.dtype([('iteration', np.int64),
+                                ('timestamp', 'S26'),
+                                ('tuner_index', np.int64),
+                                ('voltages_changed', np.bool_)])
+
+summary_entry_dtype = np.dtype([('path', h5py.string_dtype()),
+                                ('timestamp', h5py.string_dtype())])
+
 
 def _get_dtype(arr):
     if arr.dtype == 'O':
@@ -53,6 +91,10 @@ def _import_all():
     import qtune.solver
 
 
+def _import_summary_projections():
+    import qtune.history
+
+
 class HDF5Serializable(type):
     """
     Metaclass for all serializable object. Serializable means that the class can be reloaded from memory.
@@ -71,90 +113,811 @@ class HDF5Serializable(type):
             raise AttributeError('Missing method: "to_hdf5" that should return all constructor arguments', name)
 
 
-def _to_hdf5(hdf5_parent_group: h5py.Group, name, obj, serialized):
+class StoragePolicy(metaclass=HDF5Serializable):
+    """
+    Dataset creation options for the arrays written by the serializer. A policy applies to numeric data of the given
+    types which is at least min_nbytes large. The first matching policy of a sequence is used.
+    """
+    def __init__(self, compression: Optional[str] = None, compression_opts=None, shuffle: bool = False,
+                 chunks: Union[bool, Tuple[int, ...]] = True,
+                 types: Sequence[str] = ('ndarray', 'DataFrame', 'Series'), min_nbytes: int = 0):
+        """
+        :param compression: HDF5 filter, e.g. 'lzf' or 'gzip'. None for no compression.
+        :param compression_opts: Options of the filter, e.g. the gzip level.
+        :param shuffle: Apply the shuffle filter before compression.
+        :param chunks: Chunk shape or True for automatic chunking. Chunk shapes are clipped to the data shape and
+        replaced by automatic chunking if the number of dimensions does not match.
+        :param types: Names of the types this policy applies to.
+        :param min_nbytes: Minimal size of the data this policy applies to.
+        """
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.shuffle = bool(shuffle)
+        self.chunks = tuple(chunks) if isinstance(chunks, (tuple, list, np.ndarray)) else bool(chunks)
+        self.types = tuple(types)
+        self.min_nbytes = int(min_nbytes)
+
+    def applies_to(self, obj) -> bool:
+        if type(obj).__name__ not in self.types:
+            return False
+        arr = obj.values if isinstance(obj, (pd.DataFrame, pd.Series)) else obj
+        return arr.ndim > 0 and arr.size > 0 and arr.dtype.kind in 'biufc' and arr.nbytes >= self.min_nbytes
+
+    def dataset_options(self, shape: Tuple[int, ...]) -> dict:
+        if isinstance(self.chunks, tuple) and len(self.chunks) == len(shape):
+            chunks = tuple(max(1, min(int(chunk), size)) for chunk, size in zip(self.chunks, shape))
+        else:
+            chunks = True if self.chunks or self.compression or self.shuffle else None
+        return dict(chunks=chunks,
+                    compression=self.compression,
+                    compression_opts=self.compression_opts,
+                    shuffle=self.shuffle)
+
+    def to_hdf5(self):
+        return dict(compression=self.compression,
+                    compression_opts=self.compression_opts,
+                    shuffle=self.shuffle,
+                    chunks=self.chunks,
+                    types=self.types,
+                    min_nbytes=self.min_nbytes)
+
+    def __repr__(self):
+        return "{type}({data})".format(type=type(self).__name__, data=self.to_hdf5())
+
+
+def _dataset_options(obj, policies: Sequence[StoragePolicy]) -> dict:
+    for policy in policies:
+        if policy.applies_to(obj):
+            return policy.dataset_options(np.shape(obj))
+    return dict()
+
+
+class LazyArray(np.lib.mixins.NDArrayOperatorsMixin):
+    """
+    Proxy of an array dataset that is read from disk on first access and can be released again. Slicing an unloaded
+    proxy only reads the requested part. Attributes which are not defined by the proxy are forwarded to the loaded
+    array. The proxy only stores the file name and the path of the dataset, so it is cheap to copy and to pickle.
+    """
+    def __init__(self, file_name: str, path: str, shape: Tuple[int, ...], dtype):
+        self._file_name = file_name
+        self._path = path
+        self._shape = tuple(shape)
+        self._dtype = np.dtype(dtype)
+        self._data = None
+
+    @classmethod
+    def from_dataset(cls, dataset: h5py.Dataset) -> 'LazyArray':
+        return cls(os.path.abspath(dataset.file.filename), dataset.name, dataset.shape, dataset.dtype)
+
+    @property
+    def file_name(self) -> str:
+        return self._file_name
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self._shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._dtype
+
+    @property
+    def ndim(self) -> int:
+        return len(self._shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self._shape))
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self._dtype.itemsize
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._data is not None
+
+    def load(self) -> np.ndarray:
+        if self._data is None:
+            with h5py.File(self._file_name, mode='r') as root:
+                self._data = root[self._path][()]
+        return self._data
+
+    def release(self):
+        """Free the memory of the loaded data."""
+        self._data = None
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.load(), dtype=dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = tuple(x.load() if isinstance(x, LazyArray) else x for x in inputs)
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __getitem__(self, item):
+        if self._data is None:
+            with h5py.File(self._file_name, mode='r') as root:
+                try:
+                    return root[self._path][item]
+                except (TypeError, ValueError):
+                    # selection not supported by h5py
+                    pass
+        return self.load()[item]
+
+    def __len__(self):
+        return self._shape[0]
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+        return getattr(self.load(), item)
+
+    def __repr__(self):
+        return '{type}({file_name!r}, {path!r}, shape={shape}, dtype={dtype})'.format(type=type(self).__name__,
+                                                                                   file_name=self._file_name,
+                                                                                   path=self._path,
+                                                                                   shape=self._shape,
+                                                                                   dtype=self._dtype)
+
+
+class SerializedObject:
+    """Frozen member dictionary of a serializable object as returned by its to_hdf5 method. It is written like the
+    original object and deserialized as an instance of the original type."""
+    __slots__ = ('type_name', 'members')
+
+    def __init__(self, type_name: str, members: dict):
+        self.type_name = type_name
+        self.members = members
+
+    def to_hdf5(self) -> dict:
+        return self.members
+
+    def __repr__(self):
+        return 'SerializedObject({!r}, {!r})'.format(self.type_name, self.members)
+
+
+class _FrozenPandas:
+    """Read only copy of the values of a Series or DataFrame. Pandas indices are immutable and therefore shared."""
+    __slots__ = ('type_name', 'values', 'index', 'columns', '_restored')
+
+    def __init__(self, obj: Union[pd.Series, pd.DataFrame]):
+        self.type_name = type(obj).__name__
+        self.values = np.array(obj.values)
+        self.values.flags.writeable = False
+        self.index = obj.index
+        self.columns = obj.columns if isinstance(obj, pd.DataFrame) else None
+        self._restored = None
+
+    def restore(self) -> Union[pd.Series, pd.DataFrame]:
+        """The restored object is cached so its id stays valid while the snapshot is written."""
+        if self._restored is None:
+            if self.columns is None:
+                self._restored = pd.Series(self.values, index=self.index, copy=False)
+            else:
+                self._restored = pd.DataFrame(self.values, index=self.index, columns=self.columns, copy=False)
+        return self._restored
+
+    def __getstate__(self):
+        return self.type_name, self.values, self.index, self.columns
+
+    def __setstate__(self, state):
+        self.type_name, self.values, self.index, self.columns = state
+        self._restored = None
+
+
+class _Reserved:
+    """Placeholder for a reserved object in a snapshot."""
+    __slots__ = ('key',)
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def __repr__(self):
+        return '_Reserved({!r})'.format(self.key)
+
+
+def _type_name(obj) -> str:
+    if isinstance(obj, (SerializedObject, _FrozenPandas)):
+        return obj.type_name
+    return type(obj).__name__
+
+
+def _is_serializable(obj) -> bool:
+    return isinstance(obj, SerializedObject) or type(obj).__name__ in serializables
+
+
+def _is_registered_type(obj) -> bool:
+    """True if _to_hdf5 remembers the object in the serialized map, i.e. if it can be referenced. Strings and None are
+    members of their container's scalar record."""
+    return (_is_serializable(obj) or
+            isinstance(obj, (dict, list, tuple, np.ndarray, pd.DataFrame, pd.Series, LazyArray, _FrozenPandas)))
+
+
+def _children(obj):
+    """Yields the (name, value) pairs which are written as members of the given object."""
+    if isinstance(obj, dict):
+        yield from obj.items()
+    elif isinstance(obj, (list, tuple)):
+        yield from ((str(idx), value) for idx, value in enumerate(obj))
+    elif _is_serializable(obj):
+        yield from obj.to_hdf5().items()
+
+
+def _snapshot(obj, memo: dict):
+    if id(obj) in memo:
+        return memo[id(obj)][1]
+
+    if isinstance(obj, (float, int, complex, bool, str, np.generic, LazyArray, _FrozenPandas)) or obj is None:
+        # immutable or read only
+        return obj
+
+    if isinstance(obj, dict):
+        result = dict()
+        memo[id(obj)] = (obj, result)
+        for key, value in obj.items():
+            result[key] = _snapshot(value, memo)
+
+    elif isinstance(obj, list):
+        result = []
+        memo[id(obj)] = (obj, result)
+        result.extend(_snapshot(value, memo) for value in obj)
+
+    elif isinstance(obj, tuple):
+        result = tuple(_snapshot(value, memo) for value in obj)
+        memo[id(obj)] = (obj, result)
+
+    elif _is_serializable(obj):
+        result = SerializedObject(_type_name(obj), dict())
+        memo[id(obj)] = (obj, result)
+        for key, value in obj.to_hdf5().items():
+            result.members[key] = _snapshot(value, memo)
+
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        result = _FrozenPandas(obj)
+        memo[id(obj)] = (obj, result)
+
+    elif isinstance(obj, np.ndarray):
+        result = obj.copy()
+        result.flags.writeable = False
+        memo[id(obj)] = (obj, result)
+
+    else:
+        raise RuntimeError('Can not create a snapshot of object', obj)
+
+    return result
+
+
+def snapshot(obj, reserved: Optional[dict] = None) -> Tuple[object, dict]:
+    """
+    Creates a detached copy of the object tree that is written like the original by to_hdf5. Serializable objects
+    are replaced by SerializedObject instances holding the snapshot of their to_hdf5 members and arrays are copied
+    once and made read only. Identities inside the tree are preserved. This is cheaper than a deepcopy because only
+    the data that is actually written is copied.
+    :param obj:
+    :param reserved: Objects which are not copied but replaced by placeholders.
+    :return: The snapshot and the reserved dictionary to pass to to_hdf5 together with the snapshot.
+    """
+    obj, placeholders, _ = _snapshot_with_size(obj, reserved)
+    return obj, placeholders
+
+
+def _snapshot_with_size(obj, reserved: Optional[dict]) -> Tuple[object, dict, int]:
+    """Like snapshot but additionally returns the number of bytes of the copied array data."""
+    # the memo keeps the original objects alive so ids of to_hdf5 temporaries are not reused
+    memo = dict()
+    placeholders = dict()
+    for key, value in (reserved or dict()).items():
+        placeholders[key] = _Reserved(key)
+        memo[id(value)] = (value, placeholders[key])
+
+    result = _snapshot(obj, memo)
+
+    nbytes = 0
+    for _, copied in memo.values():
+        if isinstance(copied, np.ndarray):
+            nbytes += copied.nbytes
+        elif isinstance(copied, _FrozenPandas):
+            nbytes += copied.values.nbytes
+    return result, placeholders, nbytes
+
+
+def restore_snapshot(obj, reserved: Optional[dict] = None):
+    """
+    Creates live objects from a snapshot like from_hdf5 does from a file. Arrays and pandas objects are copied because
+    constructors may modify them in place.
+    :param obj: Snapshot created by snapshot.
+    :param reserved: Objects which replace the placeholders of the snapshot.
+    :return: The restored object tree.
+    """
+    return _restore_snapshot(obj, reserved or dict(), dict())
+
+
+def _restore_snapshot(obj, reserved: dict, memo: dict):
+    if id(obj) in memo:
+        return memo[id(obj)]
+
+    if isinstance(obj, _Reserved):
+        return reserved[obj.key]
+
+    if isinstance(obj, dict):
+        result = memo[id(obj)] = dict()
+        for key, value in obj.items():
+            result[key] = _restore_snapshot(value, reserved, memo)
+
+    elif isinstance(obj, list):
+        result = memo[id(obj)] = []
+        result.extend(_restore_snapshot(value, reserved, memo) for value in obj)
+
+    elif isinstance(obj, tuple):
+        result = memo[id(obj)] = tuple(_restore_snapshot(value, reserved, memo) for value in obj)
+
+    elif isinstance(obj, SerializedObject):
+        kwargs = {key: _restore_snapshot(value, reserved, memo) for key, value in obj.members.items()}
+        result = memo[id(obj)] = serializables[obj.type_name](**kwargs)
+
+    elif isinstance(obj, _FrozenPandas):
+        result = memo[id(obj)] = obj.restore().copy()
+
+    elif isinstance(obj, np.ndarray):
+        result = memo[id(obj)] = obj.copy()
+
+    else:
+        return obj
+
+    return result
+
+
+def _summary_projection(obj) -> Callable[[object], Dict[str, float]]:
+    type_name = _type_name(obj)
+    if type_name not in summary_projections:
+        _import_summary_projections()
+    return summary_projections[type_name]
+
+
+def _update_with_array(hash_obj, arr: np.ndarray):
+    arr = np.asarray(arr)
+    hash_obj.update(repr((arr.dtype.str, arr.shape)).encode())
+    if arr.dtype == 'O':
+        hash_obj.update(repr(arr.tolist()).encode())
+    else:
+        hash_obj.update(np.ascontiguousarray(arr).data)
+
+
+class DeltaTracker:
+    """
+    Tracks the content of serializable objects between consecutive snapshots written with to_hdf5. If a serializable
+    object is found at the same position as in the previous snapshot and its content hash did not change, it is not
+    written again but linked (soft link in the same file, external link otherwise) to the location where it was
+    written before. The links are resolved transparently by h5py so any snapshot can be loaded with from_hdf5 as long
+    as the files it links to are kept.
+    """
+    def __init__(self):
+        # relative path in snapshot -> (digest, absolute file name, path in file)
+        self._previous = dict()
+        self._current = dict()
+
+        self._digests = dict()
+        self._alive = []
+        self._reserved = dict()
+        self._root_name = '/'
+        self._file_name = None
+
+    def begin_snapshot(self, root: h5py.Group, reserved: dict, file_name: Optional[str] = None):
+        """
+        :param root: Group the snapshot is written to.
+        :param reserved: Reserved objects of the snapshot.
+        :param file_name: Name under which the file is read later if it is written under a temporary name.
+        """
+        self._current = dict()
+        self._digests = dict()
+        self._alive = []
+        self._reserved = {id(value): key for key, value in reserved.items()}
+        self._root_name = root.name
+        self._file_name = os.path.abspath(root.file.filename if file_name is None else file_name)
+
+    def end_snapshot(self):
+        self._previous = self._current
+        self._current = dict()
+        self._digests = dict()
+        self._alive = []
+
+    def digest(self, obj) -> bytes:
+        """Content hash of the object tree. Memoized by id for the current snapshot."""
+        if id(obj) in self._digests:
+            _, digest = self._digests[id(obj)]
+            return b'#cycle' if digest is None else digest
+
+        if id(obj) in self._reserved:
+            return ('#reserved' + self._reserved[id(obj)]).encode()
+
+        # keep obj alive so its id cannot be reused by a temporary object of a to_hdf5 call
+        self._digests[id(obj)] = (obj, None)
+
+        hash_obj = hashlib.blake2b(digest_size=16)
+        hash_obj.update(_type_name(obj).encode())
+
+        if isinstance(obj, (dict, list, tuple)) or _is_serializable(obj):
+            for key, value in _children(obj):
+                hash_obj.update(str(key).encode())
+                hash_obj.update(self.digest(value))
+
+        elif isinstance(obj, pd.DataFrame) or _type_name(obj) == 'DataFrame':
+            _update_with_array(hash_obj, obj.values)
+            _update_with_array(hash_obj, obj.index)
+            _update_with_array(hash_obj, obj.columns)
+
+        elif isinstance(obj, (pd.Series, _FrozenPandas)):
+            _update_with_array(hash_obj, obj.values)
+            _update_with_array(hash_obj, obj.index)
+
+        elif isinstance(obj, (np.ndarray, LazyArray)):
+            _update_with_array(hash_obj, obj)
+
+        elif isinstance(obj, (float, int, complex, bool, np.generic, str)) or obj is None:
+            hash_obj.update(repr(obj).encode())
+
+        else:
+            raise RuntimeError('Can not compute content hash', obj)
+
+        digest = hash_obj.digest()
+        self._digests[id(obj)] = (obj, digest)
+        return digest
+
+    def _relative_path(self, path: str) -> str:
+        return posixpath.relpath(path, self._root_name)
+
+    def _link(self, file_name: str, path: str) -> Union[h5py.SoftLink, h5py.ExternalLink]:
+        if file_name == self._file_name:
+            return h5py.SoftLink(path)
+        else:
+            return h5py.ExternalLink(os.path.relpath(file_name, os.path.dirname(self._file_name)), path)
+
+    def lookup(self, path: str, obj) -> Optional[Union[h5py.SoftLink, h5py.ExternalLink]]:
+        """
+        Looks up if the object was written unchanged to the same path in the previous snapshot.
+        :param path: Path of the object in the current snapshot.
+        :param obj:
+        :return: Link to the previous location or None if the object has to be written.
+        """
+        key = self._relative_path(path)
+        if key in self._previous:
+            digest, file_name, location = self._previous[key]
+            if digest == self.digest(obj):
+                self._current[key] = self._previous[key]
+                return self._link(file_name, location)
+        return None
+
+    def record(self, path: str, obj, hdf5_obj: h5py.HLObject):
+        self._current[self._relative_path(path)] = (self.digest(obj), self._file_name, hdf5_obj.name)
+
+    def register_unchanged(self, path: str, obj, serialized: dict):
+        """
+        Registers all members of a linked object in the serialized map. Later references to them in the same snapshot
+        are linked to the previous location as well which preserves the object identity on reload.
+        """
+        _, file_name, location = self._current[self._relative_path(path)]
+        self._register_unchanged(self._relative_path(path), obj, file_name, location, serialized)
+
+    def _register_unchanged(self, key, obj, file_name, location, serialized):
+        if id(obj) in serialized:
+            return
+        self._alive.append(obj)
+        serialized[id(obj)] = self._link(file_name, location)
+
+        for name, value in _children(obj):
+            if not _is_registered_type(value):
+                continue
+            child_key = posixpath.join(key, name)
+            if child_key in self._previous:
+                self._current[child_key] = self._previous[child_key]
+            self._register_unchanged(child_key, value, file_name, posixpath.join(location, name), serialized)
+
+
+class BlobStore:
+    """
+    Content addressed store for the array data of a tuning run. Arrays, DataFrames and Series of at least min_nbytes
+    are written once into the blob file under the hash of their content and the snapshots contain external links to
+    them. Data which does not change between snapshots, like the raw data of evaluators which were not rerun, is only
+    stored once. Blobs which are no longer referenced are removed by compact_blob_store.
+    """
+    def __init__(self, file_name: str, min_nbytes: int = 4096):
+        self.file_name = os.path.abspath(file_name)
+        self.min_nbytes = min_nbytes
+        self._root = None
+        self._open_count = 0
+
+    def applies_to(self, obj) -> bool:
+        if isinstance(obj, pd.DataFrame):
+            values = obj.values
+        elif isinstance(obj, (np.ndarray, pd.Series)):
+            values = obj
+        else:
+            return False
+        return values.dtype.kind in 'biufc' and values.ndim > 0 and values.nbytes >= self.min_nbytes
+
+    @staticmethod
+    def digest(obj: Union[np.ndarray, pd.DataFrame, pd.Series]) -> str:
+        hash_obj = hashlib.blake2b(digest_size=16)
+        hash_obj.update(type(obj).__name__.encode())
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            _update_with_array(hash_obj, obj.values)
+            _update_with_array(hash_obj, obj.index)
+        if isinstance(obj, pd.DataFrame):
+            _update_with_array(hash_obj, obj.columns)
+        if isinstance(obj, np.ndarray):
+            _update_with_array(hash_obj, obj)
+        return hash_obj.hexdigest()
+
+    def open(self):
+        """Opens the blob file. Nested calls only open it once, so it can stay open for several snapshots."""
+        if self._root is None:
+            self._root = h5py.File(self.file_name, mode='a')
+        self._open_count += 1
+
+    def close(self):
+        self._open_count = max(self._open_count - 1, 0)
+        if self._root is not None and self._open_count == 0:
+            self._root.close()
+            self._root = None
+
+    def link(self, obj, referencing_file: h5py.File, policies: Sequence[StoragePolicy] = ()) -> h5py.ExternalLink:
+        """Writes the object if its content is not in the store yet and returns an external link to it that is valid
+        in the referencing file."""
+        digest = self.digest(obj)
+        if digest not in self._root:
+            _to_hdf5(self._root, digest, obj, dict(), policies=policies)
+        referencing_directory = os.path.dirname(os.path.abspath(referencing_file.filename))
+        return h5py.ExternalLink(os.path.relpath(self.file_name, referencing_directory), '/' + digest)
+
+
+#: Functions which write objects of the given type. The type of the object is looked up along its MRO.
+_hdf5_writers = dict()
+_hdf5_writer_cache = dict()
+
+#: Attribute of groups containing the scalar and string members as one compound record
+SCALARS_ATTRIBUTE = '#scalars'
+#: Attribute of groups containing the names of the members which are None
+NONE_ATTRIBUTE = '#none'
+
+# compact attributes are limited to 64 KiB
+_max_scalar_record_size = 32 * 1024
+
+_int64_range = (-2 ** 63, 2 ** 63)
+
+
+def _hdf5_writer(*types):
+    """Registers the decorated function as writer for the given types."""
+    def register(func):
+        for t in types:
+            _hdf5_writers[t] = func
+        _hdf5_writer_cache.clear()
+        return func
+    return register
+
+
+def _get_hdf5_writer(obj):
+    obj_type = type(obj)
+    try:
+        return _hdf5_writer_cache[obj_type]
+    except KeyError:
+        pass
+    writer = next((_hdf5_writers[t] for t in obj_type.__mro__ if t in _hdf5_writers), None)
+    _hdf5_writer_cache[obj_type] = writer
+    return writer
+
+
+def _scalar_dtype(value) -> Optional[np.dtype]:
+    """The dtype of the value in a scalar record or None if the value is written as a separate dataset."""
+    if isinstance(value, str):
+        return h5py.string_dtype()
+    if isinstance(value, bool):
+        return np.dtype(np.bool_)
+    if isinstance(value, int):
+        return np.dtype(np.int64) if _int64_range[0] <= value < _int64_range[1] else None
+    if isinstance(value, float):
+        return np.dtype(np.float64)
+    if isinstance(value, complex):
+        return np.dtype(np.complex128)
+    if isinstance(value, np.generic) and value.dtype.kind in 'biufc':
+        return value.dtype
+    return None
+
+
+def _write_members(hdf5_group: h5py.Group, members: Iterable[Tuple[str, object]], serialized, delta, policies,
+                   blobs):
+    """Writes the scalar and string members into one compound attribute record and the other ones as group
+    members."""
+    fields = []
+    values = []
+    none_names = []
+    record_size = 0
+    for key, value in members:
+        key = str(key)
+        if value is None:
+            none_names.append(key)
+            continue
+
+        dtype = _scalar_dtype(value) if key else None
+        if dtype is not None and record_size + dtype.itemsize <= _max_scalar_record_size:
+            fields.append((key, dtype))
+            values.append(value)
+            record_size += dtype.itemsize
+        else:
+            _to_hdf5(hdf5_group, key, value, serialized, delta, policies, blobs)
+
+    if fields:
+        record = np.empty((), dtype=np.dtype(fields))
+        for (key, _), value in zip(fields, values):
+            record[key] = value
+        hdf5_group.attrs[SCALARS_ATTRIBUTE] = record
+    if none_names:
+        hdf5_group.attrs.create(NONE_ATTRIBUTE, data=none_names, dtype=h5py.string_dtype())
+
+
+def _read_members(root: h5py.File, hdf5_group: h5py.Group, deserialized, lazy_threshold,
+                  mmap_threshold=None) -> dict:
+    """Reads all members of a group including the packed scalar and None members."""
+    members = {key: _from_hdf5(root, value, deserialized, lazy_threshold, mmap_threshold)
+               for key, value in hdf5_group.items()}
+
+    if SCALARS_ATTRIBUTE in hdf5_group.attrs:
+        record = hdf5_group.attrs[SCALARS_ATTRIBUTE]
+        for key in record.dtype.names:
+            value = record[key]
+            if h5py.check_string_dtype(record.dtype[key]) is not None:
+                value = value.decode() if isinstance(value, bytes) else str(value)
+            members[key] = value
+
+    if NONE_ATTRIBUTE in hdf5_group.attrs:
+        for key in hdf5_group.attrs[NONE_ATTRIBUTE]:
+            members[key.decode() if isinstance(key, bytes) else key] = None
+
+    return members
+
+
+def _to_hdf5(hdf5_parent_group: h5py.Group, name, obj, serialized, delta: 'DeltaTracker' = None,
+             policies: Sequence[StoragePolicy] = (), blobs: BlobStore = None):
     """
     Serializes a class instance
     :param hdf5_parent_group: Storage group in the HDF5 library.
     :param name:
     :param obj:
     :param serialized: Serialized objects. Required to verify that the object has not been saved yet.
+    :param delta: If given, unchanged serializable objects are linked to the previous snapshot.
+    :param policies: Storage policies for array data.
+    :param blobs: If given, array data is written to the blob store and linked.
     :return: None
     """
     if id(obj) in serialized:
-        hdf5_parent_group.create_dataset(name, data=serialized[id(obj)].ref)
+        if isinstance(serialized[id(obj)], (h5py.SoftLink, h5py.ExternalLink)):
+            hdf5_parent_group[name] = serialized[id(obj)]
+        else:
+            hdf5_parent_group.create_dataset(name, data=serialized[id(obj)].ref)
         return
 
-    if isinstance(obj, dict):
-        hdf5_group = hdf5_parent_group.create_group(name)
-        hdf5_group.attrs['#type'] = 'dict'
-        for key, value in obj.items():
-            _to_hdf5(hdf5_group, key, value, serialized)
-        serialized[id(obj)] = hdf5_group
-        return
+    if _is_serializable(obj):
+        writer = _write_serializable
+    elif blobs is not None and blobs.applies_to(obj):
+        writer = _write_blob
+    else:
+        writer = _get_hdf5_writer(obj)
+        if writer is None:
+            raise RuntimeError('Can not serialize object', obj)
+    writer(hdf5_parent_group, name, obj, serialized, delta, policies, blobs)
 
-    if isinstance(obj, (list, tuple)):
-        hdf5_group = hdf5_parent_group.create_group(name)
-        hdf5_group.attrs['#type'] = 'list' if isinstance(obj, list) else 'tuple'
-        for idx, value in enumerate(obj):
-            _to_hdf5(hdf5_group, str(idx), value, serialized)
-        serialized[id(obj)] = hdf5_group
-        return
 
-    if type(obj).__name__ in serializables:
-        hdf5_group = hdf5_parent_group.create_group(name)
-        hdf5_group.attrs['#type'] = type(obj).__name__
+@_hdf5_writer(LazyArray)
+def _write_lazy_array(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    data = obj.load()
+    _to_hdf5(hdf5_parent_group, name, data, serialized, delta, policies, blobs)
+    serialized[id(obj)] = serialized[id(data)]
 
-        serialized[id(obj)] = hdf5_group
 
-        data = obj.to_hdf5()
-        for key, value in data.items():
-            _to_hdf5(hdf5_group, key, value, serialized)
-        return
+@_hdf5_writer(_FrozenPandas)
+def _write_frozen_pandas(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    data = obj.restore()
+    _to_hdf5(hdf5_parent_group, name, data, serialized, delta, policies, blobs)
+    serialized[id(obj)] = serialized[id(data)]
 
-    if isinstance(obj, pd.DataFrame):
-        dset = hdf5_parent_group.create_dataset(name, data=obj)
-        dset.attrs.create('index', data=obj.index, dtype=_get_dtype(obj.index))
-        dset.attrs.create('columns', data=obj.columns, dtype=_get_dtype(obj.columns))
-        dset.attrs['#type'] = 'DataFrame'
 
-        serialized[id(obj)] = dset
-        return
+@_hdf5_writer(dict)
+def _write_dict(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    hdf5_group = hdf5_parent_group.create_group(name)
+    hdf5_group.attrs['#type'] = 'dict'
+    _write_members(hdf5_group, obj.items(), serialized, delta, policies, blobs)
+    serialized[id(obj)] = hdf5_group
 
-    if isinstance(obj, pd.Series):
-        dset = hdf5_parent_group.create_dataset(name, data=obj, dtype=_get_dtype(obj))
-        dset.attrs.create('index', data=obj.index, dtype=_get_dtype(obj.index))
-        dset.attrs['#type'] = 'Series'
 
-        serialized[id(obj)] = dset
-        return
+@_hdf5_writer(list, tuple)
+def _write_sequence(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    hdf5_group = hdf5_parent_group.create_group(name)
+    hdf5_group.attrs['#type'] = 'list' if isinstance(obj, list) else 'tuple'
+    _write_members(hdf5_group, enumerate(obj), serialized, delta, policies, blobs)
+    serialized[id(obj)] = hdf5_group
 
-    if isinstance(obj, np.ndarray):
-        dset = hdf5_parent_group.create_dataset(name, data=obj)
-        serialized[id(obj)] = dset
-        return
 
-    if isinstance(obj, (float, int, complex, bool, np.generic)):
-        hdf5_parent_group.create_dataset(name, data=obj, shape=())
-        return
+def _write_serializable(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    path = posixpath.join(hdf5_parent_group.name, name)
+    if delta is not None:
+        link = delta.lookup(path, obj)
+        if link is not None:
+            delta.register_unchanged(path, obj, serialized)
+            hdf5_parent_group[name] = link
+            return
 
-    if isinstance(obj, str):
-        dt = h5py.special_dtype(vlen=str)
-        dset = hdf5_parent_group.create_dataset(name, data=obj, dtype=dt)
-        dset.attrs['#type'] = 'str'
-        serialized[id(obj)] = dset
-        return
+    hdf5_group = hdf5_parent_group.create_group(name)
+    hdf5_group.attrs['#type'] = _type_name(obj)
 
-    if obj is None:
-        dset = hdf5_parent_group.create_dataset(name, dtype="f")
-        dset.attrs['#type'] = 'NoneType'
-        serialized[id(obj)] = dset
-        return
+    serialized[id(obj)] = hdf5_group
+
+    _write_members(hdf5_group, obj.to_hdf5().items(), serialized, delta, policies, blobs)
+
+    if delta is not None:
+        delta.record(path, obj, hdf5_group)
+
+
+def _write_blob(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    link = blobs.link(obj, hdf5_parent_group.file, policies)
+    hdf5_parent_group[name] = link
+    serialized[id(obj)] = link
+
+
+@_hdf5_writer(pd.DataFrame)
+def _write_data_frame(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    dset = hdf5_parent_group.create_dataset(name, data=obj, **_dataset_options(obj, policies))
+    dset.attrs.create('index', data=obj.index, dtype=_get_dtype(obj.index))
+    dset.attrs.create('columns', data=obj.columns, dtype=_get_dtype(obj.columns))
+    dset.attrs['#type'] = 'DataFrame'
+
+    serialized[id(obj)] = dset
+
+
+@_hdf5_writer(pd.Series)
+def _write_series(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    dset = hdf5_parent_group.create_dataset(name, data=obj, dtype=_get_dtype(obj),
+                                            **_dataset_options(obj, policies))
+    dset.attrs.create('index', data=obj.index, dtype=_get_dtype(obj.index))
+    dset.attrs['#type'] = 'Series'
+
+    serialized[id(obj)] = dset
 
-    raise RuntimeError()
+
+@_hdf5_writer(np.ndarray)
+def _write_ndarray(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    dset = hdf5_parent_group.create_dataset(name, data=obj, **_dataset_options(obj, policies))
+    serialized[id(obj)] = dset
+
+
+@_hdf5_writer(float, int, complex, bool, np.generic)
+def _write_scalar(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    hdf5_parent_group.create_dataset(name, data=obj, shape=())
+
+
+@_hdf5_writer(str)
+def _write_str(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    dt = h5py.special_dtype(vlen=str)
+    dset = hdf5_parent_group.create_dataset(name, data=obj, dtype=dt)
+    dset.attrs['#type'] = 'str'
+    serialized[id(obj)] = dset
+
+
+@_hdf5_writer(type(None))
+def _write_none(hdf5_parent_group, name, obj, serialized, delta, policies, blobs):
+    dset = hdf5_parent_group.create_dataset(name, dtype="f")
+    dset.attrs['#type'] = 'NoneType'
+    serialized[id(obj)] = dset
 
 
 def to_hdf5(filename_or_handle: Union[str, h5py.Group], name: str, obj,
-            reserved=None):
+            reserved=None, delta: DeltaTracker = None, policies: Sequence[StoragePolicy] = (),
+            blobs: BlobStore = None, target_file_name: Optional[str] = None):
     if isinstance(filename_or_handle, h5py.Group):
         root = filename_or_handle
     else:
@@ -173,15 +936,112 @@ def to_hdf5(filename_or_handle: Union[str, h5py.Group], name: str, obj,
         serialized[id(value)] = dset
         dset.attrs["#type"] = "#reserved"
 
-    _to_hdf5(root, name, obj, serialized)
-
-
-def _from_hdf5(root: h5py.File, hdf5_obj: h5py.HLObject, deserialized=None):
+    if blobs is not None:
+        blobs.open()
+    try:
+        if delta is None:
+            _to_hdf5(root, name, obj, serialized, policies=policies, blobs=blobs)
+        else:
+            delta.begin_snapshot(root, reserved, file_name=target_file_name)
+            _to_hdf5(root, name, obj, serialized, delta, policies, blobs)
+            delta.end_snapshot()
+    finally:
+        if blobs is not None:
+            blobs.close()
+
+
+def _external_links(group: h5py.Group, visited: set) -> Generator[h5py.ExternalLink, None, None]:
+    for name in group:
+        link = group.get(name, getlink=True)
+        if isinstance(link, h5py.ExternalLink):
+            yield link
+        elif isinstance(link, h5py.HardLink):
+            member = group[name]
+            if isinstance(member, h5py.Group) and member.id not in visited:
+                visited.add(member.id)
+                yield from _external_links(member, visited)
+
+
+def blob_reference_counts(directory: str, blob_file_name: str = BLOB_FILE_NAME) -> Dict[str, int]:
+    """
+    Counts the external links from the HDF5 files in the directory to the blobs of the blob store.
+    :param directory: Storage directory of a tuning run.
+    :param blob_file_name: Name of the blob store file in the directory.
+    :return: Number of references by blob name. Blobs that are not referenced are not contained.
+    """
+    blob_file = os.path.abspath(os.path.join(directory, blob_file_name))
+    counts = collections.Counter()
+    for file_name in sorted(os.listdir(directory)):
+        file_name = os.path.abspath(os.path.join(directory, file_name))
+        if file_name == blob_file or not os.path.isfile(file_name) or not h5py.is_hdf5(file_name):
+            continue
+        with h5py.File(file_name, mode='r') as root:
+            for link in _external_links(root, set()):
+                target = os.path.normpath(os.path.join(os.path.dirname(file_name), link.filename))
+                if target == blob_file:
+                    counts[link.path.lstrip('/')] += 1
+    return dict(counts)
+
+
+def compact_blob_store(directory: str, blob_file_name: str = BLOB_FILE_NAME, dry_run: bool = False) -> dict:
+    """
+    Removes the blobs which are not referenced by any file in the directory, e.g. after snapshots were deleted. The
+    referenced blobs are copied to a new file which replaces the blob store, because HDF5 does not free the space of
+    deleted datasets. Do not run this while a writer is using the blob store.
+    :param directory: Storage directory of a tuning run.
+    :param blob_file_name: Name of the blob store file in the directory.
+    :param dry_run: Only count and do not modify the blob store.
+    :return: Summary with the number of blobs, the removed blobs, missing blobs that are referenced but do not exist,
+    the file size before and after and the reference counts.
+    """
+    blob_file = os.path.join(directory, blob_file_name)
+    reference_counts = blob_reference_counts(directory, blob_file_name)
+
+    with h5py.File(blob_file, mode='r') as root:
+        stored = set(root.keys())
+    unreferenced = stored.difference(reference_counts)
+
+    size_before = os.path.getsize(blob_file)
+    if unreferenced and not dry_run:
+        compacted_file = blob_file + '.compact'
+        with h5py.File(blob_file, mode='r') as source, h5py.File(compacted_file, mode='w') as target:
+            for name in sorted(stored.intersection(reference_counts)):
+                source.copy(source[name], target, name=name)
+        os.replace(compacted_file, blob_file)
+
+    return dict(blobs=len(stored),
+                removed=sorted(unreferenced),
+                missing=sorted(set(reference_counts).difference(stored)),
+                size_before=size_before,
+                size_after=os.path.getsize(blob_file),
+                reference_counts=reference_counts)
+
+
+def _memory_map(dataset: h5py.Dataset) -> Optional[np.memmap]:
+    """
+    Read only memory map of the data of a dataset. This is only possible for contiguous datasets without filters in
+    files on disk.
+    :return: The memory map or None if the data can not be mapped.
+    """
+    if (dataset.chunks is not None or dataset.external or dataset.file.driver not in ('sec2', 'stdio') or
+            dataset.dtype.kind not in 'biufc' or not dataset.shape or dataset.size == 0):
+        return None
+    offset = dataset.id.get_offset()
+    if offset is None:
+        # storage is not allocated
+        return None
+    return np.memmap(dataset.file.filename, mode='r', dtype=dataset.dtype, shape=dataset.shape, offset=offset)
+
+
+def _from_hdf5(root: h5py.File, hdf5_obj: h5py.HLObject, deserialized=None, lazy_threshold: Optional[int] = None,
+               mmap_threshold: Optional[int] = None):
     """
     Reloads a saved object.
     :param root: Root file of the HDF5 library
     :param hdf5_obj: Object to be reloaded
     :param deserialized: Already loaded objects.
+    :param lazy_threshold: Arrays of at least this many bytes are returned as LazyArray.
+    :param mmap_threshold: Contiguous arrays of at least this many bytes are returned as read only memory maps.
     :return: The reloaded object.
     """
     if isinstance(hdf5_obj, h5py.Reference):
@@ -195,14 +1055,12 @@ def _from_hdf5(root: h5py.File, hdf5_obj: h5py.HLObject, deserialized=None):
             deserialized[hdf5_obj.id] = dict()
             result = deserialized[hdf5_obj.id]
 
-            for k in hdf5_obj.keys():
-                result[k] = _from_hdf5(root, hdf5_obj[k], deserialized)
+            result.update(_read_members(root, hdf5_obj, deserialized, lazy_threshold, mmap_threshold))
             return result
 
         elif hdf5_obj.attrs['#type'] in serializables:
             cls = serializables[hdf5_obj.attrs['#type']]
-            kwargs = {k: _from_hdf5(root, v, deserialized)
-                      for k, v in hdf5_obj.items()}
+            kwargs = _read_members(root, hdf5_obj, deserialized, lazy_threshold, mmap_threshold)
 
             try:
                 deserialized[hdf5_obj.id] = cls(**kwargs)
@@ -221,15 +1079,13 @@ def _from_hdf5(root: h5py.File, hdf5_obj: h5py.HLObject, deserialized=None):
             deserialized[hdf5_obj.id] = list()
             result = deserialized[hdf5_obj.id]
 
-            for idx in range(len(hdf5_obj.keys())):
-                result.append(_from_hdf5(root, hdf5_obj[str(idx)], deserialized))
+            members = _read_members(root, hdf5_obj, deserialized, lazy_threshold, mmap_threshold)
+            result.extend(members[str(idx)] for idx in range(len(members)))
             return result
 
         elif hdf5_obj.attrs['#type'] == 'tuple':
-            result = []
-            for idx in range(len(hdf5_obj.keys())):
-                result.append(_from_hdf5(root, hdf5_obj[str(idx)], deserialized))
-            result = tuple(result)
+            members = _read_members(root, hdf5_obj, deserialized, lazy_threshold, mmap_threshold)
+            result = tuple(members[str(idx)] for idx in range(len(members)))
             deserialized[hdf5_obj.id] = result
             return result
 
@@ -252,18 +1108,38 @@ def _from_hdf5(root: h5py.File, hdf5_obj: h5py.HLObject, deserialized=None):
                 return result
 
             if hdf5_obj.attrs['#type'] == 'str':
-                result = str(np.asarray(hdf5_obj))
+                result = hdf5_obj[()]
+                # h5py >= 3 returns variable length strings as bytes
+                result = result.decode() if isinstance(result, bytes) else str(result)
                 deserialized[hdf5_obj.id] = result
                 return result
 
             if hdf5_obj.attrs['#type'] == 'NoneType':
                 return None
 
+            if hdf5_obj.attrs['#type'] == '#reserved':
+                # reserved entry of a file that is linked by a delta snapshot
+                return deserialized['#reserved'][posixpath.basename(hdf5_obj.name)]
+
+        if (mmap_threshold is not None and hdf5_obj.dtype.kind in 'biufc' and hdf5_obj.shape and
+                hdf5_obj.size * hdf5_obj.dtype.itemsize >= mmap_threshold):
+            result = _memory_map(hdf5_obj)
+            if result is not None:
+                deserialized[hdf5_obj.id] = result
+                return result
+
+        if (lazy_threshold is not None and hdf5_obj.dtype.kind in 'biufc' and hdf5_obj.shape and
+                hdf5_obj.size * hdf5_obj.dtype.itemsize >= lazy_threshold):
+            result = LazyArray.from_dataset(hdf5_obj)
+            deserialized[hdf5_obj.id] = result
+            return result
+
         result = np.asarray(hdf5_obj)
         if result.shape == ():
             result = result[()]
         if isinstance(result, h5py.Reference):
-            return _from_hdf5(root, result, deserialized)
+            # references are only valid in the file that contains them
+            return _from_hdf5(hdf5_obj.file, result, deserialized, lazy_threshold, mmap_threshold)
         else:
             return result
 
@@ -271,11 +1147,17 @@ def _from_hdf5(root: h5py.File, hdf5_obj: h5py.HLObject, deserialized=None):
         raise RuntimeError()
 
 
-def from_hdf5(filename_or_handle, reserved):
+def from_hdf5(filename_or_handle, reserved, lazy_threshold: Optional[int] = None,
+              mmap_threshold: Optional[int] = None):
     """
     Reload an HDF5 file.
     :param filename_or_handle:
     :param reserved: Reserved elements are those which are already reloaded or have to be created during the run time.
+    :param lazy_threshold: Numeric arrays of at least this many bytes are not read but returned as LazyArray proxies
+    which read the data on first access. Everything is read if None.
+    :param mmap_threshold: Numeric arrays of at least this many bytes which are stored contiguous and unfiltered (see
+    StoragePolicy) are returned as read only numpy memory maps of the file instead of being copied into memory.
+    Takes precedence over lazy_threshold. Chunked or compressed arrays are read normally.
     :return: Loaded object.
     """
     _import_all()
@@ -283,61 +1165,1089 @@ def from_hdf5(filename_or_handle, reserved):
     if isinstance(filename_or_handle, h5py.Group):
         root = filename_or_handle
     else:
-        root = h5py.File(filename_or_handle, mode='r')
+        file_name, entry = split_journal_entry_path(filename_or_handle)
+        root = h5py.File(file_name, mode='r')
+        if entry is not None:
+            root = root[entry]
 
-    deserialized = dict()
+    deserialized = {'#reserved': reserved}
 
     for key, value in root.items():
         if "#type" in value.attrs and value.attrs["#type"] == "#reserved":
             deserialized[value.id] = reserved[key]
 
-    return _from_hdf5(root, root, deserialized)
+    return _from_hdf5(root, root, deserialized, lazy_threshold, mmap_threshold)
+
+
+def journal_entry_path(file_name: str, iteration: int) -> str:
+    """Path of a journal entry that is understood by from_hdf5 and the AsynchronousHDF5Writer."""
+    return '{}{}{}'.format(file_name, JOURNAL_ENTRY_SEPARATOR, iteration)
+
+
+def split_journal_entry_path(path: str) -> Tuple[str, Optional[str]]:
+    """
+    Splits a path created by journal_entry_path.
+    :param path:
+    :return: File name and the entry or None if the path is a plain file name.
+    """
+    file_name, separator, entry = path.rpartition(JOURNAL_ENTRY_SEPARATOR)
+    if separator:
+        return file_name, entry
+    else:
+        return path, None
+
+
+def is_journal(filename_or_handle: Union[str, h5py.File]) -> bool:
+    if isinstance(filename_or_handle, h5py.Group):
+        return '#index' in filename_or_handle
+    with h5py.File(filename_or_handle, mode='r') as root:
+        return '#index' in root
+
+
+def append_to_journal(filename_or_handle: Union[str, h5py.File], iteration: int, name: str, obj, reserved=None,
+                      timestamp: str = None, tuner_index: int = -1, voltages_changed: bool = False,
+                      delta: DeltaTracker = None, policies: Sequence[StoragePolicy] = (), blobs: BlobStore = None):
+    """
+    Appends a snapshot to a journal file. A journal contains all snapshots of a tuning run as numbered groups and an
+    index dataset with one entry per snapshot.
+    :param filename_or_handle: Journal file or a handle of it that is open for writing. The file is created if it does
+    not exist.
+    :param iteration: Number of the entry.
+    :param name: Name of the object in the entry.
+    :param obj: Object to store.
+    :param reserved: Reserved objects.
+    :param timestamp: Time string of the snapshot. Defaults to now.
+    :param tuner_index: Current tuner index of the autotuner stored in this entry.
+    :param voltages_changed: True if the voltages were set in the iteration of this entry.
+    :param delta: If given, unchanged objects are linked to the previous entry.
+    :param policies: Storage policies for array data.
+    :param blobs: Content addressed store for array data.
+    :return: None
+    """
+    if timestamp is None:
+        timestamp = time_string()
+
+    if not isinstance(filename_or_handle, h5py.File):
+        with h5py.File(filename_or_handle, mode='a') as root:
+            append_to_journal(root, iteration, name, obj, reserved=reserved, timestamp=timestamp,
+                              tuner_index=tuner_index, voltages_changed=voltages_changed, delta=delta,
+                              policies=policies, blobs=blobs)
+        return
+
+    root = filename_or_handle
+    if '#index' not in root:
+        root.create_dataset('#index', shape=(0,), maxshape=(None,), dtype=journal_index_dtype, chunks=True)
+
+    to_hdf5(root.create_group(str(iteration)), name, obj, reserved=reserved, delta=delta, policies=policies,
+            blobs=blobs)
+
+    index = root['#index']
+    index.resize((index.shape[0] + 1,))
+    index[-1] = (iteration, timestamp.encode(), tuner_index, voltages_changed)
+
+
+def read_journal_index(filename_or_handle: Union[str, h5py.File]) -> np.ndarray:
+    """
+    :return: Structured array with the fields iteration, timestamp, tuner_index and voltages_changed.
+    """
+    if isinstance(filename_or_handle, h5py.Group):
+        return filename_or_handle['#index'][()]
+    with h5py.File(filename_or_handle, mode='r') as root:
+        return root['#index'][()]
+
+
+def read_journal(file_name: str, reserved, start: int = 0, stop: Optional[int] = None,
+                 lazy_threshold: Optional[int] = None, mmap_threshold: Optional[int] = None) -> Generator:
+    """
+    Reads a range of journal entries. The file is opened only once.
+    :param file_name: Journal file.
+    :param reserved: Reserved objects.
+    :param start: Position of the first entry in the index.
+    :param stop: Position after the last entry in the index.
+    :param lazy_threshold: See from_hdf5.
+    :param mmap_threshold: See from_hdf5.
+    :return: Generator of (entry path, loaded data) tuples.
+    """
+    with h5py.File(file_name, mode='r') as root:
+        for iteration in root['#index'][start:stop]['iteration']:
+            yield journal_entry_path(file_name, iteration), from_hdf5(root[str(iteration)], reserved, lazy_threshold,
+                                                                      mmap_threshold)
+
+
+def summary_file_name(file_name: str) -> str:
+    """Summary table of the run a file, npy directory or journal entry path belongs to."""
+    file_name, _ = split_journal_entry_path(file_name)
+    return os.path.join(os.path.dirname(file_name), SUMMARY_FILE_NAME)
 
 
-def _writer_target(write_queue: Union[multiprocessing.JoinableQueue, queue.Queue], logger='qtune'):
+def append_summary(filename_or_handle: Union[str, h5py.File], path: str, columns: Dict[str, float],
+                   timestamp: Optional[str] = None):
+    """
+    Appends a row to a summary table. A summary table contains a few numeric columns of each snapshot of a run, so they
+    can be read without deserializing the snapshots. Columns which did not exist before are added and marked as absent
+    in the previous rows.
+    :param filename_or_handle: Summary file or a handle of it that is open for writing. The file is created if it does
+    not exist.
+    :param path: File name or journal entry path of the snapshot. Stored relative to the summary file.
+    :param columns: Values by column name.
+    :param timestamp: Time string of the snapshot. Defaults to now.
+    :return: None
+    """
+    if timestamp is None:
+        timestamp = time_string()
+
+    if not isinstance(filename_or_handle, h5py.File):
+        with h5py.File(filename_or_handle, mode='a') as root:
+            append_summary(root, path, columns, timestamp=timestamp)
+        return
+
+    file_path, entry = split_journal_entry_path(path)
+    path = os.path.relpath(file_path, os.path.dirname(os.path.abspath(filename_or_handle.filename)))
+    if entry is not None:
+        path = journal_entry_path(path, entry)
+
+    root = filename_or_handle
+    if '#entries' not in root:
+        root.create_dataset('#entries', shape=(0,), maxshape=(None,), dtype=summary_entry_dtype, chunks=True)
+        root.create_dataset('#columns', shape=(0,), maxshape=(None,), dtype=h5py.string_dtype(), chunks=True)
+        root.create_dataset('#values', shape=(0, 0), maxshape=(None, None), dtype=np.float64,
+                            chunks=(64, 64), fillvalue=np.nan)
+        root.create_dataset('#present', shape=(0, 0), maxshape=(None, None), dtype=np.bool_,
+                            chunks=(64, 64), fillvalue=False)
+
+    entries = root['#entries']
+    column_names = root['#columns']
+    values = root['#values']
+    present = root['#present']
+
+    column_index = {name: idx for idx, name in enumerate(column_names.asstr()[()])}
+    new_columns = [name for name in columns if name not in column_index]
+    if new_columns:
+        column_names.resize((len(column_index) + len(new_columns),))
+        column_names[len(column_index):] = new_columns
+        column_index.update((name, idx) for idx, name in enumerate(new_columns, len(column_index)))
+
+    row = entries.shape[0]
+    entries.resize((row + 1,))
+    entries[row] = (path, timestamp)
+
+    values.resize((row + 1, len(column_index)))
+    present.resize((row + 1, len(column_index)))
+
+    row_values = np.full(len(column_index), np.nan)
+    row_present = np.zeros(len(column_index), dtype=np.bool_)
+    indices = [column_index[name] for name in columns]
+    row_values[indices] = list(columns.values())
+    row_present[indices] = True
+    values[row, :] = row_values
+    present[row, :] = row_present
+
+
+class SummaryTable:
+    """Content of a summary file written by append_summary."""
+    __slots__ = ('paths', 'timestamps', 'columns', 'values', 'present')
+
+    def __init__(self, paths: Sequence[str], timestamps: Sequence[str], columns: Sequence[str], values: np.ndarray,
+                 present: np.ndarray):
+        """
+        :param paths: File name or journal entry path of each row.
+        :param timestamps: Time string of each row.
+        :param columns: Column names.
+        :param values: Array of shape (rows, columns).
+        :param present: Boolean array of shape (rows, columns) which is False where a row has no value for a column.
+        """
+        self.paths = paths
+        self.timestamps = timestamps
+        self.columns = columns
+        self.values = values
+        self.present = present
+
+    def __len__(self):
+        return len(self.paths)
+
+
+def read_summary(file_name: str) -> SummaryTable:
+    """
+    Reads a summary file. The paths are relative to the working directory like the paths passed to append_summary.
+    :param file_name:
+    :return:
+    """
+    directory = os.path.dirname(file_name)
+    with h5py.File(file_name, mode='r') as root:
+        entries = root['#entries'][()]
+        return SummaryTable(paths=[os.path.join(directory, path.decode()) for path in entries['path']],
+                            timestamps=[timestamp.decode() for timestamp in entries['timestamp']],
+                            columns=list(root['#columns'].asstr()[()]),
+                            values=root['#values'][()],
+                            present=root['#present'][()])
+
+
+class _SharedMemoryTask:
+    """
+    Wraps a write task that is sent through a multiprocessing queue. When the queue pickles the task, all buffers of at
+    least threshold bytes are copied into a single shared memory block and only their layout is sent through the pipe
+    (pickle protocol 5 out-of-band buffers). The arrays of the unpickled task are views of the block, which is owned by
+    the receiving process until release is called.
+    """
+    __slots__ = ('task', 'threshold', 'block')
+
+    alignment = 64
+
+    def __init__(self, task, threshold: int, block=None):
+        self.task = task
+        self.threshold = max(threshold, 1)
+        self.block = block
+
+    def __reduce__(self):
+        buffers = []
+
+        def buffer_callback(buffer: pickle.PickleBuffer):
+            if buffer.raw().nbytes < self.threshold:
+                return True
+            buffers.append(buffer)
+            return False
+
+        payload = pickle.dumps(self.task, protocol=5, buffer_callback=buffer_callback)
+        if not buffers:
+            return _load_shared_memory_task, (payload, None, ())
+
+        layout = []
+        size = 0
+        for buffer in buffers:
+            nbytes = buffer.raw().nbytes
+            layout.append((size, nbytes))
+            size += -(-nbytes // self.alignment) * self.alignment
+
+        block = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            for buffer, (offset, nbytes) in zip(buffers, layout):
+                block.buf[offset:offset + nbytes] = buffer.raw()
+        except:
+            block.unlink()
+            raise
+        finally:
+            block.close()
+        return _load_shared_memory_task, (payload, block.name, tuple(layout))
+
+    def release(self):
+        """Drop the task and free the shared memory block."""
+        self.task = None
+        if self.block is not None:
+            block, self.block = self.block, None
+            block.unlink()
+            try:
+                block.close()
+            except BufferError:
+                # somebody still holds an array. The mapping is closed when it is garbage collected.
+                pass
+
+
+def _load_shared_memory_task(payload: bytes, block_name: Optional[str], layout: Sequence[Tuple[int, int]]):
+    if block_name is None:
+        return _SharedMemoryTask(pickle.loads(payload), 0)
+
+    block = shared_memory.SharedMemory(name=block_name)
+    buffers = [block.buf[offset:offset + nbytes] for offset, nbytes in layout]
+    return _SharedMemoryTask(pickle.loads(payload, buffers=buffers), 0, block=block)
+
+
+def _fsync(file_name: str):
+    """Waits until the operating system wrote the file to the disk."""
+    file_descriptor = os.open(file_name, os.O_RDONLY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+def _fsync_directory(directory: str):
+    """Waits until the operating system wrote the entries of the directory, e.g. a rename, to the disk. Windows has no
+    file descriptors of directories and its renames are not made durable this way, so nothing is done there."""
+    if os.name == 'nt':
+        return
+    file_descriptor = os.open(directory, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+class StorageBackend:
+    """
+    Writes and reads the object trees given by the to_hdf5 methods of the serializable classes. All backends write
+    objects that are referenced multiple times only once and restore the references. Reserved objects are not written
+    but replaced by the given ones on reading.
+    """
+    #: Appended to the file names by the Autotuner
+    extension = ''
+
+    @classmethod
+    def handles(cls, file_name: str) -> bool:
+        """True if the file was written by this backend."""
+        raise NotImplementedError()
+
+    def write(self, file_name: str, name: str, obj, reserved: Optional[dict] = None,
+              index_entry: Optional[dict] = None):
+        """
+        :param file_name:
+        :param name: Name of the object in the file.
+        :param obj:
+        :param reserved: Objects which are not written but reserved by name.
+        :param index_entry: Index information of journal entries.
+        """
+        raise NotImplementedError()
+
+    def write_batch(self, entries: Sequence[tuple], durability: 'DurabilityPolicy'):
+        """
+        Writes several snapshots in one commit. Backends can override this to share the file handles between them.
+        :param entries: Tuples of (file_name, name, obj, reserved, index_entry) as passed to write.
+        :param durability: Guarantees of the commit.
+        """
+        for file_name, name, obj, reserved, index_entry in entries:
+            self.write(file_name, name, obj, reserved=reserved, index_entry=index_entry)
+
+    def read(self, file_name: str, reserved, lazy_threshold: Optional[int] = None,
+             mmap_threshold: Optional[int] = None) -> dict:
+        """
+        :param file_name:
+        :param reserved: Objects which replace the reserved entries.
+        :param lazy_threshold: Arrays of at least this many bytes are not read into memory on loading.
+        :param mmap_threshold: Arrays of at least this many bytes are returned as read only memory maps if the format
+        allows it.
+        :return: All objects of the file and the reserved ones by name.
+        """
+        raise NotImplementedError()
+
+
+class HDF5Backend(StorageBackend):
+    """Single HDF5 files or journal entries. Supports delta snapshots, storage policies and a blob store."""
+    extension = '.hdf5'
+
+    def __init__(self, delta: bool = False, policies: Sequence[StoragePolicy] = (), blob_file: Optional[str] = None):
+        self.delta_tracker = DeltaTracker() if delta else None
+        self.policies = tuple(policies)
+        self.blobs = BlobStore(blob_file) if blob_file else None
+
+    @classmethod
+    def handles(cls, file_name: str) -> bool:
+        file_name, _ = split_journal_entry_path(file_name)
+        return os.path.isfile(file_name) and h5py.is_hdf5(file_name)
+
+    def write(self, file_name: str, name: str, obj, reserved: Optional[dict] = None,
+              index_entry: Optional[dict] = None):
+        file_name, entry = split_journal_entry_path(file_name)
+        if entry is None:
+            to_hdf5(file_name, name, obj, reserved=reserved, delta=self.delta_tracker, policies=self.policies,
+                    blobs=self.blobs)
+        else:
+            append_to_journal(file_name, int(entry), name, obj, reserved=reserved, delta=self.delta_tracker,
+                              policies=self.policies, blobs=self.blobs, **(index_entry or dict()))
+
+    def write_batch(self, entries: Sequence[tuple], durability: 'DurabilityPolicy'):
+        """Opens the blob store and each journal only once for all entries. Plain files are written to a temporary
+        name and renamed if the durability policy requests atomic files."""
+        if self.blobs is not None:
+            self.blobs.open()
+        journal = None
+        written = []
+        try:
+            for file_name, name, obj, reserved, index_entry in entries:
+                file_name, entry = split_journal_entry_path(file_name)
+                if entry is None:
+                    if journal is not None:
+                        journal.close()
+                        journal = None
+
+                    if durability.atomic_files and not os.path.exists(file_name):
+                        temporary_name = file_name + TEMPORARY_SUFFIX
+                        with h5py.File(temporary_name, mode='w') as root:
+                            to_hdf5(root, name, obj, reserved=reserved, delta=self.delta_tracker,
+                                    policies=self.policies, blobs=self.blobs, target_file_name=file_name)
+                        if durability.fsync:
+                            _fsync(temporary_name)
+                        os.replace(temporary_name, file_name)
+                        if durability.fsync:
+                            # the rename is only durable once the directory entry is on the disk
+                            _fsync_directory(os.path.dirname(os.path.abspath(file_name)))
+                    else:
+                        with h5py.File(file_name, mode='a') as root:
+                            to_hdf5(root, name, obj, reserved=reserved, delta=self.delta_tracker,
+                                    policies=self.policies, blobs=self.blobs)
+                        written.append(file_name)
+
+                else:
+                    if journal is not None and os.path.abspath(journal.filename) != os.path.abspath(file_name):
+                        journal.close()
+                        journal = None
+                    if journal is None:
+                        journal = h5py.File(file_name, mode='a')
+                        written.append(file_name)
+                    append_to_journal(journal, int(entry), name, obj, reserved=reserved, delta=self.delta_tracker,
+                                      policies=self.policies, blobs=self.blobs, **(index_entry or dict()))
+        finally:
+            if journal is not None:
+                journal.close()
+            if self.blobs is not None:
+                self.blobs.close()
+
+        if durability.fsync:
+            if self.blobs is not None:
+                written.append(self.blobs.file_name)
+            for file_name in set(written):
+                _fsync(file_name)
+
+    def read(self, file_name: str, reserved, lazy_threshold: Optional[int] = None,
+             mmap_threshold: Optional[int] = None) -> dict:
+        return from_hdf5(file_name, reserved, lazy_threshold, mmap_threshold)
+
+
+class _NpyTreeWriter:
+    """Encodes an object tree as JSON compatible manifest nodes and saves the arrays as .npy files."""
+    def __init__(self, directory: str, array_prefix: str, reserved: dict):
+        self.directory = directory
+        self.array_prefix = array_prefix
+        self.n_arrays = 0
+        self.n_objects = 0
+
+        # id -> node, like the serialized map of _to_hdf5
+        self.serialized = {id(value): {'#reserved': key} for key, value in reserved.items()}
+        # keeps to_hdf5 temporaries alive so their ids are not reused
+        self.alive = []
+
+    def _array(self, arr) -> dict:
+        arr = np.asarray(arr)
+        if arr.dtype == 'O':
+            if not all(isinstance(item, str) for item in arr.ravel()):
+                raise RuntimeError('Can only store object arrays of strings', arr)
+            return {'#type': 'ndarray', 'shape': list(arr.shape), 'strings': arr.ravel().tolist()}
+
+        relative_path = posixpath.join(self.array_prefix, '{}.npy'.format(self.n_arrays))
+        self.n_arrays += 1
+        np.save(os.path.join(self.directory, relative_path), arr, allow_pickle=False)
+        return {'#type': 'ndarray', 'file': relative_path}
+
+    def _register(self, obj, node: dict) -> dict:
+        node['#id'] = self.n_objects
+        self.serialized[id(obj)] = {'#ref': self.n_objects}
+        self.n_objects += 1
+        self.alive.append(obj)
+        return node
+
+    def encode(self, obj):
+        if id(obj) in self.serialized:
+            return self.serialized[id(obj)]
+
+        if obj is None or isinstance(obj, (bool, int, float, str)):
+            return obj
+
+        if isinstance(obj, LazyArray):
+            return self.encode(obj.load())
+
+        if isinstance(obj, _FrozenPandas):
+            return self.encode(obj.restore())
+
+        if isinstance(obj, dict):
+            node = self._register(obj, {'#type': 'dict', 'members': dict()})
+            for key, value in obj.items():
+                node['members'][key] = self.encode(value)
+            return node
+
+        if isinstance(obj, (list, tuple)):
+            node = self._register(obj, {'#type': 'list' if isinstance(obj, list) else 'tuple', 'items': []})
+            node['items'].extend(self.encode(value) for value in obj)
+            return node
+
+        if _is_serializable(obj):
+            node = self._register(obj, {'#type': _type_name(obj), 'members': dict()})
+            for key, value in obj.to_hdf5().items():
+                node['members'][key] = self.encode(value)
+            return node
+
+        if isinstance(obj, pd.DataFrame):
+            return self._register(obj, {'#type': 'DataFrame', 'values': self._array(obj.values),
+                                        'index': self._array(obj.index), 'columns': self._array(obj.columns)})
+
+        if isinstance(obj, pd.Series):
+            return self._register(obj, {'#type': 'Series', 'values': self._array(obj.values),
+                                        'index': self._array(obj.index)})
+
+        if isinstance(obj, np.ndarray):
+            return self._register(obj, self._array(obj))
+
+        if isinstance(obj, complex):
+            return {'#type': 'complex', 'value': [obj.real, obj.imag]}
+
+        if isinstance(obj, np.generic) and obj.dtype.kind in 'biufc':
+            value = obj.item()
+            if isinstance(value, complex):
+                value = [value.real, value.imag]
+            return {'#type': 'numpy', 'dtype': obj.dtype.str, 'value': value}
+
+        raise RuntimeError('Can not store object', obj)
+
+
+class _NpyTreeReader:
+    def __init__(self, directory: str, reserved, lazy_threshold: Optional[int], mmap_threshold: Optional[int] = None):
+        self.directory = directory
+        self.reserved = reserved
+        self.lazy_threshold = lazy_threshold
+        self.mmap_threshold = mmap_threshold
+        self.deserialized = dict()
+
+    def _array(self, node: dict) -> np.ndarray:
+        if 'strings' in node:
+            result = np.empty(len(node['strings']), dtype=object)
+            result[:] = node['strings']
+            return result.reshape(node['shape'])
+
+        file_name = os.path.join(self.directory, node['file'])
+        thresholds = [threshold for threshold in (self.lazy_threshold, self.mmap_threshold) if threshold is not None]
+        if not thresholds:
+            return np.load(file_name, allow_pickle=False)
+
+        result = np.load(file_name, mmap_mode='r', allow_pickle=False)
+        if result.nbytes < min(thresholds):
+            result = np.array(result)
+        return result
+
+    def decode(self, node):
+        if not isinstance(node, dict):
+            return node
+
+        if '#ref' in node:
+            return self.deserialized[node['#ref']]
+
+        if '#reserved' in node:
+            return self.reserved[node['#reserved']]
+
+        type_name = node['#type']
+
+        if type_name == 'dict':
+            result = self.deserialized[node['#id']] = dict()
+            for key, value in node['members'].items():
+                result[key] = self.decode(value)
+
+        elif type_name == 'list':
+            result = self.deserialized[node['#id']] = list()
+            result.extend(self.decode(value) for value in node['items'])
+
+        elif type_name == 'tuple':
+            result = self.deserialized[node['#id']] = tuple(self.decode(value) for value in node['items'])
+
+        elif type_name == 'ndarray':
+            result = self._array(node)
+
+        elif type_name == 'DataFrame':
+            result = pd.DataFrame(self._array(node['values']),
+                                  index=self._array(node['index']), columns=self._array(node['columns']))
+
+        elif type_name == 'Series':
+            result = pd.Series(self._array(node['values']), index=self._array(node['index']))
+
+        elif type_name == 'complex':
+            return complex(*node['value'])
+
+        elif type_name == 'numpy':
+            value = node['value']
+            if isinstance(value, list):
+                value = complex(*value)
+            return np.dtype(node['dtype']).type(value)
+
+        elif type_name in serializables:
+            kwargs = {key: self.decode(value) for key, value in node['members'].items()}
+            result = serializables[type_name](**kwargs)
+
+        else:
+            raise RuntimeError('Unknown type', type_name)
+
+        if '#id' in node:
+            self.deserialized[node['#id']] = result
+        return result
+
+
+class NpyDirectoryBackend(StorageBackend):
+    """
+    Stores each file as a directory that contains one .npy file per array and a JSON manifest with the object tree.
+    It only requires numpy and the standard library. The manifest is replaced atomically after all arrays are written.
+    Journals, delta snapshots, storage policies and blob stores are only supported by the HDF5 backend.
+    """
+    extension = '.npydir'
+    manifest_name = 'manifest.json'
+
+    @classmethod
+    def handles(cls, file_name: str) -> bool:
+        return os.path.isfile(os.path.join(file_name, cls.manifest_name))
+
+    def write(self, file_name: str, name: str, obj, reserved: Optional[dict] = None,
+              index_entry: Optional[dict] = None):
+        if split_journal_entry_path(file_name)[1] is not None:
+            raise ValueError('Journals are only supported by the HDF5 backend', file_name)
+        reserved = reserved or dict()
+
+        manifest_path = os.path.join(file_name, self.manifest_name)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+        else:
+            manifest = {'#version': get_version(), 'reserved': [], 'root': dict()}
+        if name in manifest['root']:
+            raise ValueError('{} already contains {}'.format(file_name, name))
+
+        os.makedirs(os.path.join(file_name, name), exist_ok=True)
+        writer = _NpyTreeWriter(file_name, name, reserved)
+        manifest['root'][name] = writer.encode(obj)
+        manifest['reserved'] = sorted(set(manifest['reserved']).union(reserved))
+
+        with open(manifest_path + '.tmp', 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    def read(self, file_name: str, reserved, lazy_threshold: Optional[int] = None,
+             mmap_threshold: Optional[int] = None) -> dict:
+        _import_all()
+
+        with open(os.path.join(file_name, self.manifest_name), 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+
+        reader = _NpyTreeReader(file_name, reserved, lazy_threshold, mmap_threshold)
+        result = {key: reserved[key] for key in manifest['reserved']}
+        for key, node in manifest['root'].items():
+            result[key] = reader.decode(node)
+        return result
+
+
+storage_backends = {'hdf5': HDF5Backend, 'npy': NpyDirectoryBackend}
+
+
+def from_file(file_name: str, reserved, lazy_threshold: Optional[int] = None,
+              mmap_threshold: Optional[int] = None) -> dict:
+    """
+    Reads a file written by any of the storage backends.
+    :param file_name: File name, journal entry path or directory of the NpyDirectoryBackend.
+    :param reserved: Objects which replace the reserved entries.
+    :param lazy_threshold: Arrays of at least this many bytes are not read into memory on loading.
+    :param mmap_threshold: Arrays of at least this many bytes are returned as read only memory maps if they are stored
+    contiguous. See from_hdf5.
+    :return: All objects of the file and the reserved ones by name.
+    """
+    if NpyDirectoryBackend.handles(file_name):
+        return NpyDirectoryBackend().read(file_name, reserved, lazy_threshold, mmap_threshold)
+    return from_hdf5(file_name, reserved, lazy_threshold, mmap_threshold)
+
+
+def _writer_target(write_queue: Union[multiprocessing.JoinableQueue, queue.Queue], logger='qtune',
+                   backend: StorageBackend = None,
+                   results: Union[multiprocessing.SimpleQueue, queue.SimpleQueue] = None):
+    """Writes the batches from write_queue until it gets None. If results is given, True or False is put into it for
+    each batch before it is marked as done, depending on whether it was committed."""
+    if backend is None:
+        backend = HDF5Backend()
     while True:
         task = write_queue.get()
+        shared = None
         try:
+            if isinstance(task, _SharedMemoryTask):
+                shared, task = task, task.task
+
             if task is None:
                 return
             else:
-                name, file_name, obj, reserved = task
-
-            try:
-                to_hdf5(file_name, name, obj, reserved=reserved)
-            except:
-                logging.getLogger(logger).exception('Error while writing "%s"' % file_name)
-                raise
+                _write_batch(backend, task.tasks, task.durability)
+                if results is not None:
+                    results.put(True)
+        except:
+            logging.getLogger(logger).exception('Error while writing %s' % _describe_tasks(task))
+            if results is not None:
+                results.put(False)
+            raise
         finally:
+            if shared is not None:
+                task = None
+                shared.release()
             write_queue.task_done()
 
 
+class _WriteBatch:
+    """Snapshots which are committed together by the writer worker."""
+    __slots__ = ('tasks', 'durability')
+
+    def __init__(self, tasks: list, durability: 'DurabilityPolicy'):
+        self.tasks = tasks
+        self.durability = durability
+
+
+def _describe_tasks(batch: _WriteBatch) -> str:
+    return ', '.join('"%s"' % task[1] for task in batch.tasks)
+
+
+def _write_batch(backend: StorageBackend, tasks: Sequence[tuple], durability: 'DurabilityPolicy'):
+    """Writes the snapshots and afterwards the summary rows of all of them. Each summary file is opened once."""
+    backend.write_batch([(file_name, name, obj, reserved, index_entry)
+                         for name, file_name, obj, reserved, index_entry, _ in tasks], durability)
+
+    summaries = collections.OrderedDict()
+    for _, file_name, _, _, index_entry, summary in tasks:
+        if summary is not None:
+            summaries.setdefault(summary_file_name(file_name), []).append((file_name, summary,
+                                                                           index_entry['timestamp']))
+    for summary_file, rows in summaries.items():
+        with h5py.File(summary_file, mode='a') as root:
+            for file_name, summary, timestamp in rows:
+                append_summary(root, file_name, summary, timestamp=timestamp)
+        if durability.fsync:
+            _fsync(summary_file)
+
+
+class WriterStatistics:
+    """Counters of an AsynchronousHDF5Writer. Durations are in seconds and None if nothing was measured yet."""
+    __slots__ = ('queue_depth', 'bytes_pending', 'written', 'dropped', 'coalesced',
+                 'last_write_latency', 'mean_write_latency', 'last_foreground_duration')
+
+    def __init__(self, queue_depth: int, bytes_pending: int, written: int, dropped: int, coalesced: int,
+                 last_write_latency: Optional[float], mean_write_latency: Optional[float],
+                 last_foreground_duration: Optional[float]):
+        self.queue_depth = queue_depth
+        self.bytes_pending = bytes_pending
+        self.written = written
+        self.dropped = dropped
+        self.coalesced = coalesced
+        self.last_write_latency = last_write_latency
+        self.mean_write_latency = mean_write_latency
+        self.last_foreground_duration = last_foreground_duration
+
+    def __str__(self):
+        def milliseconds(duration):
+            return '-' if duration is None else '%.1f ms' % (duration * 1e3)
+        return ('queue: {} ({:.1f} MiB), written: {}, dropped: {}, coalesced: {}, '
+                'latency: {} (mean {}), foreground: {}').format(self.queue_depth, self.bytes_pending / 2 ** 20,
+                                                                self.written, self.dropped, self.coalesced,
+                                                                milliseconds(self.last_write_latency),
+                                                                milliseconds(self.mean_write_latency),
+                                                                milliseconds(self.last_foreground_duration))
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__,
+                               ', '.join('{}={!r}'.format(name, getattr(self, name)) for name in self.__slots__))
+
+
+class _PendingWrite:
+    __slots__ = ('task', 'nbytes', 'voltages_changed', 'enqueued')
+
+    def __init__(self, task: tuple, nbytes: int, voltages_changed: bool):
+        self.task = task
+        self.nbytes = nbytes
+        self.voltages_changed = voltages_changed
+        self.enqueued = time.perf_counter()
+
+
+class DurabilityPolicy(metaclass=HDF5Serializable):
+    """
+    Decides how many snapshots the AsynchronousHDF5Writer commits together. A commit writes all snapshots of the batch
+    with one open/close cycle per file and blob store. The guarantees are:
+
+    - A snapshot is handed to the operating system when its commit ends and written to the disk if fsync is True.
+    - On a crash at most the snapshots queued in the last max_delay seconds, but not more than max_batch of them, are
+      lost. Snapshots with voltage changes end a batch if commit_on_voltage_change is True.
+    - With atomic_files new plain files are written under a temporary name and renamed after closing them, so a file
+      with the final name is always complete. A crash during the commit leaves a file ending with TEMPORARY_SUFFIX.
+    - Journals and summary tables are appended in place. A crash during their commit can damage the last entries.
+    """
+    def __init__(self, max_delay: float = 0., max_batch: int = 1, commit_on_voltage_change: bool = True,
+                 atomic_files: bool = False, fsync: bool = False):
+        """
+        :param max_delay: Maximal time in seconds a snapshot waits in the queue for further snapshots of its batch.
+        :param max_batch: Maximal number of snapshots per commit.
+        :param commit_on_voltage_change: Commit as soon as a snapshot with voltage change is queued.
+        :param atomic_files: Write new plain files under a temporary name and rename them.
+        :param fsync: Wait until the written files are on the disk before the commit ends.
+        """
+        if max_batch < 1:
+            raise ValueError('max_batch must be at least 1', max_batch)
+        if max_delay < 0:
+            raise ValueError('max_delay must not be negative', max_delay)
+        self.max_delay = float(max_delay)
+        self.max_batch = int(max_batch)
+        self.commit_on_voltage_change = bool(commit_on_voltage_change)
+        self.atomic_files = bool(atomic_files)
+        self.fsync = bool(fsync)
+
+    def to_hdf5(self):
+        return dict(max_delay=self.max_delay,
+                    max_batch=self.max_batch,
+                    commit_on_voltage_change=self.commit_on_voltage_change,
+                    atomic_files=self.atomic_files,
+                    fsync=self.fsync)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__,
+                               ', '.join('{}={!r}'.format(key, value) for key, value in self.to_hdf5().items()))
+
+
+class _WriteQueue:
+    """
+    Bounded queue of snapshots waiting to be written.
+    block: put blocks while the queue is full.
+    drop_superseded: if the queue is full the oldest pending snapshot without voltage change which is superseded by a
+    newer one without voltage change before the next voltage change is dropped. put blocks if there is none.
+    coalesce: a snapshot without voltage change replaces a directly preceding pending snapshot without voltage change.
+    put blocks while the queue is full.
+    """
+    def __init__(self, maxsize: int = 0, policy: str = 'block'):
+        if policy not in AsynchronousHDF5Writer.queue_policies:
+            raise ValueError('Unknown queue policy', policy)
+        self.maxsize = maxsize
+        self.policy = policy
+
+        self._pending = collections.deque()
+        self._condition = threading.Condition()
+        self._unfinished = 0
+        self._closed = False
+
+        self.bytes_pending = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return self._unfinished
+
+    def _discard(self, item: _PendingWrite):
+        self._pending.remove(item)
+        self._unfinished -= 1
+        self.bytes_pending -= item.nbytes
+
+    def _superseded(self, item: _PendingWrite) -> Optional[_PendingWrite]:
+        """
+        Oldest pending snapshot without voltage change that is directly followed by another snapshot without voltage
+        change, either pending or the new item. The last snapshot before a voltage change is never returned because it
+        holds the final state of its row.
+        """
+        successors = itertools.chain(itertools.islice(self._pending, 1, None), (item,))
+        for pending, successor in zip(self._pending, successors):
+            if (pending is not None and not pending.voltages_changed
+                    and successor is not None and not successor.voltages_changed):
+                return pending
+        return None
+
+    def put(self, item: Optional[_PendingWrite]):
+        """Put None to stop the dispatcher after all pending snapshots are written."""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('Writer already stopped')
+
+            if item is not None and self.policy == 'coalesce' and not item.voltages_changed and self._pending:
+                previous = self._pending[-1]
+                if previous is not None and not previous.voltages_changed:
+                    self._discard(previous)
+                    self.coalesced += 1
+
+            while 0 < self.maxsize <= len(self._pending):
+                if item is not None and self.policy == 'drop_superseded':
+                    superseded = self._superseded(item)
+                    if superseded is not None:
+                        self._discard(superseded)
+                        self.dropped += 1
+                        continue
+
+                self._condition.wait()
+                if self._closed:
+                    raise RuntimeError('Writer already stopped')
+
+            self._pending.append(item)
+            self._unfinished += 1
+            if item is not None:
+                self.bytes_pending += item.nbytes
+            self._condition.notify_all()
+
+    def get(self) -> Optional[_PendingWrite]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            item = self._pending.popleft()
+            self._condition.notify_all()
+            return item
+
+    def get_batch(self, durability: DurabilityPolicy) -> List[Optional[_PendingWrite]]:
+        """
+        Waits until the oldest pending snapshot is due and returns it together with the following ones, at most
+        durability.max_batch. A snapshot is due after durability.max_delay seconds, when the batch is full, when a
+        snapshot with voltage change is pending and durability.commit_on_voltage_change is set, or when None is pending.
+        The batch ends after a None.
+        """
+        with self._condition:
+            while True:
+                while not self._pending:
+                    self._condition.wait()
+
+                if self._is_due(durability):
+                    break
+
+                timeout = self._pending[0].enqueued + durability.max_delay - time.perf_counter()
+                if timeout <= 0:
+                    break
+                self._condition.wait(timeout)
+
+            batch = []
+            while self._pending and len(batch) < durability.max_batch:
+                item = self._pending.popleft()
+                batch.append(item)
+                if item is None:
+                    break
+            self._condition.notify_all()
+            return batch
+
+    def _is_due(self, durability: DurabilityPolicy) -> bool:
+        if len(self._pending) >= durability.max_batch or durability.max_delay == 0:
+            return True
+        for item in self._pending:
+            if item is None or (durability.commit_on_voltage_change and item.voltages_changed):
+                return True
+        return False
+
+    def task_done(self, item: Optional[_PendingWrite]):
+        with self._condition:
+            self._unfinished -= 1
+            if item is not None:
+                self.bytes_pending -= item.nbytes
+
+    def close(self):
+        """Wake up and fail all blocked put calls."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
 class AsynchronousHDF5Writer:
     """
     The asynchronous writer can improve the performance by writing in separate threads.
     """
-    def __init__(self, reserved, multiprocess=True):
+    queue_policies = ('block', 'drop_superseded', 'coalesce')
+
+    def __init__(self, reserved, multiprocess=True, delta=False, storage_policies: Sequence[StoragePolicy] = (),
+                 shared_memory_threshold: Optional[int] = 2 ** 16, max_queue_size: int = 0,
+                 queue_policy: str = 'block', backend: str = 'hdf5', blob_file: Optional[str] = None,
+                 durability: Optional[DurabilityPolicy] = None):
+        """
+        :param reserved: Objects which are not written but reserved by name.
+        :param multiprocess: Write in a separate process instead of a thread.
+        :param delta: Only write objects which changed since the last snapshot and link the unchanged ones.
+        :param storage_policies: Chunking and compression of array data.
+        :param shared_memory_threshold: Arrays of at least this many bytes are passed to the writer process in shared
+        memory instead of through the pipe. None disables the shared memory transport. Ignored for threads and on
+        python versions without multiprocessing.shared_memory.
+        :param max_queue_size: Maximal number of snapshots waiting to be written. 0 means unbounded.
+        :param queue_policy: Behaviour of write if the queue is full. One of queue_policies:
+        'block' waits until there is space. 'drop_superseded' drops the oldest pending snapshot without voltage change
+        that is followed by a newer snapshot without voltage change, so the last snapshot before each voltage change
+        is kept, and waits if there is none. 'coalesce' additionally replaces a directly
+        preceding pending snapshot without voltage change by a new one without voltage change and waits if the queue
+        is still full.
+        :param backend: Name of the storage backend in storage_backends.
+        :param blob_file: If given, array data is deduplicated across snapshots in this BlobStore file.
+        :param durability: Batching and crash safety of the commits. The default commits each snapshot on its own.
+        """
         reserved = reserved.copy()
 
         self.reserved = reserved
+        self.delta = delta
+        self.storage_policies = tuple(storage_policies)
+        self.max_queue_size = max_queue_size
+        self.queue_policy = queue_policy
+        self.durability = durability or DurabilityPolicy()
+
+        self._journal_lengths = dict()
+
+        #: Time in seconds spent in the calling thread by the most recent calls to write
+        self.foreground_durations = collections.deque(maxlen=1000)
+
+        #: Time in seconds from the call to write until the snapshot is written
+        self.write_latencies = collections.deque(maxlen=1000)
+
+        self._written = 0
+
+        if multiprocess and shared_memory is not None:
+            self.shared_memory_threshold = shared_memory_threshold
+        else:
+            self.shared_memory_threshold = None
 
         if multiprocess:
             self.QueueType = multiprocessing.JoinableQueue
+            self.ResultQueueType = multiprocessing.SimpleQueue
             self.WorkerType = multiprocessing.Process
         else:
             self.QueueType = queue.Queue
+            self.ResultQueueType = queue.SimpleQueue
             self.WorkerType = threading.Thread
 
         self._worker = None
         self._queue = None
+        self._results = None
+        self._pending = None
+        self._dispatcher = None
+
+        if backend == 'hdf5':
+            self.backend = HDF5Backend(delta=delta, policies=storage_policies, blob_file=blob_file)
+        elif delta or storage_policies or blob_file:
+            raise ValueError('Delta snapshots, storage policies and blob stores are only supported by the HDF5 backend')
+        else:
+            self.backend = storage_backends[backend]()
 
         self._initialize()
 
     def _initialize(self):
+        self._pending = _WriteQueue(self.max_queue_size, self.queue_policy)
+
         self._queue = self.QueueType()
-        self._worker = self.WorkerType(target=_writer_target, args=(self._queue,))
+        self._results = self.ResultQueueType()
+        self._worker = self.WorkerType(target=_writer_target, args=(self._queue, 'qtune', self.backend, self._results))
         self._worker.start()
 
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch(self):
+        """Passes the pending snapshots to the worker one batch at a time so they can be dropped or coalesced until the
+        worker is ready. The batches are formed according to the durability policy."""
+        try:
+            while self._worker.is_alive():
+                items = self._pending.get_batch(self.durability)
+                pending_writes = [item for item in items if item is not None]
+
+                if pending_writes:
+                    task = _WriteBatch([self._project_summary(item.task) for item in pending_writes], self.durability)
+                    if self.shared_memory_threshold is not None:
+                        task = _SharedMemoryTask(task, self.shared_memory_threshold)
+                    self._queue.put(task)
+                    del task
+                    self._queue.join()
+                    success = self._results.get()
+
+                    committed = time.perf_counter()
+                    for item in pending_writes:
+                        self._pending.task_done(item)
+                        if success:
+                            self._written += 1
+                            self.write_latencies.append(committed - item.enqueued)
+
+                if items[-1] is None:
+                    self._queue.put(None)
+                    self._queue.join()
+                    self._pending.task_done(None)
+                    return
+        finally:
+            self._pending.close()
+
+    def _project_summary(self, task: tuple) -> tuple:
+        """Computes the summary columns of snapshots which were written with summary=True."""
+        name, file_name, obj, reserved, index_entry, summary = task
+        if summary is not True:
+            return task
+        try:
+            summary = _summary_projection(obj)(restore_snapshot(obj, self.reserved))
+        except Exception:
+            logging.getLogger('qtune').exception('Could not compute the summary of "%s"', file_name)
+            summary = None
+        return name, file_name, obj, reserved, index_entry, summary
+
     def restart(self):
         self.join()
 
@@ -345,35 +2255,103 @@ class AsynchronousHDF5Writer:
 
     def join(self):
         """Stop writing and join thread."""
-        if self._worker.is_alive():
-            self._queue.put(None)
-            self._queue.join()
+        if self._worker is None:
+            return
 
-        elif self._queue.qsize():
-            warnings.warn("Storage queue contains data but the writer worker is already dead.")
+        if self._dispatcher.is_alive() and self._worker.is_alive():
+            self._pending.put(None)
+            self._dispatcher.join()
+
+        else:
+            if len(self._pending):
+                warnings.warn("Storage queue contains data but the writer worker is already dead.")
+            if self._worker.is_alive():
+                self._queue.put(None)
+                self._queue.join()
 
         self._worker.join()
 
     def __del__(self):
         self.join()
 
-    def write(self, obj, file_name, name=None):
+    def statistics(self) -> WriterStatistics:
+        latencies = list(self.write_latencies)
+        return WriterStatistics(queue_depth=len(self._pending),
+                                bytes_pending=self._pending.bytes_pending,
+                                written=self._written,
+                                dropped=self._pending.dropped,
+                                coalesced=self._pending.coalesced,
+                                last_write_latency=latencies[-1] if latencies else None,
+                                mean_write_latency=sum(latencies) / len(latencies) if latencies else None,
+                                last_foreground_duration=self.foreground_durations[-1]
+                                if self.foreground_durations else None)
+
+    def next_journal_entry(self, file_name: str) -> str:
+        """
+        Reserves the next entry of a journal file.
+        :param file_name: Journal file.
+        :return: Entry path that can be passed to write.
+        """
+        if file_name not in self._journal_lengths:
+            if os.path.isfile(file_name):
+                # dropped snapshots leave gaps in the iteration numbers
+                iterations = read_journal_index(file_name)['iteration']
+                self._journal_lengths[file_name] = int(iterations.max()) + 1 if len(iterations) else 0
+            else:
+                self._journal_lengths[file_name] = 0
+        iteration = self._journal_lengths[file_name]
+        self._journal_lengths[file_name] += 1
+        return journal_entry_path(file_name, iteration)
+
+    def write(self, obj, file_name, name=None, tuner_index: int = -1, voltages_changed: bool = False,
+              summary: Union[None, bool, Dict[str, float]] = None):
+        """
+        Queue a snapshot of the object for writing. The time spent in the calling thread is recorded in
+        foreground_durations. If the queue is full the queue_policy decides whether this call blocks or a pending
+        snapshot is dropped.
+        :param obj:
+        :param file_name: File name or journal entry path obtained from next_journal_entry.
+        :param name: Name of the object in the file. Defaults to the current time.
+        :param tuner_index: Stored in the journal index. Ignored for plain files.
+        :param voltages_changed: Stored in the journal index. Snapshots with voltage changes are never dropped or
+        coalesced.
+        :param summary: If given, these values are appended to the summary table of the run (see append_summary)
+        after the snapshot is written. If True, they are computed from the snapshot by the function registered for the
+        type of obj in summary_projections when the snapshot is passed to the worker, i.e. not in the calling thread.
+        :return: None
+        """
         if not self._worker.is_alive():
             raise RuntimeError('Writer already stopped')
 
+        timestamp = time_string()
         if name is None:
-            name = time_string()
+            name = timestamp
+
+        start = time.perf_counter()
+
+        obj, reserved, nbytes = _snapshot_with_size(obj, self.reserved)
+
+        index_entry = dict(timestamp=timestamp, tuner_index=tuner_index, voltages_changed=voltages_changed)
 
-        obj, reserved = copy.deepcopy((obj, self.reserved))
+        self._pending.put(_PendingWrite((name, file_name, obj, reserved, index_entry, summary), nbytes,
+                                        voltages_changed))
 
-        self._queue.put((name, file_name, obj, reserved))
+        duration = time.perf_counter() - start
+        self.foreground_durations.append(duration)
+        logging.getLogger('qtune').debug('Queued "%s" for writing in %.3f ms', file_name, duration * 1e3)
+
+
+def _read_projection(file_name: str, reserved, lazy_threshold: Optional[int], mmap_threshold: Optional[int],
+                     projection: Callable[[dict], object]):
+    return projection(from_file(file_name, reserved, lazy_threshold, mmap_threshold))
 
 
 class ParallelHDF5Reader:
     """
     The parallel reader can improve the performance by reading in separate threads.
     """
-    def __init__(self, reserved, multiprocess=True, max_workers=None):
+    def __init__(self, reserved, multiprocess=True, max_workers=None, lazy_threshold: Optional[int] = None,
+                 mmap_threshold: Optional[int] = None):
         import concurrent.futures
         if multiprocess:
             Executor = concurrent.futures.ProcessPoolExecutor
@@ -382,9 +2360,25 @@ class ParallelHDF5Reader:
 
         self._executor = Executor(max_workers=max_workers)
         self.reserved = reserved
-
-    def read_iter(self, file_names: Iterable[str]) -> Generator:
-        yield from self._executor.map(from_hdf5, file_names, itertools.repeat(self.reserved), chunksize=1)
+        self.lazy_threshold = lazy_threshold
+        self.mmap_threshold = mmap_threshold
+
+    def read_iter(self, file_names: Iterable[str], projection: Optional[Callable[[dict], object]] = None) -> Generator:
+        """
+        Reads the files in the workers.
+        :param file_names: Files to read.
+        :param projection: If given, this function is applied to the loaded data inside the worker and only its result
+        is transferred back. Has to be picklable if the reader is multiprocess.
+        :return: Generator over the loaded data or the projections in the order of file_names.
+        """
+        if projection is None:
+            yield from self._executor.map(from_file, file_names, itertools.repeat(self.reserved),
+                                          itertools.repeat(self.lazy_threshold), itertools.repeat(self.mmap_threshold),
+                                          chunksize=1)
+        else:
+            yield from self._executor.map(_read_projection, file_names, itertools.repeat(self.reserved),
+                                          itertools.repeat(self.lazy_threshold), itertools.repeat(self.mmap_threshold),
+                                          itertools.repeat(projection), chunksize=1)
 
     def shutdown(self):
         self._executor.shutdown()
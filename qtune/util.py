@@ -19,14 +19,10 @@ import datetime
 import time
 import os
 import subprocess
-from typing import Iterable, Any, Callable, Sequence, Optional, Dict
-import numbers
-import matplotlib.axes
-import matplotlib.pyplot as plt
+import functools
+from typing import Iterable, Any, Callable, Sequence
 
 import numpy as np
-import sympy as sp
-import pandas as pd
 
 
 __all__ = ['nth', 'get_orthogonal_vector', 'time_string', 'calculate_gradient_non_orthogonal']
@@ -201,6 +197,8 @@ def calculate_gradient_non_orthogonal(positions: Sequence[np.ndarray],
 
 def get_orthogonal_vector(vectors: Sequence[np.ndarray]):
     """Return a vector orthogonal to the given ones"""
+    import sympy as sp
+
     ov, *_ = sp.Matrix(vectors).nullspace()
     # ov = np.asarray(ov, dtype=float)
     ov = np.array(ov).astype(float)
@@ -208,86 +206,6 @@ def get_orthogonal_vector(vectors: Sequence[np.ndarray]):
     return ov / np.linalg.norm(ov)
 
 
-def plot_raw_data_fit(y_data: np.ndarray, x_data: Optional[np.ndarray], fit_function=None,
-                      function_args: Optional[Dict[str, numbers.Number]]=None,
-                      initial_arguments: Optional[Dict[str, numbers.Number]]=None,
-                      ax: Optional[matplotlib.axes.Axes]=None):
-    """
-    Plots data fits.
-    :param y_data:
-    :param x_data:
-    :param fit_function:
-    :param function_args: Arguments of the fitting function.
-    :param initial_arguments: Initial guess of the arguments.
-    :param ax: Instance of matplotlib.axes.Axes. Essentially the plot.
-    :return: The Axes instance.
-    """
-    if ax is None:
-        ax = plt.gca()
-    if y_data is None:
-        return ax
-    y_data = y_data.squeeze()
-    if len(y_data.shape) == 2:
-        y_data = np.nanmean(y_data, 0)
-    if x_data is None:
-        x_data = np.arange(0, y_data.shape[0])
-    if isinstance(function_args, pd.Series):
-        function_args = dict(function_args)
-    if isinstance(initial_arguments, pd.Series):
-        initial_arguments = dict(initial_arguments)
-
-    for data in [x_data, y_data]:
-        if len(data.shape) > 1:
-            raise RuntimeError('Data has too many dimensions and therefore can not be plotted')
-
-    ax.plot(x_data, y_data, 'b.', label='Raw Data')
-    if fit_function:
-        if function_args:
-            ax.plot(x_data, fit_function(x_data, **function_args), 'r', label='Fit')
-        if initial_arguments:
-            ax.plot(x_data, fit_function(x_data, **initial_arguments), 'k--', label='Initial Guess')
-    return ax
-
-
-def plot_raw_data_vertical_marks(y_data, x_data, marking_position, ax=None):
-    """
-    Draws a vertical line through data to mark e.g. a transition
-    :param y_data:
-    :param x_data:
-    :param marking_position:
-    :param ax: Axes for the plot.
-    :return: Axes instance.
-    """
-    if ax is None:
-        ax = plt.gca()
-    if y_data is None:
-        return ax
-    y_data = y_data.squeeze()
-    if len(y_data) == 2:
-        y_data = np.nanmean(y_data)
-    if x_data is None:
-        x_data = np.arange(0, y_data.shape[0])
-
-    ax.plot(x_data, y_data, 'b.', label='Raw Data')
-    ax.vlines(x=marking_position, ymin=min(y_data), ymax=max(y_data), label='Transition Position')
-    ax.legend()
-    return ax
-
-
-def plot_raw_data_2_dim_marks(y_data, x_data, marking_position, ax=None):
-    if ax is None:
-        ax = plt.gca()
-    if y_data is None:
-        return ax
-    y_data = y_data.squeeze()
-    x, y = np.meshgrid(x_data[1], x_data[0])
-    image = ax.pcolormesh(x, y, y_data)
-    ax.hlines(y=marking_position.iloc[0], xmin=min(x_data[1]), xmax=max(x_data[1]))
-    ax.vlines(x=marking_position.iloc[1], ymin=min(x_data[0]), ymax=max(x_data[0]))
-    plt.colorbar(image, ax=ax)
-    return ax
-
-
 def get_git_info():
     if os.path.isdir(os.path.join(os.path.dirname(__file__), '..', '.git')):
         git_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -312,7 +230,9 @@ def get_git_info():
     return None, None
 
 
+@functools.lru_cache(maxsize=None)
 def get_version():
+    """The version is determined once per process because asking git is slow."""
     import qtune
     base = qtune.__version__
 
@@ -322,3 +242,23 @@ def get_version():
         return '%s+%d+%s' % (base, commit_time, commit_hash)
 
     return base
+
+
+# The plotting functions moved to qtune.plotting so importing this module does not import matplotlib. These wrappers
+# keep the old names working without a module __getattr__ which needs Python 3.7.
+def plot_raw_data_fit(*args, **kwargs):
+    """See qtune.plotting.plot_raw_data_fit."""
+    import qtune.plotting
+    return qtune.plotting.plot_raw_data_fit(*args, **kwargs)
+
+
+def plot_raw_data_vertical_marks(*args, **kwargs):
+    """See qtune.plotting.plot_raw_data_vertical_marks."""
+    import qtune.plotting
+    return qtune.plotting.plot_raw_data_vertical_marks(*args, **kwargs)
+
+
+def plot_raw_data_2_dim_marks(*args, **kwargs):
+    """See qtune.plotting.plot_raw_data_2_dim_marks."""
+    import qtune.plotting
+    return qtune.plotting.plot_raw_data_2_dim_marks(*args, **kwargs)
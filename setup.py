@@ -106,6 +106,7 @@ setuptools.setup(
     long_description_content_type="text/markdown",
 
     install_requires=REQUIRED_PACKAGES,
+    extras_require={'arrow': ['pyarrow']},
     setup_requires=['pytest-runner'] + REQUIRED_PACKAGES,
 
     test_suite="tests",
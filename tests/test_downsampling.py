@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from qtune.downsampling import MinMaxPyramid, min_max_indices, lttb_indices
+
+
+class MinMaxTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.values = np.cumsum(rng.normal(size=20011))
+        self.values[rng.rand(self.values.size) < .01] = np.nan
+
+    def assert_envelope(self, positions, start, stop):
+        self.assertEqual(positions[0], start)
+        self.assertEqual(positions[-1], stop - 1)
+        self.assertTrue(np.all(np.diff(positions) > 0))
+        self.assertEqual(np.nanmin(self.values[positions]), np.nanmin(self.values[start:stop]))
+        self.assertEqual(np.nanmax(self.values[positions]), np.nanmax(self.values[start:stop]))
+
+    def test_min_max_indices(self):
+        positions = min_max_indices(self.values, 10, 10000, 100)
+        self.assertLessEqual(len(positions), 202)
+        self.assert_envelope(positions, 10, 10000)
+        np.testing.assert_equal(min_max_indices(self.values, 5, 50, 100), np.arange(5, 50))
+
+    def test_pyramid(self):
+        pyramid = MinMaxPyramid(factor=4)
+        for final_length in (3, 100, 101, 5000, 20010):
+            pyramid.update(self.values, final_length)
+        self.assertEqual(len(pyramid), 20010)
+
+        for start, stop, n_buckets in [(0, 20011, 50), (17, 15001, 33), (1234, 1300, 10), (100, 9000, 1000)]:
+            positions = pyramid.min_max_indices(self.values, start, stop, n_buckets)
+            self.assertLessEqual(len(positions), 2 * (n_buckets + 1) + 2)
+            self.assert_envelope(positions, start, stop)
+
+        with self.assertRaises(ValueError):
+            pyramid.update(self.values, 100)
+
+
+class LTTBTests(unittest.TestCase):
+    def test_selection(self):
+        x = np.arange(1000.)
+        y = np.sin(x / 50)
+        y[500] = 10.
+
+        selected = lttb_indices(x, y, 50)
+        self.assertEqual(len(selected), 50)
+        self.assertEqual((selected[0], selected[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(selected) > 0))
+        self.assertIn(500, selected)
+
+        np.testing.assert_equal(lttb_indices(x[:10], y[:10], 20), np.arange(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,435 @@
+import gc
+import os
+import functools
+import tempfile
+import unittest
+from unittest import mock
+
+import h5py
+
+import numpy as np
+import pandas as pd
+
+from qtune.autotuner import AutotunerEvent
+from qtune.history import History, AutotunerRecord, TunerRecord, EvaluatorDataReference, _ColumnBuffer, \
+    _EvaluatorDataCache, IncrementalQuery, load_runs, write_run_table
+from qtune.storage import append_summary, read_summary, append_to_journal, SUMMARY_FILE_NAME, JOURNAL_FILE_NAME
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def make_record(voltage: float, parameter: float, current_tuner_index: int = 0) -> AutotunerRecord:
+    voltages = np.array((voltage, 1.), dtype=[('gate_a', np.float64), ('gate_b', np.float64)])
+    columns = np.array((parameter, parameter / 10, 2 * parameter, parameter / 100, parameter / 1000),
+                       dtype=[('par', np.float64), ('par#var', np.float64), ('par#gate_a#grad', np.float64),
+                              ('par#gate_a#gate_a#cov', np.float64), ('par#gate_a#gate_b#cov', np.float64)])
+    tuner = TunerRecord(columns, parameter_names=('par', ), gradient_gates={'par': ('gate_a', )})
+    return AutotunerRecord(voltages, current_tuner_index=current_tuner_index,
+                           evaluated_tuner_index=current_tuner_index + 1, tuners=[tuner],
+                           evaluator_data=[[('evaluator', {'raw_y_data': np.full(3, parameter)})]])
+
+
+class ColumnBufferTests(unittest.TestCase):
+    def test_growth(self):
+        buffer = _ColumnBuffer()
+        for row in range(100):
+            buffer.append_row({'a': row, 'b%d' % (row % 3): -row})
+
+        self.assertEqual(len(buffer), 100)
+        self.assertEqual(buffer.names, ['a', 'b0', 'b1', 'b2'])
+        np.testing.assert_equal(buffer.column('a'), np.arange(100.))
+        self.assertTrue(np.isnan(buffer.column('b1')[0]))
+        self.assertEqual(buffer.column('b1')[1], -1.)
+
+        frame = buffer.to_frame()
+        self.assertEqual(list(frame.columns), ['a', 'b0', 'b1', 'b2'])
+        self.assertIs(buffer.to_frame(), frame)
+
+        buffer.update_last_row({'a': 1000., 'c': 1.})
+        self.assertIsNot(buffer.to_frame(), frame)
+        self.assertEqual(buffer.column('a')[-1], 1000.)
+        np.testing.assert_equal(buffer.last_row(['c', 'unknown']), [1., np.nan])
+
+    def test_column_is_read_only_view(self):
+        buffer = _ColumnBuffer()
+        buffer.append_row({'a': 1.})
+        column = buffer.column('a')
+
+        buffer.update_last_row({'a': 2.})
+        self.assertEqual(column[0], 2.)
+        with self.assertRaises(ValueError):
+            column[0] = 3.
+
+    def test_object_columns_and_extend(self):
+        first, second = _ColumnBuffer(dtype=object), _ColumnBuffer(dtype=object)
+        first.append_row({'a': [1, 2]})
+        second.append_row({'b': {'x': 1}})
+        second.append_row({'a': (3, )})
+
+        first.extend(second)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(first.column('a').tolist()[0], [1, 2])
+        self.assertEqual(first.column('a')[2], (3, ))
+        self.assertEqual(first.column('b')[1], {'x': 1})
+        self.assertTrue(np.isnan(first.column('b')[0]))
+
+
+class HistoryTests(unittest.TestCase):
+    def test_append_record(self):
+        history = History(None)
+        history.append_record(make_record(0., 1.), 'first')
+        # same voltages stay in the row
+        history.append_record(make_record(0., 2.), 'second')
+        history.append_record(make_record(1., 3.), 'third')
+
+        self.assertEqual(history.number_of_stored_iterations, 2)
+        self.assertEqual(history._paths_for_reload, ['second', 'third'])
+        self.assertEqual(history.gate_names, {'gate_a', 'gate_b'})
+        self.assertEqual(history.parameter_names, {'par'})
+
+        pd.testing.assert_series_equal(history.get_parameter_values('par'), pd.Series([2., 3.], name='par'))
+        np.testing.assert_allclose(history.get_parameter_std('par'), np.sqrt([.2, .3]))
+        np.testing.assert_equal(history.get_gate_values('gate_a').values, [0., 1.])
+        self.assertEqual(list(history.get_gate_values(['gate_a', 'gate_b']).columns), ['gate_a', 'gate_b'])
+        pd.testing.assert_frame_equal(history.get_gradients('par'), pd.DataFrame({'gate_a': [4., 6.]}))
+
+        self.assertEqual(list(history.evaluator_names), ['evaluator'])
+        np.testing.assert_equal(history.evaluator_data['evaluator'][1]['raw_y_data'], np.full(3, 3.))
+
+        self.assertEqual(list(history._data_frame.columns), sorted(history._data_frame.columns))
+        self.assertIn('par#gate_a#gate_b#cov', history._data_frame.columns)
+
+    def test_gradient_tensors(self):
+        history = History(None)
+        history.append_record(make_record(0., 1.), 'first')
+        history.append_record(make_record(1., 2.), 'second')
+
+        gradients = history.get_gradient_tensor()
+        self.assertEqual(gradients.values.shape, (2, 1, 1))
+        np.testing.assert_equal(gradients.sel('par', 'gate_a'), [2., 4.])
+
+        covariances = history.get_covariance_tensor()
+        self.assertEqual(covariances.values.shape, (2, 1, 2, 2))
+        np.testing.assert_equal(covariances.sel('par', 'gate_a', 'gate_b'), [.001, .002])
+        self.assertTrue(np.isnan(covariances.sel('par', 'gate_b', 'gate_a')).all())
+
+        pd.testing.assert_frame_equal(history.get_gradient_variances('par'), pd.DataFrame({'gate_a': [.01, .02]}))
+        self.assertEqual(list(history.get_gradient_covariances('par').columns),
+                         [('gate_a', 'gate_a'), ('gate_a', 'gate_b')])
+        self.assertTrue(history.get_gradients('unknown').empty)
+
+    def test_query(self):
+        history = History(None)
+        for idx in range(1000):
+            history.append_record(make_record(float(idx), float(idx % 100)), str(idx))
+
+        frame = history.query(['gate_a', 'par'], start=10, stop=20)
+        self.assertEqual(list(frame.index), list(range(10, 20)))
+        np.testing.assert_equal(frame['par'].values, np.arange(10., 20.))
+
+        frame = history.query(['par', 'par#gate_a#grad'], max_points=50)
+        self.assertLessEqual(len(frame), 100)
+        self.assertEqual((frame.index[0], frame.index[-1]), (0, 999))
+        self.assertEqual(frame['par'].max(), 99.)
+        self.assertEqual(frame['par#gate_a#grad'].max(), 198.)
+
+        self.assertLessEqual(len(history.query(['par'], start=-500, max_points=20, method='lttb')), 20)
+
+        parameters, std = history.query_parameters(['par'], with_std=True, max_points=50)
+        np.testing.assert_allclose(std['par'], np.sqrt(parameters['par'] / 10))
+        gradients, variances = history.query_gradients('par', with_variances=True, stop=5)
+        self.assertEqual(list(gradients.columns), ['gate_a'])
+        np.testing.assert_allclose(variances['gate_a'], gradients['gate_a'] / 200)
+
+    def test_incremental_query(self):
+        history = History(None)
+        fetch = mock.Mock(side_effect=functools.partial(history.query, ['par']))
+        query = IncrementalQuery(fetch, max_points=20)
+
+        for idx in range(100):
+            history.append_record(make_record(float(idx), float(idx)), str(idx))
+            self.assertTrue(query.update(history.number_of_stored_iterations))
+            # the last row changes without a new row
+            history.append_record(make_record(float(idx), 1000. + idx), str(idx))
+            query.update(history.number_of_stored_iterations)
+
+            self.assertEqual(query.index[-1], idx)
+            self.assertEqual(query['par'][-1], 1000. + idx)
+            self.assertLessEqual(len(query), 40)
+            np.testing.assert_equal(query['par'], history.get_parameter_values('par').values[query.index])
+
+        # only the rows since the previous update are fetched while the result is small
+        self.assertEqual(fetch.call_args_list[3], mock.call(start=1, stop=2, max_points=None))
+        # and the downsampled query is only repeated when the result grew too much
+        self.assertLessEqual(sum(call[1]['max_points'] is not None for call in fetch.call_args_list), 5)
+
+        # every query has its own cursor
+        self.assertIsNot(IncrementalQuery(fetch, max_points=20), IncrementalQuery(fetch, max_points=20))
+
+        zoomed = IncrementalQuery(fetch, start=10, stop=20, max_points=20)
+        self.assertTrue(zoomed.update(history.number_of_stored_iterations))
+        self.assertFalse(zoomed.update(history.number_of_stored_iterations))
+        np.testing.assert_equal(zoomed.index, np.arange(10, 20))
+
+    def test_live_record_after_summary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            summary_file = os.path.join(directory, SUMMARY_FILE_NAME)
+            for idx in range(2):
+                append_summary(summary_file, os.path.join(directory, '%d.hdf5' % idx),
+                               make_record(float(idx), float(idx)).summary_columns())
+            history = History(None)
+            history.load_summary(read_summary(summary_file))
+
+        def load_files(self, file_names, **_):
+            for idx, file_name in enumerate(file_names):
+                self.append_record(make_record(float(idx), float(idx)), file_name)
+
+        with mock.patch.object(History, '_load_files', autospec=True, side_effect=load_files) as load:
+            history.append_record(make_record(2., 5.), 'live')
+            load.assert_called_once()
+            # stays in the row of the live record
+            history.append_record(make_record(2., 6.), 'live')
+
+        self.assertEqual(history.number_of_stored_iterations, 3)
+        self.assertEqual([data['raw_y_data'][0] for data in history.evaluator_data['evaluator']], [0., 1., 6.])
+
+
+class EvaluatorDataCacheTests(unittest.TestCase):
+    def test_eviction(self):
+        cache = _EvaluatorDataCache(max_nbytes=200)
+        cache.put('a', {'raw_y_data': np.zeros(10)})
+        cache.put('b', {'raw_y_data': np.zeros(10)})
+        self.assertEqual(cache.nbytes, 160)
+
+        # a becomes the most recently used entry, so b is evicted
+        self.assertEqual(cache.get('a', load=None)['raw_y_data'].size, 10)
+        cache.put('c', {'raw_y_data': np.zeros(10)})
+        self.assertEqual(cache.nbytes, 160)
+        self.assertNotIn('b', cache)
+
+        loaded = cache.get('b', load=lambda: {'raw_y_data': np.ones(1)})
+        np.testing.assert_equal(loaded['raw_y_data'], [1.])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.put('d', {'raw_y_data': np.zeros(100)})
+        self.assertNotIn('d', cache)
+
+
+class OutOfCoreEvaluatorDataTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.temp_dir.name, 'run', 'evaluator_data.hdf5')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_data_is_loaded_on_demand(self):
+        history = History(None, evaluator_cache_size=0, evaluator_data_file=self.file_name)
+        for idx in range(3):
+            history.append_record(make_record(float(idx), float(idx)), str(idx))
+
+        self.assertIsInstance(history._evaluator_data['evaluator'][1], EvaluatorDataReference)
+        self.assertEqual(len(history._evaluator_cache), 0)
+        np.testing.assert_equal(history.load_evaluator_data(1, 'evaluator')['raw_y_data'], np.full(3, 1.))
+        np.testing.assert_equal(history.evaluator_data['evaluator'][2]['raw_y_data'], np.full(3, 2.))
+        self.assertIsNone(history.load_evaluator_data(1, 'unknown'))
+
+        with h5py.File(self.file_name, 'r') as root:
+            self.assertEqual(sorted(root), ['0', '1', '2'])
+
+    def test_cache_and_unchanged_data(self):
+        history = History(None, evaluator_cache_size=1000, evaluator_data_file=self.file_name)
+        record = make_record(0., 1.)
+        history.append_record(record, 'first')
+        record.voltages = make_record(1., 1.).voltages
+        history.append_record(record, 'second')
+
+        # the data of the second row is the same object and written only once
+        with h5py.File(self.file_name, 'r') as root:
+            self.assertEqual(list(root), ['0'])
+        self.assertIs(history.load_evaluator_data(1, 'evaluator'), record.evaluator_data[0][0][1])
+        self.assertEqual(history._evaluator_cache.hits, 1)
+
+    def test_temporary_file(self):
+        history = History(None, evaluator_cache_size=1000)
+        history.append_record(make_record(0., 1.), 'first')
+        file_name = history._evaluator_store.file_name
+        self.assertTrue(os.path.isfile(file_name))
+
+        del history
+        gc.collect()
+        self.assertFalse(os.path.isfile(file_name))
+
+
+class LoadRunsTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directories = []
+        for run, n_iterations in enumerate((3, 5)):
+            directory = os.path.join(self.temp_dir.name, 'run_%d' % run)
+            os.mkdir(directory)
+            for idx in range(n_iterations):
+                # the summary table covers all saved states, so these are never read
+                path = os.path.join(directory, '%d.hdf5' % idx)
+                open(path, 'w').close()
+                append_summary(os.path.join(directory, SUMMARY_FILE_NAME), path,
+                               make_record(float(idx), float(run * 10 + idx)).summary_columns())
+            self.directories.append(directory)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_long_table(self):
+        for multiprocess in (False, True):
+            table = load_runs({'first': self.directories[0], 'second': self.directories[1]},
+                              multiprocess=multiprocess, max_workers=2)
+            self.assertEqual(list(table.columns[:2]), ['run', 'iteration'])
+            self.assertEqual(table['run'].tolist(), ['first'] * 3 + ['second'] * 5)
+            self.assertEqual(table['iteration'].tolist(), [0, 1, 2, 0, 1, 2, 3, 4])
+            np.testing.assert_equal(table['par'].values, [0., 1., 2., 10., 11., 12., 13., 14.])
+            self.assertIn('par#gate_a#grad', table.columns)
+
+        with self.assertRaises(ValueError):
+            load_runs(self.directories, fields=AutotunerRecord.fields)
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_export(self):
+        table = load_runs(self.directories, multiprocess=False)
+        for file_name in ('runs.parquet', 'runs.arrow'):
+            file_name = os.path.join(self.temp_dir.name, file_name)
+            write_run_table(table, file_name)
+            read = pd.read_parquet(file_name) if file_name.endswith('.parquet') else pd.read_feather(file_name)
+            pd.testing.assert_frame_equal(read, table, check_categorical=False)
+
+
+class DirectoryFollowerTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def create_files(self, *names):
+        for name in names:
+            open(os.path.join(self.directory, name), 'w').close()
+
+    def test_saved_states(self):
+        for use_inotify in (False, True):
+            for name in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, name))
+
+            loaded = []
+            unreadable = set()
+
+            def load_file(path):
+                if os.path.basename(path) in unreadable:
+                    raise OSError('still being written')
+                loaded.append(os.path.basename(path))
+
+            self.create_files('0.hdf5', '1.hdf5', SUMMARY_FILE_NAME, '2.hdf5.tmp')
+            with mock.patch.object(History, 'load_file', side_effect=load_file):
+                with History(None).follow_directory(self.directory, use_inotify=use_inotify) as follower:
+                    self.assertEqual(follower.poll(), 2)
+                    self.assertEqual(follower.poll(), 0)
+
+                    unreadable.add('2.hdf5')
+                    self.create_files('2.hdf5', '3.hdf5')
+                    self.assertEqual(follower.poll(), 0)
+                    self.assertEqual(follower.number_of_pending_files, 2)
+
+                    unreadable.clear()
+                    self.assertEqual(follower.wait(timeout=1., interval=0.01), 2)
+                    self.assertEqual(follower.wait(timeout=0.02, interval=0.01), 0)
+
+            self.assertEqual(loaded, ['0.hdf5', '1.hdf5', '2.hdf5', '3.hdf5'])
+
+    def test_journal(self):
+        journal_file = os.path.join(self.directory, JOURNAL_FILE_NAME)
+        for iteration in range(3):
+            append_to_journal(journal_file, iteration, 'autotuner', np.arange(3.) + iteration)
+
+        with mock.patch.object(History, '_append_saved_state') as append_saved_state:
+            follower = History(None).follow_directory(self.directory, use_inotify=False)
+            self.assertEqual(follower.poll(), 3)
+            self.assertEqual(follower.poll(), 0)
+
+            append_to_journal(journal_file, 3, 'autotuner', np.arange(3.) + 3)
+            self.assertEqual(follower.poll(), 1)
+            follower.close()
+
+        self.assertEqual([call[0][1] for call in append_saved_state.call_args_list],
+                         ['%s::%d' % (journal_file, iteration) for iteration in range(4)])
+        np.testing.assert_equal(append_saved_state.call_args[0][0], np.arange(3.) + 3)
+
+
+class FakeTuner:
+    def __init__(self, voltages: pd.Series, parameter: float):
+        self.last_voltages = voltages
+        self.parameter = parameter
+
+
+class FakeAutotuner:
+    def __init__(self, n_tuners: int):
+        self.tuning_hierarchy = [FakeTuner(pd.Series({'gate_a': 0., 'gate_b': 1.}), float(idx))
+                                 for idx in range(n_tuners)]
+        self.current_tuner_index = 0
+        self.voltages_to_set = None
+        self.current_tuner_status = False
+        self.last_save_file = None
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def publish(self, kind, changed_tuners):
+        self.last_save_file = 'file_%d' % len(self.last_save_file or '')
+        for callback in self.subscribers:
+            callback(AutotunerEvent(self, kind, changed_tuners))
+
+
+def fake_tuner_record(par_tuner: FakeTuner, fields) -> TunerRecord:
+    name = 'par%d' % id(par_tuner)
+    return TunerRecord(np.array((par_tuner.parameter, ), dtype=[(name, np.float64)]), (name, ), dict())
+
+
+class AutotunerFeedTests(unittest.TestCase):
+    @mock.patch.object(TunerRecord, 'from_tuner', side_effect=fake_tuner_record)
+    def test_only_changed_tuners_are_projected(self, from_tuner):
+        autotuner = FakeAutotuner(n_tuners=3)
+        history = History(None)
+        feed = history.follow_autotuner(autotuner, fields=AutotunerRecord.columns)
+
+        autotuner.publish('tuner_evaluated', (0, ))
+        self.assertEqual(from_tuner.call_count, 3)
+        self.assertEqual(history.number_of_stored_iterations, 1)
+
+        autotuner.current_tuner_index = 1
+        autotuner.current_tuner_status = True
+        autotuner.tuning_hierarchy[1].parameter = 10.
+        autotuner.publish('tuner_evaluated', (1, ))
+        self.assertEqual(from_tuner.call_count, 4)
+        self.assertEqual(history.get_parameter_values('par%d' % id(autotuner.tuning_hierarchy[1])).tolist(), [10.])
+
+        autotuner.tuning_hierarchy[0].last_voltages = pd.Series({'gate_a': 1., 'gate_b': 1.})
+        autotuner.publish('restarted', (0, 1, 2))
+        self.assertEqual(history.number_of_stored_iterations, 1)
+        autotuner.current_tuner_index = 0
+        autotuner.current_tuner_status = False
+        autotuner.publish('voltages_set', ())
+        self.assertEqual(from_tuner.call_count, 7)
+        self.assertEqual(history.get_gate_values('gate_a').tolist(), [0., 1.])
+
+        feed.close()
+        autotuner.publish('voltages_set', ())
+        self.assertEqual(history.number_of_stored_iterations, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
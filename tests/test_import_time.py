@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+
+def import_duration(statement: str, repetitions: int = 3) -> float:
+    """Minimal wall time of a fresh interpreter executing the statement"""
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', statement], cwd=os.path.dirname(os.path.dirname(__file__)))
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+class ImportTimeTests(unittest.TestCase):
+    #: Time in seconds that importing qtune.autotuner may take in addition to its required dependencies
+    budget = float(os.environ.get('QTUNE_IMPORT_BUDGET', 1.))
+
+    def test_heavy_modules_are_not_imported(self):
+        output = subprocess.check_output([sys.executable, '-c',
+                                          'import sys, qtune.autotuner, qtune.storage, qtune.history; '
+                                          'print(" ".join(sorted(sys.modules)))'],
+                                         cwd=os.path.dirname(os.path.dirname(__file__)))
+        modules = set(output.decode().split())
+
+        for module in ('matplotlib', 'sympy', 'filterpy', 'scipy.stats', 'scipy.optimize'):
+            self.assertNotIn(module, modules)
+
+    def test_import_time_budget(self):
+        baseline = import_duration('import numpy, pandas, h5py')
+        duration = import_duration('import qtune.autotuner')
+
+        self.assertLess(duration - baseline, self.budget)
@@ -1,11 +1,21 @@
 import unittest
 import tempfile
 import os
+import pickle
+import time
+import threading
+from unittest import mock
 
 import numpy as np
 import pandas as pd
 
-from qtune.storage import HDF5Serializable, to_hdf5, from_hdf5
+import h5py
+
+from qtune.storage import HDF5Serializable, to_hdf5, from_hdf5, DeltaTracker, append_to_journal, read_journal, \
+    read_journal_index, journal_entry_path, is_journal, StoragePolicy, LazyArray, snapshot, SerializedObject, \
+    AsynchronousHDF5Writer, NpyDirectoryBackend, from_file, BlobStore, blob_reference_counts, compact_blob_store, \
+    ParallelHDF5Reader, append_summary, read_summary, DurabilityPolicy
+from qtune import storage
 
 
 class SerializationTests(unittest.TestCase):
@@ -50,6 +60,39 @@ class SerializationTests(unittest.TestCase):
 
         np.testing.assert_equal({'data': data}, recovered_data)
 
+    def test_scalar_members_are_packed(self):
+        data = {'a': 1, 'b': 2.5, 'c': 'text', 'd': None, 'e': True, 'f': 1j, 'g': np.float32(3.),
+                'h': [1., 2., 3.], 'i': np.arange(3)}
+
+        to_hdf5(self.temp_file.name, 'data', data)
+
+        with h5py.File(self.temp_file.name, 'r') as root:
+            self.assertEqual(set(root['data'].keys()), {'h', 'i'})
+            self.assertEqual(set(root['data'].attrs[storage.SCALARS_ATTRIBUTE].dtype.names),
+                             {'a', 'b', 'c', 'e', 'f', 'g'})
+            self.assertEqual(len(root['data/h'].keys()), 0)
+
+        recovered_data = from_hdf5(self.temp_file.name, reserved=[])
+        np.testing.assert_equal({'data': data}, recovered_data)
+        self.assertIsInstance(recovered_data['data']['c'], str)
+
+    def test_per_member_datasets(self):
+        with h5py.File(self.temp_file.name, 'w') as root:
+            group = root.create_group('data')
+            group.attrs['#type'] = 'dict'
+            group.create_dataset('a', data=1, shape=())
+            dset = group.create_dataset('b', data='text', dtype=h5py.special_dtype(vlen=str))
+            dset.attrs['#type'] = 'str'
+            dset = group.create_dataset('c', dtype='f')
+            dset.attrs['#type'] = 'NoneType'
+            sequence = group.create_group('d')
+            sequence.attrs['#type'] = 'list'
+            sequence.create_dataset('0', data=1., shape=())
+            sequence.create_dataset('1', data=2., shape=())
+
+        recovered_data = from_hdf5(self.temp_file.name, reserved=[])
+        self.assertEqual({'data': {'a': 1, 'b': 'text', 'c': None, 'd': [1., 2.]}}, recovered_data)
+
     def test_data_frame_serialization(self):
         df = pd.DataFrame(data=[[1, 2, 3], [4, 5, 6]], index=['asdf', 'b'], columns=[0, 1, 2])
         data = {'asd': [1, 2, 3],
@@ -109,4 +152,661 @@ class SerializationTests(unittest.TestCase):
 
         recovered_data = from_hdf5(self.temp_file.name, reserved=[])
 
-        np.testing.assert_equal({'data': data}, recovered_data)
\ No newline at end of file
+        np.testing.assert_equal({'data': data}, recovered_data)
+
+
+class DeltaSerializable(metaclass=HDF5Serializable):
+    def __init__(self, value, shared=None):
+        self.value = value
+        self.shared = shared
+
+    def to_hdf5(self):
+        return dict(value=self.value, shared=self.shared)
+
+
+class DeltaTrackerTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_unchanged_objects_are_linked(self):
+        shared = [1, 2, 3]
+        unchanged = DeltaSerializable(np.arange(10), shared=shared)
+        changed = DeltaSerializable(1., shared=shared)
+        data = {'unchanged': unchanged, 'changed': changed}
+
+        delta = DeltaTracker()
+        first = os.path.join(self.temp_dir.name, 'first.hdf5')
+        second = os.path.join(self.temp_dir.name, 'second.hdf5')
+
+        to_hdf5(first, 'data', data, delta=delta)
+        changed.value = 2.
+        to_hdf5(second, 'data', data, delta=delta)
+
+        with h5py.File(second, 'r') as root:
+            self.assertIsInstance(root.get('data/unchanged', getlink=True), h5py.ExternalLink)
+            self.assertIsInstance(root.get('data/changed', getlink=True), h5py.HardLink)
+
+        recovered_first = from_hdf5(first, reserved=[])['data']
+        recovered_second = from_hdf5(second, reserved=[])['data']
+
+        self.assertEqual(recovered_first['changed'].value, 1.)
+        self.assertEqual(recovered_second['changed'].value, 2.)
+        np.testing.assert_equal(recovered_second['unchanged'].value, np.arange(10))
+        self.assertEqual(recovered_second['changed'].shared, shared)
+        self.assertIs(recovered_second['changed'].shared, recovered_second['unchanged'].shared)
+
+    def test_reserved_in_linked_file(self):
+        reserved = {'experiment': object()}
+        data = {'unchanged': DeltaSerializable(reserved['experiment']), 'changed': DeltaSerializable(1)}
+
+        delta = DeltaTracker()
+        first = os.path.join(self.temp_dir.name, 'first.hdf5')
+        second = os.path.join(self.temp_dir.name, 'second.hdf5')
+
+        to_hdf5(first, 'data', data, reserved=reserved, delta=delta)
+        data['changed'].value = 2
+        to_hdf5(second, 'data', data, reserved=reserved, delta=delta)
+
+        recovered = from_hdf5(second, reserved=reserved)['data']
+        self.assertIs(recovered['unchanged'].value, reserved['experiment'])
+        self.assertEqual(recovered['changed'].value, 2)
+
+
+class JournalTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.temp_dir.name, 'journal.hdf5')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_append_and_read(self):
+        reserved = {'experiment': object()}
+        data = {'value': 0, 'experiment': reserved['experiment'], 'unchanged': DeltaSerializable(np.arange(5))}
+        delta = DeltaTracker()
+
+        for iteration in range(4):
+            data['value'] = iteration
+            append_to_journal(self.file_name, iteration, 'data', data, reserved=reserved,
+                              tuner_index=iteration // 2, voltages_changed=iteration % 2 == 0, delta=delta)
+
+        self.assertTrue(is_journal(self.file_name))
+
+        index = read_journal_index(self.file_name)
+        np.testing.assert_equal(index['iteration'], [0, 1, 2, 3])
+        np.testing.assert_equal(index['tuner_index'], [0, 0, 1, 1])
+        np.testing.assert_equal(index['voltages_changed'], [True, False, True, False])
+
+        entries = list(read_journal(self.file_name, reserved=reserved, start=1, stop=3))
+        self.assertEqual([entry_path for entry_path, _ in entries],
+                         [journal_entry_path(self.file_name, 1), journal_entry_path(self.file_name, 2)])
+        for (_, loaded), iteration in zip(entries, (1, 2)):
+            self.assertEqual(loaded['data']['value'], iteration)
+            self.assertIs(loaded['data']['experiment'], reserved['experiment'])
+            np.testing.assert_equal(loaded['data']['unchanged'].value, np.arange(5))
+
+        loaded = from_hdf5(journal_entry_path(self.file_name, 3), reserved=reserved)
+        self.assertEqual(loaded['data']['value'], 3)
+
+
+class StoragePolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.hdf5', delete=False)
+        self.temp_file.close()
+
+    def tearDown(self):
+        os.remove(self.temp_file.name)
+
+    def test_policies_are_applied(self):
+        policies = [StoragePolicy(compression='gzip', compression_opts=4, shuffle=True, chunks=(10, 1000),
+                                  types=('ndarray',), min_nbytes=1000),
+                    StoragePolicy(compression='lzf', types=('DataFrame',))]
+        data = {'large': np.random.rand(20, 30),
+                'small': np.arange(3),
+                'df': pd.DataFrame(np.random.rand(4, 2), columns=['a', 'b']),
+                'series': pd.Series([1., 2.], index=['a', 'b'])}
+
+        to_hdf5(self.temp_file.name, 'data', data, policies=policies)
+
+        with h5py.File(self.temp_file.name, 'r') as root:
+            self.assertEqual(root['data/large'].compression, 'gzip')
+            self.assertEqual(root['data/large'].compression_opts, 4)
+            self.assertTrue(root['data/large'].shuffle)
+            self.assertEqual(root['data/large'].chunks, (10, 30))
+            self.assertIsNone(root['data/small'].chunks)
+            self.assertEqual(root['data/df'].compression, 'lzf')
+            self.assertIsNone(root['data/series'].compression)
+
+        recovered = from_hdf5(self.temp_file.name, reserved=[])['data']
+        np.testing.assert_equal(recovered['large'], data['large'])
+        pd.testing.assert_frame_equal(recovered['df'], data['df'])
+
+    def test_policy_serialization(self):
+        policy = StoragePolicy(compression='gzip', compression_opts=1, chunks=(1, 128), min_nbytes=10)
+
+        to_hdf5(self.temp_file.name, 'policy', policy)
+        recovered = from_hdf5(self.temp_file.name, reserved=[])['policy']
+
+        self.assertEqual(recovered.to_hdf5(), policy.to_hdf5())
+
+
+class LazyArrayTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.hdf5', delete=False)
+        self.temp_file.close()
+
+    def tearDown(self):
+        os.remove(self.temp_file.name)
+
+    def test_lazy_loading(self):
+        large = np.arange(200.).reshape(20, 10)
+        data = {'large': large, 'small': np.arange(3), 'same': large}
+
+        to_hdf5(self.temp_file.name, 'data', data)
+        recovered = from_hdf5(self.temp_file.name, reserved=[], lazy_threshold=1000)['data']
+
+        self.assertIsInstance(recovered['small'], np.ndarray)
+        lazy = recovered['large']
+        self.assertIsInstance(lazy, LazyArray)
+        self.assertIs(lazy, recovered['same'])
+        self.assertFalse(lazy.is_loaded)
+        self.assertEqual(lazy.shape, large.shape)
+        self.assertEqual(lazy.dtype, large.dtype)
+
+        np.testing.assert_equal(lazy[3:5, 2], large[3:5, 2])
+        self.assertFalse(lazy.is_loaded)
+
+        np.testing.assert_equal(lazy + 1, large + 1)
+        np.testing.assert_equal(lazy.mean(0), large.mean(0))
+        self.assertTrue(lazy.is_loaded)
+
+        lazy.release()
+        self.assertFalse(lazy.is_loaded)
+        np.testing.assert_equal(np.asarray(lazy), large)
+
+    def test_lazy_reserialization(self):
+        data = {'large': np.random.rand(100)}
+
+        to_hdf5(self.temp_file.name, 'data', data)
+        recovered = from_hdf5(self.temp_file.name, reserved=[], lazy_threshold=0)['data']
+
+        second_file = self.temp_file.name + '.second'
+        try:
+            to_hdf5(second_file, 'data', recovered)
+            np.testing.assert_equal(from_hdf5(second_file, reserved=[])['data']['large'], data['large'])
+        finally:
+            os.remove(second_file)
+
+
+class MemoryMapTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.temp_dir.name, 'data.hdf5')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_contiguous_arrays_are_mapped(self):
+        data = {'large': np.random.rand(20, 10), 'small': np.arange(3)}
+        compressed_file = os.path.join(self.temp_dir.name, 'compressed.hdf5')
+
+        to_hdf5(self.file_name, 'data', data)
+        to_hdf5(compressed_file, 'data', data, policies=[StoragePolicy(compression='gzip')])
+
+        recovered = from_hdf5(self.file_name, reserved=[], mmap_threshold=1000)['data']
+        self.assertIsInstance(recovered['large'], np.memmap)
+        self.assertFalse(recovered['large'].flags.writeable)
+        self.assertNotIsInstance(recovered['small'], np.memmap)
+        np.testing.assert_equal(recovered, data)
+
+        recovered = from_hdf5(compressed_file, reserved=[], mmap_threshold=1000)['data']
+        self.assertNotIsInstance(recovered['large'], np.memmap)
+        np.testing.assert_equal(recovered, data)
+
+    def test_raw_data_is_mapped(self):
+        raw_y_data = np.random.rand(104, 104)
+        data = {'raw_y_data': raw_y_data, 'same': raw_y_data,
+                'raw_x_data': [np.linspace(0, 1, 300), np.linspace(0, 2, 300)]}
+
+        to_hdf5(self.file_name, 'data', data)
+        recovered = from_hdf5(self.file_name, reserved=[], lazy_threshold=0, mmap_threshold=1000)['data']
+
+        self.assertIsInstance(recovered['raw_y_data'], np.memmap)
+        self.assertIs(recovered['same'], recovered['raw_y_data'])
+        np.testing.assert_equal(recovered['raw_y_data'], raw_y_data)
+        for recovered_x, x in zip(recovered['raw_x_data'], data['raw_x_data']):
+            self.assertIsInstance(recovered_x, np.memmap)
+            np.testing.assert_equal(recovered_x, x)
+
+        second_file = os.path.join(self.temp_dir.name, 'second.hdf5')
+        to_hdf5(second_file, 'data', recovered)
+        np.testing.assert_equal(from_hdf5(second_file, reserved=[])['data']['raw_y_data'], raw_y_data)
+
+    def test_blob_store_arrays_are_mapped(self):
+        blobs = BlobStore(os.path.join(self.temp_dir.name, storage.BLOB_FILE_NAME), min_nbytes=0)
+        data = {'raw_y_data': np.random.rand(1000)}
+
+        to_hdf5(self.file_name, 'data', data, blobs=blobs)
+        recovered = from_hdf5(self.file_name, reserved=[], mmap_threshold=0)['data']
+
+        self.assertIsInstance(recovered['raw_y_data'], np.memmap)
+        self.assertEqual(recovered['raw_y_data'].filename, os.path.abspath(blobs.file_name))
+        np.testing.assert_equal(recovered['raw_y_data'], data['raw_y_data'])
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.hdf5', delete=False)
+        self.temp_file.close()
+
+    def tearDown(self):
+        os.remove(self.temp_file.name)
+
+    def test_snapshot_is_detached(self):
+        reserved_obj = object()
+        arr = np.arange(5.)
+        shared = DeltaSerializable(arr)
+        data = {'a': DeltaSerializable(shared, shared=reserved_obj), 'b': shared}
+
+        snap, placeholders = snapshot(data, reserved={'experiment': reserved_obj})
+
+        self.assertIsInstance(snap['b'], SerializedObject)
+        self.assertEqual(snap['b'].type_name, 'DeltaSerializable')
+        self.assertIs(snap['a'].members['value'], snap['b'])
+        self.assertIs(snap['a'].members['shared'], placeholders['experiment'])
+
+        frozen = snap['b'].members['value']
+        self.assertFalse(frozen.flags.writeable)
+        arr[:] = 0
+        np.testing.assert_equal(frozen, np.arange(5.))
+
+    def test_writer_round_trip(self):
+        reserved_obj = object()
+        shared = DeltaSerializable(np.arange(5.))
+        data = {'a': DeltaSerializable(shared, shared=reserved_obj), 'b': shared}
+
+        writer = AsynchronousHDF5Writer(reserved={'experiment': reserved_obj}, multiprocess=False)
+        writer.write(data, self.temp_file.name, name='data')
+        shared.value[:] = 0
+        writer.join()
+
+        self.assertEqual(len(writer.foreground_durations), 1)
+
+        recovered = from_hdf5(self.temp_file.name, reserved={'experiment': reserved_obj})['data']
+        self.assertIsInstance(recovered['b'], DeltaSerializable)
+        self.assertIs(recovered['a'].value, recovered['b'])
+        self.assertIs(recovered['a'].shared, reserved_obj)
+        np.testing.assert_equal(recovered['b'].value, np.arange(5.))
+
+
+@unittest.skipIf(storage.shared_memory is None, 'multiprocessing.shared_memory requires python 3.8')
+class SharedMemoryTransportTests(unittest.TestCase):
+    def test_task_pickling(self):
+        large = np.random.rand(100, 100)
+        small = np.arange(3)
+        task = ('name', 'file', {'large': large, 'small': small, 'same': large}, {}, {})
+
+        transported = pickle.loads(pickle.dumps(storage._SharedMemoryTask(task, threshold=1024)))
+        self.assertIsNotNone(transported.block)
+
+        obj = transported.task[2]
+        np.testing.assert_equal(obj['large'], large)
+        np.testing.assert_equal(obj['small'], small)
+        self.assertIs(obj['large'], obj['same'])
+
+        block_name = transported.block.name
+        del obj
+        transported.release()
+        with self.assertRaises(FileNotFoundError):
+            storage.shared_memory.SharedMemory(name=block_name)
+
+    def test_multiprocess_writer(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_name = os.path.join(temp_dir, 'data.hdf5')
+            data = {'large': np.random.rand(100, 100), 'small': [1, 2, 3]}
+
+            writer = AsynchronousHDF5Writer(reserved={}, multiprocess=True, shared_memory_threshold=1024)
+            writer.write(data, file_name, name='data')
+            writer.join()
+
+            recovered = from_hdf5(file_name, reserved={})['data']
+            np.testing.assert_equal(recovered['large'], data['large'])
+            self.assertEqual(recovered['small'], data['small'])
+
+
+class WriteQueueTests(unittest.TestCase):
+    @staticmethod
+    def make_pending(voltages_changed, nbytes=8):
+        return storage._PendingWrite(task=(), nbytes=nbytes, voltages_changed=voltages_changed)
+
+    def test_drop_superseded(self):
+        write_queue = storage._WriteQueue(maxsize=3, policy='drop_superseded')
+        status, voltage_change, newer, newest = (self.make_pending(voltages_changed)
+                                                 for voltages_changed in (False, True, False, False))
+
+        write_queue.put(status)
+        write_queue.put(voltage_change)
+        write_queue.put(newer)
+        write_queue.put(newest)
+
+        # status is the final state before the voltage change and is kept
+        self.assertEqual(write_queue.dropped, 1)
+        self.assertEqual(len(write_queue), 3)
+        self.assertEqual(write_queue.bytes_pending, 24)
+        self.assertEqual([write_queue.get() for _ in range(3)], [status, voltage_change, newest])
+
+    def test_drop_superseded_keeps_last_before_voltage_change(self):
+        write_queue = storage._WriteQueue(maxsize=2, policy='drop_superseded')
+        status, voltage_change, newer = self.make_pending(False), self.make_pending(True), self.make_pending(False)
+        write_queue.put(status)
+        write_queue.put(voltage_change)
+
+        putter = threading.Thread(target=write_queue.put, args=(newer,))
+        putter.start()
+        putter.join(0.1)
+        self.assertTrue(putter.is_alive())
+        self.assertEqual(write_queue.dropped, 0)
+
+        self.assertIs(write_queue.get(), status)
+        putter.join()
+        self.assertEqual([write_queue.get() for _ in range(2)], [voltage_change, newer])
+
+    def test_coalesce(self):
+        write_queue = storage._WriteQueue(policy='coalesce')
+        items = [self.make_pending(voltages_changed) for voltages_changed in (False, False, True, False, False)]
+        for item in items:
+            write_queue.put(item)
+
+        self.assertEqual(write_queue.coalesced, 2)
+        self.assertEqual([write_queue.get() for _ in range(3)], [items[1], items[2], items[4]])
+
+    def test_writer_statistics(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = AsynchronousHDF5Writer(reserved={}, multiprocess=False, max_queue_size=2,
+                                            queue_policy='drop_superseded')
+            for idx in range(5):
+                writer.write({'data': np.arange(10.)}, os.path.join(temp_dir, '%d.hdf5' % idx),
+                             voltages_changed=True)
+            writer.join()
+
+            statistics = writer.statistics()
+            self.assertEqual(statistics.written, 5)
+            self.assertEqual(statistics.dropped, 0)
+            self.assertEqual(statistics.queue_depth, 0)
+            self.assertEqual(statistics.bytes_pending, 0)
+            self.assertIsNotNone(statistics.mean_write_latency)
+            self.assertEqual(len(os.listdir(temp_dir)), 5)
+
+    def test_writer_statistics_count_committed(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = AsynchronousHDF5Writer(reserved={}, multiprocess=False)
+            with self.assertLogs('qtune', 'ERROR'), mock.patch('threading.excepthook'):
+                writer.write({'data': np.arange(10.)}, os.path.join(temp_dir, 'good.hdf5'))
+                writer.write({'data': np.arange(10.)}, os.path.join(temp_dir, 'missing', 'bad.hdf5'))
+                writer.join()
+
+            statistics = writer.statistics()
+            self.assertEqual(statistics.written, 1)
+            self.assertEqual(len(writer.write_latencies), 1)
+
+
+class DurabilityTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_batches(self):
+        write_queue = storage._WriteQueue()
+        durability = DurabilityPolicy(max_delay=60., max_batch=3)
+        items = [WriteQueueTests.make_pending(voltages_changed) for voltages_changed in (False, True, False, False)]
+        for item in items:
+            write_queue.put(item)
+
+        # the voltage change is due immediately and takes the following snapshots up to max_batch with it
+        self.assertEqual(write_queue.get_batch(durability), items[:3])
+
+        write_queue.put(None)
+        self.assertEqual(write_queue.get_batch(durability), [items[3], None])
+
+    def test_max_delay(self):
+        write_queue = storage._WriteQueue()
+        durability = DurabilityPolicy(max_delay=0.05, max_batch=10, commit_on_voltage_change=False)
+        items = [WriteQueueTests.make_pending(True) for _ in range(2)]
+        for item in items:
+            write_queue.put(item)
+
+        self.assertEqual(write_queue.get_batch(durability), items)
+        self.assertGreaterEqual(time.perf_counter() - items[0].enqueued, durability.max_delay)
+
+    def test_atomic_delta_files(self):
+        durability = DurabilityPolicy(max_delay=60., max_batch=3, atomic_files=True, fsync=True)
+        writer = AsynchronousHDF5Writer(reserved={}, multiprocess=False, delta=True, durability=durability)
+        data = {'unchanged': DeltaSerializable(np.arange(10)), 'changed': DeltaSerializable(0)}
+        file_names = [os.path.join(self.temp_dir.name, '%d.hdf5' % idx) for idx in range(4)]
+        for idx, file_name in enumerate(file_names):
+            data['changed'] = DeltaSerializable(idx)
+            writer.write(data, file_name, name='data', summary={'value': float(idx)})
+        writer.join()
+
+        self.assertEqual(writer.statistics().written, 4)
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ['0.hdf5', '1.hdf5', '2.hdf5', '3.hdf5',
+                                                                  storage.SUMMARY_FILE_NAME])
+        with h5py.File(file_names[2], 'r') as root:
+            self.assertEqual(root.get('data/unchanged', getlink=True).filename, '0.hdf5')
+        for idx, file_name in enumerate(file_names):
+            recovered = from_hdf5(file_name, reserved={})['data']
+            self.assertEqual(recovered['changed'].value, idx)
+            np.testing.assert_equal(recovered['unchanged'].value, np.arange(10))
+        self.assertEqual(read_summary(os.path.join(self.temp_dir.name, storage.SUMMARY_FILE_NAME)).paths, file_names)
+
+    def test_atomic_files_sync_directory(self):
+        durability = DurabilityPolicy(max_delay=60., max_batch=2, atomic_files=True, fsync=True)
+        with mock.patch.object(storage, '_fsync_directory', wraps=storage._fsync_directory) as fsync_directory:
+            writer = AsynchronousHDF5Writer(reserved={}, multiprocess=False, durability=durability)
+            for idx in range(2):
+                writer.write({'value': idx}, os.path.join(self.temp_dir.name, '%d.hdf5' % idx), name='data')
+            writer.join()
+
+        self.assertEqual(fsync_directory.call_args_list,
+                         [mock.call(os.path.abspath(self.temp_dir.name))] * 2)
+
+    def test_journal_batch(self):
+        journal_file = os.path.join(self.temp_dir.name, storage.JOURNAL_FILE_NAME)
+        writer = AsynchronousHDF5Writer(reserved={}, multiprocess=False,
+                                        durability=DurabilityPolicy(max_delay=60., max_batch=5))
+        for idx in range(5):
+            writer.write({'value': idx}, writer.next_journal_entry(journal_file), name='data', tuner_index=idx)
+        writer.join()
+
+        np.testing.assert_equal(read_journal_index(journal_file)['tuner_index'], np.arange(5))
+        self.assertEqual([loaded['data']['value'] for _, loaded in read_journal(journal_file, reserved={})], list(range(5)))
+
+
+class NpyDirectoryBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, 'data' + NpyDirectoryBackend.extension)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        reserved_obj = object()
+        shared = [8, 7, 6]
+        arr = np.random.rand(3, 4)
+        data = {'list': [1, 2., 'test_stringüöäß', None, True, 1 + 2j, np.float32(3.5)],
+                'tuple': (1, 2),
+                'shared_1': shared,
+                'shared_2': {'inner': shared},
+                'arr': arr,
+                'same_arr': arr,
+                'df': pd.DataFrame(np.arange(6.).reshape(2, 3), index=['a', 'b'], columns=[1, 2, 3]),
+                'series': pd.Series([1., 2.], index=['x', 'y']),
+                'obj': DeltaSerializable(np.arange(3), shared=reserved_obj)}
+
+        NpyDirectoryBackend().write(self.directory, 'data', data, reserved={'experiment': reserved_obj})
+        recovered = from_file(self.directory, reserved={'experiment': reserved_obj})
+
+        self.assertIs(recovered['experiment'], reserved_obj)
+        recovered = recovered['data']
+
+        self.assertEqual(recovered['list'], data['list'])
+        self.assertIsInstance(recovered['list'][-1], np.float32)
+        self.assertEqual(recovered['tuple'], (1, 2))
+        self.assertIs(recovered['shared_1'], recovered['shared_2']['inner'])
+        np.testing.assert_equal(recovered['arr'], arr)
+        self.assertIs(recovered['arr'], recovered['same_arr'])
+        pd.testing.assert_frame_equal(recovered['df'], data['df'])
+        pd.testing.assert_series_equal(recovered['series'], data['series'])
+        self.assertIsInstance(recovered['obj'], DeltaSerializable)
+        self.assertIs(recovered['obj'].shared, reserved_obj)
+        np.testing.assert_equal(recovered['obj'].value, np.arange(3))
+
+    def test_memory_mapped_reading(self):
+        NpyDirectoryBackend().write(self.directory, 'data', {'large': np.arange(1000.), 'small': np.arange(3.)})
+        recovered = from_file(self.directory, reserved={}, lazy_threshold=1024)['data']
+
+        self.assertIsInstance(recovered['large'], np.memmap)
+        self.assertNotIsInstance(recovered['small'], np.memmap)
+        np.testing.assert_equal(recovered['large'], np.arange(1000.))
+
+    def test_writer(self):
+        writer = AsynchronousHDF5Writer(reserved={}, multiprocess=False, backend='npy')
+        writer.write({'arr': np.arange(5)}, self.directory, name='data')
+        writer.join()
+
+        np.testing.assert_equal(from_file(self.directory, reserved={})['data']['arr'], np.arange(5))
+
+        with self.assertRaises(ValueError):
+            AsynchronousHDF5Writer(reserved={}, multiprocess=False, backend='npy', delta=True)
+
+
+class BlobStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.blobs = BlobStore(os.path.join(self.temp_dir.name, 'blobs.hdf5'), min_nbytes=100)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def file_name(self, idx):
+        return os.path.join(self.temp_dir.name, '%d.hdf5' % idx)
+
+    def test_deduplication_and_compaction(self):
+        raw_data = np.random.rand(20, 20)
+        series = pd.Series(np.arange(20.), index=['gate_%d' % idx for idx in range(20)])
+
+        to_hdf5(self.file_name(0), 'data', {'raw': raw_data, 'series': series, 'small': np.arange(3.)},
+                blobs=self.blobs)
+        to_hdf5(self.file_name(1), 'data', {'raw': raw_data, 'same': raw_data, 'series': series.copy()},
+                blobs=self.blobs)
+        to_hdf5(self.file_name(2), 'data', {'raw': raw_data + 1}, blobs=self.blobs)
+
+        with h5py.File(self.blobs.file_name, 'r') as root:
+            self.assertEqual(len(root), 3)
+
+        recovered = from_hdf5(self.file_name(1), reserved={})['data']
+        np.testing.assert_equal(recovered['raw'], raw_data)
+        np.testing.assert_equal(recovered['same'], raw_data)
+        pd.testing.assert_series_equal(recovered['series'], series)
+
+        digest = BlobStore.digest(raw_data)
+        self.assertEqual(blob_reference_counts(self.temp_dir.name)[digest], 3)
+
+        os.remove(self.file_name(2))
+        summary = compact_blob_store(self.temp_dir.name)
+        self.assertEqual(summary['blobs'], 3)
+        self.assertEqual(summary['removed'], [BlobStore.digest(raw_data + 1)])
+        self.assertEqual(summary['missing'], [])
+
+        with h5py.File(self.blobs.file_name, 'r') as root:
+            self.assertEqual(set(root.keys()), {digest, BlobStore.digest(series)})
+        np.testing.assert_equal(from_hdf5(self.file_name(0), reserved={})['data']['raw'], raw_data)
+
+
+def _value_sum(loaded_data):
+    return int(np.sum(loaded_data['data']['value']))
+
+
+class ParallelHDF5ReaderTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_names = [os.path.join(self.temp_dir.name, '%d.hdf5' % idx) for idx in range(3)]
+        for idx, file_name in enumerate(self.file_names):
+            to_hdf5(file_name, 'data', {'value': np.arange(idx + 2)})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_projection(self):
+        for multiprocess in (False, True):
+            with ParallelHDF5Reader(reserved=[], multiprocess=multiprocess, max_workers=2) as reader:
+                self.assertEqual(list(reader.read_iter(self.file_names, projection=_value_sum)), [1, 3, 6])
+
+    def test_without_projection(self):
+        with ParallelHDF5Reader(reserved=[], multiprocess=False) as reader:
+            loaded = list(reader.read_iter(self.file_names))
+        np.testing.assert_equal(loaded[1]['data']['value'], np.arange(3))
+
+
+class SummaryTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.summary_file = os.path.join(self.temp_dir.name, storage.SUMMARY_FILE_NAME)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_append_and_read(self):
+        first = os.path.join(self.temp_dir.name, 'first.hdf5')
+        entry = storage.journal_entry_path(os.path.join(self.temp_dir.name, 'journal.hdf5'), 3)
+        append_summary(self.summary_file, first, {'a': 1., 'b': 2.})
+        append_summary(self.summary_file, entry, {'b': 3., 'c': np.nan})
+
+        with h5py.File(self.summary_file, 'r') as root:
+            self.assertEqual(root['#entries'][0]['path'], b'first.hdf5')
+
+        summary = read_summary(self.summary_file)
+        self.assertEqual(len(summary), 2)
+        self.assertEqual(summary.paths, [first, entry])
+        self.assertEqual(summary.columns, ['a', 'b', 'c'])
+        np.testing.assert_equal(summary.values, [[1., 2., np.nan], [np.nan, 3., np.nan]])
+        np.testing.assert_equal(summary.present, [[True, True, False], [False, True, True]])
+
+    def test_writer_appends_summary(self):
+        writer = AsynchronousHDF5Writer(reserved={}, multiprocess=False)
+        file_names = [os.path.join(self.temp_dir.name, '%d.hdf5' % idx) for idx in range(3)]
+        for idx, file_name in enumerate(file_names):
+            writer.write({'value': idx}, file_name, summary={'value': float(idx)})
+        writer.join()
+
+        summary = read_summary(self.summary_file)
+        self.assertEqual(summary.paths, file_names)
+        np.testing.assert_equal(summary.values, [[0.], [1.], [2.]])
+
+    def test_writer_projects_summary(self):
+        projected = []
+
+        def projection(obj):
+            projected.append(obj)
+            return {'value': float(obj.value.sum())}
+
+        experiment = object()
+        writer = AsynchronousHDF5Writer(reserved={'experiment': experiment}, multiprocess=False)
+        obj = DeltaSerializable(np.arange(3.), shared=experiment)
+        file_name = os.path.join(self.temp_dir.name, 'data.hdf5')
+        with mock.patch.dict(storage.summary_projections, DeltaSerializable=projection):
+            writer.write(obj, file_name, summary=True)
+            obj.value[:] = 0.
+            writer.join()
+
+        restored, = projected
+        self.assertIsNot(restored, obj)
+        self.assertIsInstance(restored, DeltaSerializable)
+        self.assertIs(restored.shared, experiment)
+        np.testing.assert_equal(read_summary(self.summary_file).values, [[3.]])